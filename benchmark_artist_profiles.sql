@@ -0,0 +1,160 @@
+-- Benchmark of the mart_artist_profiles build: the old query (albums and tracks
+-- joined to artists at the same grain) against the pre-aggregated rewrite.
+-- Run after `dbt run`, on the analytics tables it built:
+--   psql -U your_username -d fma_db < benchmark_artist_profiles.sql > benchmark_artist_profiles_results.txt
+-- Build time is the EXPLAIN ANALYZE execution time; temp-file usage is the
+-- "temp read/written" count in the Buffers lines (in 8 kB blocks).
+
+\timing on
+
+-- PostgreSQL's default work_mem, so the temp-file numbers match a stock server
+SET work_mem = '4MB';
+-- Fair comparison: no parallel workers for either query
+SET max_parallel_workers_per_gather = 0;
+
+\echo '----------------------------------------------------------------------'
+\echo '>>> BEFORE: artists x albums x tracks, then COUNT(DISTINCT) and SUM'
+\echo '----------------------------------------------------------------------'
+EXPLAIN (ANALYZE, BUFFERS)
+WITH artist_top_genre AS (
+    SELECT
+        a.artist_id,
+        g.genre_name,
+        ROW_NUMBER() OVER (
+            PARTITION BY a.artist_id
+            ORDER BY COUNT(*) DESC, g.genre_name
+        ) as genre_rank
+    FROM analytics.dim_artists a
+    JOIN analytics.fact_track_performance f ON a.artist_id = f.artist_id
+    JOIN analytics.bridge_track_genres btg ON f.track_id = btg.track_id
+    JOIN analytics.dim_genres g ON btg.genre_id = g.genre_id
+    GROUP BY a.artist_id, g.genre_name
+),
+
+artist_labels AS (
+    SELECT
+        bal.artist_id,
+        STRING_AGG(DISTINCT l.label_name, ', ') as associated_labels
+    FROM analytics.bridge_artist_labels bal
+    JOIN analytics.dim_labels l ON bal.label_id = l.label_id
+    GROUP BY bal.artist_id
+)
+
+SELECT
+    a.artist_id,
+    a.artist_name,
+    a.artist_active_year_begin,
+    a.artist_favorites,
+    COUNT(DISTINCT al.album_id) as album_count,
+    COUNT(DISTINCT f.track_id) as track_count,
+    COALESCE(SUM(f.track_listens), 0) as total_listens,
+    COALESCE(SUM(f.track_favorites), 0) as total_track_favorites,
+    tg.genre_name as top_genre,
+    lab.associated_labels
+FROM analytics.dim_artists a
+LEFT JOIN analytics.dim_albums al ON a.artist_id = al.artist_id
+LEFT JOIN analytics.fact_track_performance f ON a.artist_id = f.artist_id
+LEFT JOIN artist_top_genre tg ON a.artist_id = tg.artist_id AND tg.genre_rank = 1
+LEFT JOIN artist_labels lab ON a.artist_id = lab.artist_id
+GROUP BY
+    a.artist_id,
+    a.artist_name,
+    a.artist_active_year_begin,
+    a.artist_favorites,
+    tg.genre_name,
+    lab.associated_labels
+ORDER BY total_listens DESC, a.artist_favorites DESC;
+
+\echo ' '
+\echo '----------------------------------------------------------------------'
+\echo '>>> AFTER: one pre-aggregated row per artist from each CTE, joined 1:1'
+\echo '----------------------------------------------------------------------'
+EXPLAIN (ANALYZE, BUFFERS)
+WITH album_counts AS (
+    SELECT
+        artist_id,
+        COUNT(*) as album_count
+    FROM analytics.dim_albums
+    GROUP BY artist_id
+),
+
+track_stats AS (
+    SELECT
+        artist_id,
+        COUNT(*) as track_count,
+        SUM(track_listens) as total_listens,
+        SUM(track_favorites) as total_track_favorites
+    FROM analytics.fact_track_performance
+    GROUP BY artist_id
+),
+
+artist_genre_counts AS (
+    SELECT
+        f.artist_id,
+        g.genre_name,
+        COUNT(*) as genre_tracks
+    FROM analytics.fact_track_performance f
+    JOIN analytics.bridge_track_genres btg ON f.track_id = btg.track_id
+    JOIN analytics.dim_genres g ON btg.genre_id = g.genre_id
+    GROUP BY f.artist_id, g.genre_name
+),
+
+artist_top_genre AS (
+    SELECT DISTINCT ON (artist_id)
+        artist_id,
+        genre_name
+    FROM artist_genre_counts
+    ORDER BY artist_id, genre_tracks DESC, genre_name
+),
+
+artist_labels AS (
+    SELECT
+        bal.artist_id,
+        STRING_AGG(DISTINCT l.label_name, ', ') as associated_labels
+    FROM analytics.bridge_artist_labels bal
+    JOIN analytics.dim_labels l ON bal.label_id = l.label_id
+    GROUP BY bal.artist_id
+)
+
+SELECT
+    a.artist_id,
+    a.artist_name,
+    a.artist_active_year_begin,
+    a.artist_favorites,
+    COALESCE(ac.album_count, 0) as album_count,
+    COALESCE(ts.track_count, 0) as track_count,
+    COALESCE(ts.total_listens, 0) as total_listens,
+    COALESCE(ts.total_track_favorites, 0) as total_track_favorites,
+    tg.genre_name as top_genre,
+    lab.associated_labels
+FROM analytics.dim_artists a
+LEFT JOIN album_counts ac ON a.artist_id = ac.artist_id
+LEFT JOIN track_stats ts ON a.artist_id = ts.artist_id
+LEFT JOIN artist_top_genre tg ON a.artist_id = tg.artist_id
+LEFT JOIN artist_labels lab ON a.artist_id = lab.artist_id
+ORDER BY total_listens DESC, a.artist_favorites DESC;
+
+\echo ' '
+\echo '----------------------------------------------------------------------'
+\echo '>>> CORRECTNESS: artists whose listens the old query over-counted'
+\echo '----------------------------------------------------------------------'
+-- The old SUM counted every track once per album of its artist
+SELECT
+    COUNT(*) as over_counted_artists,
+    COALESCE(SUM(old_listens - new_listens), 0) as extra_listens
+FROM (
+    SELECT
+        a.artist_id,
+        COALESCE(SUM(f.track_listens), 0) as old_listens,
+        COALESCE(MAX(ts.total_listens), 0) as new_listens
+    FROM analytics.dim_artists a
+    LEFT JOIN analytics.dim_albums al ON a.artist_id = al.artist_id
+    LEFT JOIN analytics.fact_track_performance f ON a.artist_id = f.artist_id
+    LEFT JOIN (
+        SELECT artist_id, SUM(track_listens) as total_listens
+        FROM analytics.fact_track_performance
+        GROUP BY artist_id
+    ) ts ON a.artist_id = ts.artist_id
+    GROUP BY a.artist_id
+) compared
+WHERE old_listens <> new_listens;
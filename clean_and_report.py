@@ -1,11 +1,21 @@
-import ast
+import argparse
+import inspect
 import os
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cleaning_manifest import CleaningManifest, step_fingerprint
+from fma_dtypes import DATE_FORMATS, FMA_DTYPES, apply_dtypes, memory_report
+from fma_parsing import load_tokens, load_track_genres
 
 RAW_DATA_DIR = 'fma_metadata'
 CLEANED_DATA_DIR = 'fma_metadata_cleaned'
 
+# Streaming mode (--stream) reads the raw files this many rows at a time
+DEFAULT_CHUNK_ROWS = 100_000
+
 # These are the columns we actually need from each raw CSV file
 COLUMNS_TO_KEEP = {
     'genres': ['genre_id', 'genre_parent_id', 'genre_title'],
@@ -22,11 +32,64 @@ COLUMNS_TO_KEEP = {
                  'song_hotttnesss']
 }
 
+# Column types come from the shared registry in fma_dtypes.py. Each column is
+# converted once, while cleaning, and the cleaned tables are saved as Parquet, which
+# stores those types, so ingest_data.py reads them back ready to load.
+PARQUET_TYPES = {
+    'int32': pa.int32(),
+    'Int32': pa.int32(),
+    'float32': pa.float32(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'date': pa.timestamp('ns'),
+    'text': pa.string(),
+}
+
+# Columns checked by the coverage report: column -> (cleaned table, ID column, entity).
+# The contributor columns can list several names in one field ('A, B & C').
+COVERAGE_COLUMNS = {
+    'album_engineer': ('albums', 'album_id', 'Engineers'),
+    'album_producer': ('albums', 'album_id', 'Producers'),
+    'track_lyricist': ('tracks', 'track_id', 'Lyricists'),
+    'track_composer': ('tracks', 'track_id', 'Composers'),
+    'artist_associated_labels': ('artists', 'artist_id', 'Labels'),
+}
+
+# Single-valued columns in the coverage report, same layout. Each value is one name
+# as a whole: a license title like 'Attribution-NonCommercial-ShareAlike 3.0' isn't split.
+CATEGORICAL_COVERAGE_COLUMNS = {
+    'license_title': ('tracks', 'track_id', 'Licenses'),
+}
+
+
+def raw_file_path(file_name):
+    """Path of one raw CSV file."""
+    return os.path.join(RAW_DATA_DIR, f"raw_{file_name}.csv")
+
+
+def read_raw_file(file_name, chunk_rows=None):
+    """
+    Read one raw CSV file, keeping only the columns we need.
+    Text columns are always read as strings, so a name like '311' stays '311' even
+    in a chunk where every value happens to look like a number; apply_dtypes then
+    gives every column its compact type.
+    With chunk_rows set, this returns an iterator of DataFrame chunks instead.
+    """
+    file_path = raw_file_path(file_name)
+    columns = COLUMNS_TO_KEEP[file_name]
+    text_columns = {column: str for column in columns if FMA_DTYPES.get(column) in ('text', 'category')}
+
+    # The echonest file has a weird structure with headers on row 3 instead of row 1
+    header_row = 2 if file_name == 'echonest' else 0
+
+    if chunk_rows:
+        return pd.read_csv(file_path, usecols=columns, header=header_row, dtype=text_columns, chunksize=chunk_rows)
+    return pd.read_csv(file_path, usecols=columns, header=header_row, dtype=text_columns, low_memory=False)
+
 
-def load_raw_data():
+def load_raw_data(file_names=None):
     """
-    Load the original raw CSV files from the fma_metadata folder.
-    Only load the columns we actually need to save memory.
+    Load the original raw CSV files from the fma_metadata folder (all of them, or
+    just the ones in file_names). Only load the columns we actually need to save memory.
     """
     print("\nLoading raw data files...")
     print(f"Looking in: {os.path.join(os.getcwd(), RAW_DATA_DIR)}\n")
@@ -34,15 +97,16 @@ def load_raw_data():
     raw_data = {}
 
     try:
-        for file_name, columns in COLUMNS_TO_KEEP.items():
-            file_path = os.path.join(RAW_DATA_DIR, f"raw_{file_name}.csv")
-
-            # The echonest file has a weird structure with headers on row 3 instead of row 1
-            header_row = 2 if file_name == 'echonest' else 0
-
-            raw_data[file_name] = pd.read_csv(file_path, usecols=columns, header=header_row, low_memory=False)
+        for file_name in (file_names or COLUMNS_TO_KEEP):
+            raw_data[file_name] = read_raw_file(file_name)
             print(f"Loaded {file_name}: {len(raw_data[file_name]):,} rows")
 
+        # Shrink every frame to the compact column types before cleaning
+        print("\nMemory used by the raw data (as read -> compact types):")
+        for file_name, data in raw_data.items():
+            as_read = data.memory_usage(deep=True).sum()
+            memory_report(file_name, apply_dtypes(data), before_bytes=as_read)
+
         return raw_data
 
     except FileNotFoundError as e:
@@ -86,10 +150,11 @@ def clean_artists(raw_artists):
     return artists
 
 
-def clean_albums(raw_albums, clean_artists):
+def clean_albums(raw_albums, valid_artists):
     """
     Clean the albums data.
     Remove any albums that reference artists that don't exist in our cleaned data.
+    valid_artists is the set of artist names in the cleaned artists data.
     """
     albums = raw_albums.copy()
     albums.columns = albums.columns.str.lower()
@@ -97,7 +162,6 @@ def clean_albums(raw_albums, clean_artists):
     albums['album_id'] = albums['album_id'].astype(int)
 
     # Only keep albums for artists we have in our database
-    valid_artists = set(clean_artists['artist_name'])
     before_count = len(albums)
     albums = albums[albums['artist_name'].isin(valid_artists)]
     after_count = len(albums)
@@ -109,10 +173,11 @@ def clean_albums(raw_albums, clean_artists):
     return albums
 
 
-def clean_tracks(raw_tracks, clean_albums, clean_artists):
+def clean_tracks(raw_tracks, valid_albums, valid_artists):
     """
     Clean the tracks data.
     Remove any tracks that reference albums or artists that don't exist.
+    valid_albums and valid_artists are the sets of album and artist IDs in the cleaned data.
     """
     tracks = raw_tracks.copy()
     tracks.columns = tracks.columns.str.lower()
@@ -120,9 +185,6 @@ def clean_tracks(raw_tracks, clean_albums, clean_artists):
     tracks['track_id'] = tracks['track_id'].astype(int)
 
     # Only keep tracks that link to valid albums and artists
-    valid_albums = set(clean_albums['album_id'])
-    valid_artists = set(clean_artists['artist_id'])
-
     before_count = len(tracks)
     tracks = tracks[
         tracks['album_id'].isin(valid_albums) &
@@ -153,36 +215,185 @@ def clean_echonest(raw_echonest):
     return echonest
 
 
-def save_cleaned_data(clean_data):
-    """Save all the cleaned data to new CSV files."""
-    os.makedirs(CLEANED_DATA_DIR, exist_ok=True)
+def cleaned_columns(name):
+    """Column names of a cleaned table: the kept raw columns, lower-cased, with the echonest ID renamed."""
+    return ['track_id' if column == 'Unnamed: 0' else column.lower() for column in COLUMNS_TO_KEEP[name]]
 
-    print(f"\nSaving cleaned files to: {CLEANED_DATA_DIR}/")
 
-    for name, data in clean_data.items():
-        output_file = os.path.join(CLEANED_DATA_DIR, f"clean_{name}.csv")
-        data.to_csv(output_file, index=False)
-        print(f"  Saved clean_{name}.csv ({len(data):,} rows)")
+def parquet_schema(name):
+    """
+    The Parquet schema of a cleaned table, built from the column types in FMA_DTYPES.
+    Fixing it up front means every chunk of a streamed table is written with the same
+    types, even a chunk where a text column happens to be completely empty.
+    """
+    return pa.schema([(column, PARQUET_TYPES[FMA_DTYPES[column]]) for column in cleaned_columns(name)])
 
 
-def analyze_column_coverage(df, column_name, entity_name):
+class CleanedFileWriter:
     """
-    Check how much data exists in a column and whether it's worth creating a table for it.
+    Writes one cleaned table to clean_<name>.parquet (and optionally clean_<name>.csv),
+    one DataFrame at a time, so a table can be saved while it is still being cleaned.
+    """
+
+    def __init__(self, name, export_csv=False):
+        os.makedirs(CLEANED_DATA_DIR, exist_ok=True)
+        self.name = name
+        self.schema = parquet_schema(name)
+        self.parquet_file = os.path.join(CLEANED_DATA_DIR, f"clean_{name}.parquet")
+        self.csv_file = os.path.join(CLEANED_DATA_DIR, f"clean_{name}.csv") if export_csv else None
+        self.writer = None
+        self.rows = 0
+
+    def write(self, data):
+        """Convert a cleaned DataFrame to the registry's column types and append it to the output."""
+        typed = apply_dtypes(data.reset_index(drop=True))
+        table = pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.parquet_file, table.schema)
+        self.writer.write_table(table)
+
+        if self.csv_file:
+            typed[self.schema.names].to_csv(self.csv_file, index=False, mode='w' if self.rows == 0 else 'a',
+                                            header=self.rows == 0)
+        self.rows += len(typed)
+
+    def close(self):
+        """Finish the files. An empty table still gets a Parquet file with the right columns."""
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.parquet_file, self.schema)
+        self.writer.close()
+        print(f"  Saved clean_{self.name}.parquet ({self.rows:,} rows)" + (" and .csv" if self.csv_file else ""))
+
+
+# The cleaning steps, in the order they run. 'keys' lists the (table, column) sets a
+# table is filtered against; they are read back from the cleaned files of those
+# tables, so a table's output also depends on them (see plan_cleaning).
+# Genres are always cleaned whole, because fixing orphaned parents needs all of them.
+CLEANING_STEPS = {
+    'genres': {'function': clean_genres, 'keys': [], 'stream': False},
+    'artists': {'function': clean_artists, 'keys': []},
+    'albums': {'function': clean_albums, 'keys': [('artists', 'artist_name')]},
+    'tracks': {'function': clean_tracks, 'keys': [('albums', 'album_id'), ('artists', 'artist_id')]},
+    'echonest': {'function': clean_echonest, 'keys': []},
+}
+
+
+def cleaned_file_paths(name, export_csv=False):
+    """The output files of one cleaned table."""
+    paths = [os.path.join(CLEANED_DATA_DIR, f"clean_{name}.parquet")]
+    if export_csv:
+        paths.append(os.path.join(CLEANED_DATA_DIR, f"clean_{name}.csv"))
+    return paths
+
+
+def read_key_sets(name):
+    """
+    Read the sets of valid keys a table is filtered against from the cleaned files.
+    Only the key columns are read, so this stays small even for large tables.
+    """
+    return [set(pd.read_parquet(cleaned_file_paths(table)[0], columns=[column])[column].dropna())
+            for table, column in CLEANING_STEPS[name]['keys']]
+
+
+def cleaning_parameters(name):
+    """Everything besides the raw data that decides what a cleaned table looks like."""
+    return {
+        'columns': COLUMNS_TO_KEEP[name],
+        'dtypes': {column: FMA_DTYPES[column] for column in cleaned_columns(name)},
+        'date_formats': DATE_FORMATS,
+        'code': inspect.getsource(CLEANING_STEPS[name]['function']),
+    }
+
+
+def plan_cleaning(manifest, force=False, export_csv=False):
+    """
+    Fingerprint every cleaning step and work out which tables have to be cleaned again:
+    those whose raw file, parameters or upstream tables changed since the manifest was
+    written, or whose output files are missing. Because a fingerprint includes the
+    fingerprints of the tables a step is filtered against, a changed artists file also
+    makes albums and tracks stale.
+    Returns (fingerprints, raw file hashes, stale table names in cleaning order).
+    """
+    fingerprints, raw_hashes, stale = {}, {}, []
+    for name, step in CLEANING_STEPS.items():
+        raw_hashes[name] = manifest.raw_file_hash(name, raw_file_path(name))
+        upstream = sorted({table for table, _ in step['keys']})
+        fingerprints[name] = step_fingerprint(raw_hashes[name], cleaning_parameters(name),
+                                              [fingerprints[table] for table in upstream])
+        if force or not manifest.is_current(name, fingerprints[name], cleaned_file_paths(name, export_csv)):
+            stale.append(name)
+    return fingerprints, raw_hashes, stale
+
+
+def save_cleaned_table(name, data, export_csv=False):
+    """
+    Save one cleaned table as a typed Parquet file for ingest_data.py.
+    With export_csv=True a CSV copy is written as well. Returns the number of rows.
+    """
+    writer = CleanedFileWriter(name, export_csv)
+    writer.write(data)
+    writer.close()
+    return writer.rows
+
+
+def clean_table_in_chunks(name, chunk_rows, export_csv=False):
+    """
+    Memory-bounded cleaning for raw files too big to load at once.
+    The raw file is read chunk by chunk, and every chunk is cleaned and appended to
+    the output files straight away, so only one chunk is in memory at a time. The only
+    other things kept are the sets of valid keys the table is filtered against.
+    Returns the number of cleaned rows.
+    """
+    step = CLEANING_STEPS[name]
+    key_sets = read_key_sets(name)
+    if not step.get('stream', True):
+        return save_cleaned_table(name, step['function'](apply_dtypes(read_raw_file(name)), *key_sets), export_csv)
+
+    writer = CleanedFileWriter(name, export_csv)
+    rows_read = 0
+    for chunk_number, raw_chunk in enumerate(read_raw_file(name, chunk_rows), start=1):
+        rows_read += len(raw_chunk)
+        print(f"  {name} chunk {chunk_number}: {len(raw_chunk):,} rows")
+        writer.write(step['function'](apply_dtypes(raw_chunk), *key_sets))
+    print(f"Cleaned {name}: {rows_read:,} rows read")
+    writer.close()
+    return writer.rows
+
+
+def load_analysis_columns():
     """
-    rows_with_data = df[column_name].dropna()
-    total_rows = len(df)
-    coverage_percent = (len(rows_with_data) / total_rows * 100) if total_rows > 0 else 0
+    Read back just the columns run_analysis needs from the cleaned Parquet files.
+    This works the same whether a table was cleaned in this run, cleaned in chunks
+    or skipped because it was already up to date.
+    """
+    data = {'genres': pd.read_parquet(os.path.join(CLEANED_DATA_DIR, 'clean_genres.parquet'),
+                                      columns=['genre_id'])}
+    data['row_counts'] = {name: pq.ParquetFile(os.path.join(CLEANED_DATA_DIR, f"clean_{name}.parquet")).metadata.num_rows
+                          for name in ('artists', 'albums', 'tracks')}
+
+    # (id, name) pairs of the multi-valued columns. load_tokens caches them by file
+    # hash, so ingest_data.py reuses this tokenization instead of splitting again.
+    data['tokens'] = {column: load_tokens(os.path.join(CLEANED_DATA_DIR, f"clean_{name}.parquet"), id_column, column)
+                      for column, (name, id_column, entity_name) in COVERAGE_COLUMNS.items()}
+
+    # Single-valued columns take the same (id, token) shape, one row per non-empty value
+    for column, (name, id_column, entity_name) in CATEGORICAL_COVERAGE_COLUMNS.items():
+        values = pd.read_parquet(os.path.join(CLEANED_DATA_DIR, f"clean_{name}.parquet"), columns=[id_column, column])
+        data['tokens'][column] = values.dropna(subset=[column]).rename(columns={column: 'token'})
+    return data
+
 
-    # Count unique values (split by common delimiters like commas and ampersands)
-    unique_values = (rows_with_data
-                     .astype(str)
-                     .str.split(r'[,&\n]')
-                     .explode()
-                     .str.strip()
-                     .nunique())
+def analyze_column_coverage(tokens, id_column, total_rows, entity_name):
+    """
+    Check how much data exists in a column and whether it's worth creating a table for it.
+    tokens holds the column split into one (id, name) row per name (see fma_parsing.tokenize_column).
+    """
+    rows_with_data = tokens[id_column].nunique()
+    coverage_percent = (rows_with_data / total_rows * 100) if total_rows > 0 else 0
+    unique_values = tokens['token'].nunique()
 
     print(f"\n{entity_name}:")
-    print(f"  Coverage: {len(rows_with_data):,} out of {total_rows:,} rows ({coverage_percent:.1f}%)")
+    print(f"  Coverage: {rows_with_data:,} out of {total_rows:,} rows ({coverage_percent:.1f}%)")
     print(f"  Unique values: {unique_values:,}")
 
     if coverage_percent > 5:
@@ -191,24 +402,13 @@ def analyze_column_coverage(df, column_name, entity_name):
         print(f"  ✗ Very low coverage - table would be mostly empty")
 
 
-def analyze_genre_links(tracks_df, genres_df):
+def analyze_genre_links(track_genres, genres_df):
     """
     Check how many valid track-to-genre links we have.
-    Genre data is stored as a complex nested structure in the CSV.
-    """
-    valid_genre_ids = set(genres_df['genre_id'])
-    valid_links = 0
-
-    for genre_string in tracks_df['track_genres'].dropna():
-        try:
-            # Parse the genre data (it's stored as a string representation of a list)
-            genres_list = ast.literal_eval(genre_string)
-            for genre in genres_list:
-                genre_id = int(genre.get('genre_id'))
-                if genre_id in valid_genre_ids:
-                    valid_links += 1
-        except (ValueError, SyntaxError):
-            continue
+    Genre data is stored as a complex nested structure in the CSV, so we use the
+    (track_id, genre_id) pairs already parsed out of it by fma_parsing.
+    """
+    valid_links = int(track_genres['genre_id'].isin(genres_df['genre_id']).sum())
 
     print(f"\nTrack-Genre Links:")
     print(f"  Valid links: {valid_links:,}")
@@ -225,48 +425,82 @@ def run_analysis(clean_data):
     print("=" * 80)
 
     # Check if each entity has enough data to justify a separate table
-    analyze_column_coverage(clean_data['albums'], 'album_engineer', 'Engineers')
-    analyze_column_coverage(clean_data['tracks'], 'track_lyricist', 'Lyricists')
-    analyze_column_coverage(clean_data['artists'], 'artist_associated_labels', 'Labels')
-    analyze_column_coverage(clean_data['tracks'], 'license_title', 'Licenses')
+    for column, (name, id_column, entity_name) in {**COVERAGE_COLUMNS, **CATEGORICAL_COVERAGE_COLUMNS}.items():
+        analyze_column_coverage(clean_data['tokens'][column], id_column, clean_data['row_counts'][name], entity_name)
 
     # Check the genre linking situation
-    analyze_genre_links(clean_data['tracks'], clean_data['genres'])
+    # The pairs are cached by file hash, so ingest_data.py can reuse them
+    track_genres = load_track_genres(os.path.join(CLEANED_DATA_DIR, 'clean_tracks.parquet'))
+    analyze_genre_links(track_genres, clean_data['genres'])
+
+
+def parse_args():
+    """Read the command line options."""
+    parser = argparse.ArgumentParser(description="Clean the raw FMA data files.")
+    parser.add_argument('--csv', action='store_true',
+                        help="also export the cleaned tables as CSV (ingest_data.py reads the Parquet files)")
+    parser.add_argument('--stream', action='store_true',
+                        help="clean the raw files chunk by chunk instead of loading them whole")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows per chunk in --stream mode")
+    parser.add_argument('--force', action='store_true',
+                        help="clean every table again, even if its inputs haven't changed")
+    return parser.parse_args()
 
 
 def main():
     """Run the complete data cleaning pipeline."""
+    args = parse_args()
 
     print("=" * 80)
     print("FMA DATA CLEANING PIPELINE")
     print("=" * 80)
 
-    # Step 1: Load the raw data
-    raw_data = load_raw_data()
-    if not raw_data:
+    # Step 1: Work out which tables have to be cleaned again
+    manifest = CleaningManifest(CLEANED_DATA_DIR)
+    try:
+        fingerprints, raw_hashes, stale = plan_cleaning(manifest, force=args.force, export_csv=args.csv)
+    except FileNotFoundError as e:
+        print(f"\nERROR: Could not find data files")
+        print(f"Make sure your raw CSV files are in the '{RAW_DATA_DIR}' folder")
+        print(f"Details: {e}")
         return
 
-    # Step 2: Clean each file
-    # We clean in order: independent tables first, then dependent tables
-    print("\n" + "=" * 80)
-    print("CLEANING DATA")
-    print("=" * 80)
-
-    print("\nCleaning independent tables...")
-    clean_data = {}
-    clean_data['genres'] = clean_genres(raw_data['genres'])
-    clean_data['artists'] = clean_artists(raw_data['artists'])
-
-    print("\nCleaning dependent tables...")
-    clean_data['albums'] = clean_albums(raw_data['albums'], clean_data['artists'])
-    clean_data['tracks'] = clean_tracks(raw_data['tracks'], clean_data['albums'], clean_data['artists'])
-    clean_data['echonest'] = clean_echonest(raw_data['echonest'])
-
-    # Step 3: Save the cleaned data
-    save_cleaned_data(clean_data)
+    up_to_date = [name for name in CLEANING_STEPS if name not in stale]
+    if up_to_date:
+        print(f"\nUp to date (inputs unchanged since the last run): {', '.join(up_to_date)}")
+    print(f"To clean: {', '.join(stale) if stale else 'nothing'}")
+
+    if stale and args.stream:
+        # Steps 2-3 one chunk at a time: read, clean and save
+        print("\n" + "=" * 80)
+        print("CLEANING DATA (STREAMING)")
+        print("=" * 80)
+        print(f"\nCleaning the raw files in chunks of {args.chunk_rows:,} rows...")
+        print(f"Writing to: {CLEANED_DATA_DIR}/\n")
+        for name in stale:
+            rows = clean_table_in_chunks(name, max(1, args.chunk_rows), export_csv=args.csv)
+            manifest.record(name, fingerprints[name], raw_file_path(name), raw_hashes[name], rows)
+    elif stale:
+        # Step 2: Load the raw data we need
+        raw_data = load_raw_data(stale)
+        if not raw_data:
+            return
+
+        # Step 3: Clean and save each file
+        # We clean in order: independent tables first, then dependent tables,
+        # which are filtered against the keys in the cleaned files saved before them
+        print("\n" + "=" * 80)
+        print("CLEANING DATA")
+        print("=" * 80)
+        print(f"\nSaving cleaned files to: {CLEANED_DATA_DIR}/")
+        for name in stale:
+            cleaned = CLEANING_STEPS[name]['function'](raw_data.pop(name), *read_key_sets(name))
+            rows = save_cleaned_table(name, cleaned, export_csv=args.csv)
+            manifest.record(name, fingerprints[name], raw_file_path(name), raw_hashes[name], rows)
 
     # Step 4: Run analysis on the cleaned data
-    run_analysis(clean_data)
+    run_analysis(load_analysis_columns())
 
     print("\n" + "=" * 80)
     print("✓ CLEANING COMPLETE")
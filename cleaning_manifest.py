@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from fma_parsing import file_fingerprint
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def step_fingerprint(raw_file_hash, parameters, upstream_fingerprints):
+    """
+    Identify one cleaning step by everything its output depends on: the raw file,
+    the cleaning parameters (columns, types, code) and the fingerprints of the
+    tables it is filtered against. A change anywhere upstream therefore changes
+    the fingerprint of every table below it.
+    """
+    digest = hashlib.sha256(raw_file_hash.encode())
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+    for fingerprint in upstream_fingerprints:
+        digest.update(fingerprint.encode())
+    return digest.hexdigest()
+
+
+class CleaningManifest:
+    """
+    Records, next to the cleaned files, which inputs each cleaned table was built from,
+    so a later run only cleans the tables whose inputs have changed.
+    The manifest is saved after every table, so an interrupted run keeps its progress.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+        self.steps = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.steps = json.load(f).get('steps', {})
+
+    def raw_file_hash(self, name, file_path):
+        """
+        SHA-256 of a raw file. Hashing a large raw file takes a while, so when its size and
+        modification time match the last run we reuse the hash recorded then.
+        """
+        stat = os.stat(file_path)
+        recorded = self.steps.get(name, {})
+        if recorded.get('raw_size') == stat.st_size and recorded.get('raw_mtime') == stat.st_mtime:
+            return recorded['raw_sha256']
+        return file_fingerprint(file_path)
+
+    def is_current(self, name, fingerprint, output_files):
+        """True if the table was last built from exactly these inputs and its output files still exist."""
+        return (self.steps.get(name, {}).get('fingerprint') == fingerprint
+                and all(os.path.exists(output_file) for output_file in output_files))
+
+    def record(self, name, fingerprint, raw_file_path, raw_sha256, rows):
+        """Remember that a table has been rebuilt, and save the manifest."""
+        stat = os.stat(raw_file_path)
+        self.steps[name] = {
+            'fingerprint': fingerprint,
+            'raw_file': raw_file_path,
+            'raw_sha256': raw_sha256,
+            'raw_size': stat.st_size,
+            'raw_mtime': stat.st_mtime,
+            'rows': rows,
+            'cleaned_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump({'steps': self.steps}, f, indent=4)
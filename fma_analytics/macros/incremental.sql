@@ -0,0 +1,66 @@
+{#
+    Helpers for the incremental models.
+
+    Core models carry a _row_hash of each row's contents and a _loaded_at time, so
+    an incremental run writes only the source rows that are new or changed. The
+    marts use _loaded_at to find the keys (artists, years, genres) touched since
+    their own last refresh, and recompute only those. Rows that changed key (a track
+    moved to another artist or year) also carry their previous key, so the marts
+    refresh the key they left too. Deleted source rows can't be tracked that way,
+    so incremental runs stop and ask for a full refresh instead.
+#}
+
+{% macro row_hash(relation) -%}
+    md5({{ relation }}::text)
+{%- endmacro %}
+
+
+{% macro only_changed_rows(relation, unique_key) -%}
+    {#- Keep the rows of `relation` that are new or differ from the current model -#}
+    {%- if is_incremental() %}
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM {{ this }} cur
+    WHERE {% for column in unique_key %}cur.{{ column }} = {{ relation }}.{{ column }}
+      AND {% endfor %}cur._row_hash = {{ row_hash(relation) }}
+)
+    {%- endif %}
+{%- endmacro %}
+
+
+{% macro last_refresh() -%}
+    {#- When this model was last refreshed (minus infinity when it is empty) -#}
+    (SELECT COALESCE(MAX(_loaded_at), '-infinity') FROM {{ this }})
+{%- endmacro %}
+
+
+{% macro previous_value(relation, unique_key, column, data_type) -%}
+    {#- The value a column had in the current model before this run (NULL for new rows and full refreshes) -#}
+    {%- if is_incremental() -%}
+    (SELECT prev.{{ column }} FROM {{ this }} prev WHERE {% for key in unique_key %}prev.{{ key }} = {{ relation }}.{{ key }}{% if not loop.last %} AND {% endif %}{% endfor %})
+    {%- else -%}
+    CAST(NULL AS {{ data_type }})
+    {%- endif -%}
+{%- endmacro %}
+
+
+{% macro fail_on_deleted_rows(source_relation, unique_key) -%}
+    {#- Pre-hook: an incremental run only adds and replaces rows, so stop when the source lost rows this model still has -#}
+    {%- if is_incremental() %}
+DO $check$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM {{ this }} cur
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM {{ source_relation }} src
+            WHERE {% for column in unique_key %}src.{{ column }} = cur.{{ column }}{% if not loop.last %} AND {% endif %}{% endfor %}
+        )
+    ) THEN
+        RAISE EXCEPTION 'rows of {{ source_relation }} that {{ this }} still has were deleted; rebuild it with dbt run --full-refresh';
+    END IF;
+END
+$check$
+    {%- endif %}
+{%- endmacro %}
@@ -0,0 +1,41 @@
+{#
+    Helpers for mart_yearly_rollup. The model and its pre-hook both need the years
+    an incremental run has to rebuild, so the query lives here once.
+#}
+
+{% macro rollup_changed_years() -%}
+    {#- Years with a new or changed track, artist or genre row since the last refresh, and the years changed tracks left -#}
+    SELECT EXTRACT(YEAR FROM f.track_date_recorded)::integer as release_year
+    FROM {{ ref('fact_track_performance') }} f
+    WHERE f._loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT EXTRACT(YEAR FROM f._previous_track_date_recorded)::integer
+    FROM {{ ref('fact_track_performance') }} f
+    WHERE f._loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT EXTRACT(YEAR FROM f.track_date_recorded)::integer
+    FROM {{ ref('fact_track_performance') }} f
+    JOIN {{ ref('dim_artists') }} a ON f.artist_id = a.artist_id
+    WHERE a._loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT EXTRACT(YEAR FROM f.track_date_recorded)::integer
+    FROM {{ ref('fact_track_performance') }} f
+    JOIN {{ ref('bridge_track_genres') }} btg ON f.track_id = btg.track_id
+    LEFT JOIN {{ ref('dim_genres') }} g ON btg.genre_id = g.genre_id
+    WHERE btg._loaded_at > {{ last_refresh() }} OR g._loaded_at > {{ last_refresh() }}
+{%- endmacro %}
+
+
+{% macro delete_emptied_years() -%}
+    {#- Pre-hook: delete+insert only replaces the years the new rows have, so drop the changed years that have no tracks left -#}
+    {%- if is_incremental() %}
+DELETE FROM {{ this }} cur
+WHERE cur.release_year IN ({{ rollup_changed_years() }})
+  AND NOT EXISTS (
+    SELECT 1
+    FROM {{ ref('fact_track_performance') }} f
+    JOIN {{ ref('dim_artists') }} a ON f.artist_id = a.artist_id
+    WHERE EXTRACT(YEAR FROM f.track_date_recorded)::integer = cur.release_year
+)
+    {%- endif %}
+{%- endmacro %}
@@ -1,6 +1,24 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key=['artist_id', 'label_id'],
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['artist_id', 'label_id'], 'unique': True},
+        {'columns': ['label_id']}
+    ],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'ArtistLabels'), ['artist_id', 'label_id']) }}"
+) }}
+
+WITH link_rows AS (
+    SELECT
+        artist_id,
+        label_id
+    FROM {{ source('public', 'ArtistLabels') }}
+)
 
 SELECT
-    artist_id,
-    label_id
-FROM {{ source('public', 'ArtistLabels') }}
\ No newline at end of file
+    link_rows.*,
+    {{ row_hash('link_rows') }} AS _row_hash,
+    now() AS _loaded_at
+FROM link_rows
+{{ only_changed_rows('link_rows', ['artist_id', 'label_id']) }}
@@ -1,6 +1,24 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key=['track_id', 'genre_id'],
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['track_id', 'genre_id'], 'unique': True},
+        {'columns': ['genre_id']}
+    ],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'TrackGenres'), ['track_id', 'genre_id']) }}"
+) }}
+
+WITH link_rows AS (
+    SELECT
+        track_id,
+        genre_id
+    FROM {{ source('public', 'TrackGenres') }}
+)
 
 SELECT
-    track_id,
-    genre_id
-FROM {{ source('public', 'TrackGenres') }}
\ No newline at end of file
+    link_rows.*,
+    {{ row_hash('link_rows') }} AS _row_hash,
+    now() AS _loaded_at
+FROM link_rows
+{{ only_changed_rows('link_rows', ['track_id', 'genre_id']) }}
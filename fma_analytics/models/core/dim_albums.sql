@@ -1,12 +1,33 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='album_id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['album_id'], 'unique': True},
+        {'columns': ['artist_id']}
+    ],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'Albums'), ['album_id']) }}"
+) }}
+
+WITH album_rows AS (
+    SELECT
+        album_id,
+        album_title,
+        album_type,
+        album_tracks,
+        album_date_released,
+        album_listens,
+        album_favorites,
+        artist_id
+    FROM {{ source('public', 'Albums') }}
+)
 
 SELECT
-    album_id,
-    album_title,
-    album_type,
-    album_tracks,
-    album_date_released,
-    album_listens,
-    album_favorites,
-    artist_id
-FROM {{ source('public', 'Albums') }}
\ No newline at end of file
+    album_rows.*,
+    {{ row_hash('album_rows') }} AS _row_hash,
+    now() AS _loaded_at,
+    -- The artist a changed album belonged to before, for mart_artist_profiles
+    {{ previous_value('album_rows', ['album_id'], 'artist_id', 'integer') }} AS _previous_artist_id
+FROM album_rows
+{{ only_changed_rows('album_rows', ['album_id']) }}
+ORDER BY artist_id, album_id
@@ -1,13 +1,33 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='artist_id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['artist_id'], 'unique': True},
+        {'columns': ['artist_active_year_begin']},
+        {'columns': ['artist_latitude', 'artist_longitude']}
+    ],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'Artists'), ['artist_id']) }}"
+) }}
+
+WITH artist_rows AS (
+    SELECT
+        artist_id,
+        artist_name,
+        artist_handle,
+        artist_website,
+        artist_active_year_begin,
+        artist_favorites,
+        artist_latitude,
+        artist_longitude,
+        artist_location
+    FROM {{ source('public', 'Artists') }}
+)
 
 SELECT
-    artist_id,
-    artist_name,
-    artist_handle,
-    artist_website,
-    artist_active_year_begin,
-    artist_favorites,
-    artist_latitude,
-    artist_longitude,
-    artist_location
-FROM {{ source('public', 'Artists') }}
\ No newline at end of file
+    artist_rows.*,
+    {{ row_hash('artist_rows') }} AS _row_hash,
+    now() AS _loaded_at
+FROM artist_rows
+{{ only_changed_rows('artist_rows', ['artist_id']) }}
+ORDER BY artist_active_year_begin, artist_id
@@ -1,7 +1,22 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='genre_id',
+    incremental_strategy='delete+insert',
+    indexes=[{'columns': ['genre_id'], 'unique': True}],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'Genres'), ['genre_id']) }}"
+) }}
+
+WITH genre_rows AS (
+    SELECT
+        genre_id,
+        genre_name,
+        parent_id
+    FROM {{ source('public', 'Genres') }}
+)
 
 SELECT
-    genre_id,
-    genre_name,
-    parent_id
-FROM {{ source('public', 'Genres') }}
\ No newline at end of file
+    genre_rows.*,
+    {{ row_hash('genre_rows') }} AS _row_hash,
+    now() AS _loaded_at
+FROM genre_rows
+{{ only_changed_rows('genre_rows', ['genre_id']) }}
@@ -1,6 +1,21 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='label_id',
+    incremental_strategy='delete+insert',
+    indexes=[{'columns': ['label_id'], 'unique': True}],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'Labels'), ['label_id']) }}"
+) }}
+
+WITH label_rows AS (
+    SELECT
+        label_id,
+        label_name
+    FROM {{ source('public', 'Labels') }}
+)
 
 SELECT
-    label_id,
-    label_name
-FROM {{ source('public', 'Labels') }}
\ No newline at end of file
+    label_rows.*,
+    {{ row_hash('label_rows') }} AS _row_hash,
+    now() AS _loaded_at
+FROM label_rows
+{{ only_changed_rows('label_rows', ['label_id']) }}
@@ -1,14 +1,44 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='track_id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['track_id'], 'unique': True},
+        {'columns': ['artist_id']},
+        {'columns': ['_loaded_at']}
+    ],
+    pre_hook="{{ fail_on_deleted_rows(source('public', 'Tracks'), ['track_id']) }}"
+) }}
+
+-- Incremental runs only write the tracks whose joined row is new or changed.
+-- A changed track also records the artist and date it had before, so the marts
+-- can refresh the artist and year it moved away from
+WITH track_rows AS (
+    SELECT
+        t.track_id,
+        t.artist_id,
+        t.track_date_recorded,
+        t.track_listens,
+        t.track_favorites,
+        a.danceability,
+        a.energy,
+        a.acousticness,
+        a.instrumentalness,
+        a.liveness,
+        a.speechiness,
+        a.valence,
+        s.song_hotttnesss
+    FROM {{ source('public', 'Tracks') }} t
+    LEFT JOIN {{ source('public', 'Audio') }} a ON t.track_id = a.track_id
+    LEFT JOIN {{ source('public', 'Social') }} s ON t.track_id = s.track_id
+)
 
 SELECT
-    t.track_id,
-    t.artist_id,
-    t.track_date_recorded,
-    t.track_listens,
-    t.track_favorites,
-    a.danceability,
-    a.energy,
-    s.song_hotttnesss
-FROM {{ source('public', 'Tracks') }} t
-LEFT JOIN {{ source('public', 'Audio') }} a ON t.track_id = a.track_id
-LEFT JOIN {{ source('public', 'Social') }} s ON t.track_id = s.track_id
\ No newline at end of file
+    track_rows.*,
+    {{ row_hash('track_rows') }} AS _row_hash,
+    now() AS _loaded_at,
+    {{ previous_value('track_rows', ['track_id'], 'artist_id', 'integer') }} AS _previous_artist_id,
+    {{ previous_value('track_rows', ['track_id'], 'track_date_recorded', 'date') }} AS _previous_track_date_recorded
+FROM track_rows
+{{ only_changed_rows('track_rows', ['track_id']) }}
+ORDER BY artist_id, track_id
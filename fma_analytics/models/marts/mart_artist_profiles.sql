@@ -1,19 +1,89 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='artist_id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['artist_id'], 'unique': True},
+        {'columns': ['artist_name']}
+    ]
+) }}
 
-WITH artist_top_genre AS (
-    -- Get the most common genre for each artist
+-- Incremental runs recompute only the artists with a new or changed
+-- artist, album, track, genre or label row, and the artists that a changed
+-- album or track moved away from
+WITH
+{% if is_incremental() %}
+changed_artists AS (
+    SELECT artist_id FROM {{ ref('dim_artists') }} WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT artist_id FROM {{ ref('dim_albums') }} WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT _previous_artist_id FROM {{ ref('dim_albums') }} WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT artist_id FROM {{ ref('fact_track_performance') }} WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT _previous_artist_id FROM {{ ref('fact_track_performance') }} WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT f.artist_id
+    FROM {{ ref('bridge_track_genres') }} btg
+    JOIN {{ ref('fact_track_performance') }} f ON btg.track_id = f.track_id
+    LEFT JOIN {{ ref('dim_genres') }} g ON btg.genre_id = g.genre_id
+    WHERE btg._loaded_at > {{ last_refresh() }} OR g._loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT bal.artist_id
+    FROM {{ ref('bridge_artist_labels') }} bal
+    LEFT JOIN {{ ref('dim_labels') }} l ON bal.label_id = l.label_id
+    WHERE bal._loaded_at > {{ last_refresh() }} OR l._loaded_at > {{ last_refresh() }}
+),
+{% endif %}
+
+-- Every CTE below has one row per artist, so the final joins don't multiply
+-- albums by tracks and the counts and sums need no DISTINCT
+album_counts AS (
+    SELECT
+        artist_id,
+        COUNT(*) as album_count
+    FROM {{ ref('dim_albums') }}
+    {% if is_incremental() %}
+    WHERE artist_id IN (SELECT artist_id FROM changed_artists)
+    {% endif %}
+    GROUP BY artist_id
+),
+
+track_stats AS (
     SELECT
-        a.artist_id,
+        artist_id,
+        COUNT(*) as track_count,
+        SUM(track_listens) as total_listens,
+        SUM(track_favorites) as total_track_favorites
+    FROM {{ ref('fact_track_performance') }}
+    {% if is_incremental() %}
+    WHERE artist_id IN (SELECT artist_id FROM changed_artists)
+    {% endif %}
+    GROUP BY artist_id
+),
+
+artist_genre_counts AS (
+    SELECT
+        f.artist_id,
         g.genre_name,
-        ROW_NUMBER() OVER (
-            PARTITION BY a.artist_id
-            ORDER BY COUNT(*) DESC
-        ) as genre_rank
-    FROM {{ ref('dim_artists') }} a
-    JOIN {{ ref('fact_track_performance') }} f ON a.artist_id = f.artist_id
+        COUNT(*) as genre_tracks
+    FROM {{ ref('fact_track_performance') }} f
     JOIN {{ ref('bridge_track_genres') }} btg ON f.track_id = btg.track_id
     JOIN {{ ref('dim_genres') }} g ON btg.genre_id = g.genre_id
-    GROUP BY a.artist_id, g.genre_name
+    {% if is_incremental() %}
+    WHERE f.artist_id IN (SELECT artist_id FROM changed_artists)
+    {% endif %}
+    GROUP BY f.artist_id, g.genre_name
+),
+
+artist_top_genre AS (
+    -- The most common genre for each artist (ties go to the first name)
+    SELECT DISTINCT ON (artist_id)
+        artist_id,
+        genre_name
+    FROM artist_genre_counts
+    ORDER BY artist_id, genre_tracks DESC, genre_name
 ),
 
 artist_labels AS (
@@ -23,6 +93,9 @@ artist_labels AS (
         STRING_AGG(DISTINCT l.label_name, ', ') as associated_labels
     FROM {{ ref('bridge_artist_labels') }} bal
     JOIN {{ ref('dim_labels') }} l ON bal.label_id = l.label_id
+    {% if is_incremental() %}
+    WHERE bal.artist_id IN (SELECT artist_id FROM changed_artists)
+    {% endif %}
     GROUP BY bal.artist_id
 )
 
@@ -31,22 +104,19 @@ SELECT
     a.artist_name,
     a.artist_active_year_begin,
     a.artist_favorites,
-    COUNT(DISTINCT al.album_id) as album_count,
-    COUNT(DISTINCT f.track_id) as track_count,
-    COALESCE(SUM(f.track_listens), 0) as total_listens,
-    COALESCE(SUM(f.track_favorites), 0) as total_track_favorites,
+    COALESCE(ac.album_count, 0) as album_count,
+    COALESCE(ts.track_count, 0) as track_count,
+    COALESCE(ts.total_listens, 0) as total_listens,
+    COALESCE(ts.total_track_favorites, 0) as total_track_favorites,
     tg.genre_name as top_genre,
-    lab.associated_labels
+    lab.associated_labels,
+    now() AS _loaded_at
 FROM {{ ref('dim_artists') }} a
-LEFT JOIN {{ ref('dim_albums') }} al ON a.artist_id = al.artist_id
-LEFT JOIN {{ ref('fact_track_performance') }} f ON a.artist_id = f.artist_id
-LEFT JOIN artist_top_genre tg ON a.artist_id = tg.artist_id AND tg.genre_rank = 1
+LEFT JOIN album_counts ac ON a.artist_id = ac.artist_id
+LEFT JOIN track_stats ts ON a.artist_id = ts.artist_id
+LEFT JOIN artist_top_genre tg ON a.artist_id = tg.artist_id
 LEFT JOIN artist_labels lab ON a.artist_id = lab.artist_id
-GROUP BY
-    a.artist_id,
-    a.artist_name,
-    a.artist_active_year_begin,
-    a.artist_favorites,
-    tg.genre_name,
-    lab.associated_labels
-ORDER BY total_listens DESC, a.artist_favorites DESC
\ No newline at end of file
+{% if is_incremental() %}
+WHERE a.artist_id IN (SELECT artist_id FROM changed_artists)
+{% endif %}
+ORDER BY total_listens DESC, a.artist_favorites DESC
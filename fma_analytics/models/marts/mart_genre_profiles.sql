@@ -1,16 +1,52 @@
+{{ config(
+    materialized='incremental',
+    unique_key='genre_name',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['genre_name'], 'unique': True},
+        {'columns': ['track_count']}
+    ],
+    pre_hook="{% if is_incremental() %}DELETE FROM {{ this }} WHERE genre_name NOT IN (SELECT genre_name FROM {{ ref('dim_genres') }}){% endif %}"
+) }}
+
+-- Incremental runs recompute only the genres with new or changed
+-- genre, track-genre or track rows (the pre-hook drops renamed genres).
+-- A track that leaves a genre deletes a track-genre row, which the core
+-- models only take on a full refresh, so genres never lose tracks here
+{% if is_incremental() %}
+WITH changed_genres AS (
+    SELECT genre_id
+    FROM {{ ref('dim_genres') }}
+    WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT genre_id
+    FROM {{ ref('bridge_track_genres') }}
+    WHERE _loaded_at > {{ last_refresh() }}
+    UNION
+    SELECT btg.genre_id
+    FROM {{ ref('fact_track_performance') }} f
+    JOIN {{ ref('bridge_track_genres') }} btg ON f.track_id = btg.track_id
+    WHERE f._loaded_at > {{ last_refresh() }}
+)
+{% endif %}
+
 SELECT
     g.genre_name,
-    COUNT(DISTINCT t.track_id) as track_count,
-    AVG(a.danceability) as avg_danceability,
-    AVG(a.energy) as avg_energy,
-    AVG(a.acousticness) as avg_acousticness,
-    AVG(a.instrumentalness) as avg_instrumentalness,
-    AVG(a.liveness) as avg_liveness,
-    AVG(a.speechiness) as avg_speechiness,
-    AVG(a.valence) as avg_valence
-FROM {{ source('public', 'Genres') }} g
-JOIN {{ source('public', 'TrackGenres') }} tg ON g.genre_id = tg.genre_id
-JOIN {{ source('public', 'Tracks') }} t ON tg.track_id = t.track_id
-LEFT JOIN {{ source('public', 'Audio') }} a ON t.track_id = a.track_id
+    COUNT(DISTINCT f.track_id) as track_count,
+    AVG(f.danceability) as avg_danceability,
+    AVG(f.energy) as avg_energy,
+    AVG(f.acousticness) as avg_acousticness,
+    AVG(f.instrumentalness) as avg_instrumentalness,
+    AVG(f.liveness) as avg_liveness,
+    AVG(f.speechiness) as avg_speechiness,
+    AVG(f.valence) as avg_valence,
+    now() AS _loaded_at
+FROM {{ ref('dim_genres') }} g
+JOIN {{ ref('bridge_track_genres') }} btg ON g.genre_id = btg.genre_id
+JOIN {{ ref('fact_track_performance') }} f ON btg.track_id = f.track_id
+{% if is_incremental() %}
+WHERE g.genre_id IN (SELECT genre_id FROM changed_genres)
+{% endif %}
 GROUP BY g.genre_name
-HAVING COUNT(DISTINCT t.track_id) > 0
\ No newline at end of file
+HAVING COUNT(DISTINCT f.track_id) > 0
+ORDER BY track_count DESC
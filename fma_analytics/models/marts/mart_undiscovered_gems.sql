@@ -1,4 +1,10 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='table',
+    indexes=[
+        {'columns': ['song_hotttnesss']},
+        {'columns': ['track_id'], 'unique': True}
+    ]
+) }}
 
 WITH global_avg AS (
     SELECT AVG(track_listens) as avg_listens FROM {{ ref('fact_track_performance') }}
@@ -12,4 +18,5 @@ FROM {{ ref('fact_track_performance') }} f
 JOIN {{ ref('dim_artists') }} a ON f.artist_id = a.artist_id
 CROSS JOIN global_avg ga
 WHERE f.song_hotttnesss > 0.3
-  AND f.track_listens < ga.avg_listens
\ No newline at end of file
+  AND f.track_listens < ga.avg_listens
+ORDER BY f.song_hotttnesss DESC
\ No newline at end of file
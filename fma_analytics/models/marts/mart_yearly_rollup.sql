@@ -0,0 +1,108 @@
+{{ config(
+    materialized='incremental',
+    unique_key='release_year',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['grain', 'rank_in_year', 'release_year']},
+        {'columns': ['grain', 'genre_name', 'rank_in_genre_year', 'release_year']},
+        {'columns': ['release_year']}
+    ],
+    pre_hook="{{ delete_emptied_years() }}"
+) }}
+
+-- Listens, favorites and track counts per year, at four grains:
+--   'year'              one row per year
+--   'year_artist'       one row per year and artist
+--   'year_genre'        one row per year and genre (a track counts in each of its genres)
+--   'year_genre_artist' one row per year, genre and artist
+-- Artists are grouped by artist_id, so two artists with the same name keep
+-- separate rows.
+-- rank_in_year numbers the rows of a grain within the year by listens;
+-- rank_in_genre_year numbers the artists within a year and genre. Ties are
+-- broken by name, so a top-N-per-year widget reading one grain with
+-- rank_in_year <= N gets exactly N rows per year, through a range scan on the
+-- first index. The 'year_genre' grain is the exception: tied genres share a
+-- rank (RANK), as the dashboard's top genres widget always ranked them, so it
+-- can return more than N genres for a year.
+--
+-- The genre grains are built from the track-genre rows and the others from the
+-- tracks, so artist and year totals count every track once.
+-- Incremental runs rebuild only the years with new or changed rows, including
+-- the year a changed track was in before; the pre-hook deletes the years of
+-- those that have no tracks left.
+WITH
+{% if is_incremental() %}
+changed_years AS (
+    {{ rollup_changed_years() }}
+),
+{% endif %}
+
+dated_tracks AS (
+    SELECT
+        f.track_id,
+        EXTRACT(YEAR FROM f.track_date_recorded)::integer as release_year,
+        f.artist_id,
+        a.artist_name,
+        f.track_listens,
+        f.track_favorites
+    FROM {{ ref('fact_track_performance') }} f
+    JOIN {{ ref('dim_artists') }} a ON f.artist_id = a.artist_id
+    WHERE f.track_date_recorded IS NOT NULL
+    {% if is_incremental() %}
+      AND EXTRACT(YEAR FROM f.track_date_recorded)::integer IN (SELECT release_year FROM changed_years)
+    {% endif %}
+),
+
+rollup AS (
+    SELECT
+        CASE WHEN GROUPING(artist_id) = 0 THEN 'year_artist' ELSE 'year' END as grain,
+        release_year,
+        NULL::varchar as genre_name,
+        artist_id,
+        artist_name,
+        COUNT(*) as track_count,
+        COALESCE(SUM(track_listens), 0) as total_listens,
+        COALESCE(SUM(track_favorites), 0) as total_favorites
+    FROM dated_tracks
+    GROUP BY GROUPING SETS ((release_year), (release_year, artist_id, artist_name))
+
+    UNION ALL
+
+    SELECT
+        CASE WHEN GROUPING(t.artist_id) = 0 THEN 'year_genre_artist' ELSE 'year_genre' END as grain,
+        t.release_year,
+        g.genre_name,
+        t.artist_id,
+        t.artist_name,
+        COUNT(*) as track_count,
+        COALESCE(SUM(t.track_listens), 0) as total_listens,
+        COALESCE(SUM(t.track_favorites), 0) as total_favorites
+    FROM dated_tracks t
+    JOIN {{ ref('bridge_track_genres') }} btg ON t.track_id = btg.track_id
+    JOIN {{ ref('dim_genres') }} g ON btg.genre_id = g.genre_id
+    GROUP BY GROUPING SETS ((t.release_year, g.genre_name), (t.release_year, g.genre_name, t.artist_id, t.artist_name))
+)
+
+SELECT
+    grain,
+    release_year,
+    genre_name,
+    artist_id,
+    artist_name,
+    track_count,
+    total_listens,
+    total_favorites,
+    CASE WHEN grain = 'year_genre' THEN
+        RANK() OVER (PARTITION BY grain, release_year ORDER BY total_listens DESC)
+    ELSE
+        ROW_NUMBER() OVER (
+            PARTITION BY grain, release_year
+            ORDER BY total_listens DESC, genre_name, artist_name, artist_id
+        )
+    END as rank_in_year,
+    CASE WHEN grain = 'year_genre_artist' THEN
+        ROW_NUMBER() OVER (PARTITION BY grain, release_year, genre_name ORDER BY total_listens DESC, artist_name, artist_id)
+    END as rank_in_genre_year,
+    now() AS _loaded_at
+FROM rollup
+ORDER BY grain, rank_in_year, release_year
@@ -0,0 +1,215 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# One compact in-memory type for every FMA column, shared by the cleaning step
+# (clean_and_report.py), the loader (ingest_data.py) and the dashboard
+# (streamlit_app/utils/db_connection.py). The same column name gets the same type
+# wherever it is read, e.g. the ID columns are 32-bit everywhere.
+#
+#   'int32'    - integer column that is never missing (primary keys)
+#   'Int32'    - integer column that can be missing (foreign keys, counts)
+#   'int64', 'Int64' - the same, for numbers outside the 32-bit range
+#   'float32'  - measurements; the database stores these as REAL, i.e. 32-bit, anyway
+#   'category' - text with only a handful of distinct values
+#   'date'     - dates, stored as datetime64
+#   'text'     - free text, stored as Arrow strings (TEXT_DTYPE), which take a fraction
+#                of the memory of one Python object per value
+FMA_DTYPES = {
+    # Keys
+    'track_id': 'int32',
+    'genre_id': 'int32',
+    'album_id': 'Int32',
+    'artist_id': 'Int32',
+    'genre_parent_id': 'Int32',
+    'parent_id': 'Int32',
+    'root_genre_id': 'Int32',
+    'license_id': 'Int32',
+    'label_id': 'Int32',
+    'engineer_id': 'Int32',
+    'lyricist_id': 'Int32',
+    'composer_id': 'Int32',
+    'producer_id': 'Int32',
+
+    # Counts and other whole numbers
+    'artist_active_year_begin': 'Int32',
+    'artist_favorites': 'Int32',
+    'album_favorites': 'Int32',
+    'album_listens': 'Int32',
+    'album_tracks': 'Int32',
+    'track_bit_rate': 'Int32',
+    'track_favorites': 'Int32',
+    'track_listens': 'Int32',
+    'depth': 'Int32',
+
+    # Coordinates and Echonest features
+    'artist_latitude': 'float32',
+    'artist_longitude': 'float32',
+    'acousticness': 'float32',
+    'danceability': 'float32',
+    'energy': 'float32',
+    'instrumentalness': 'float32',
+    'liveness': 'float32',
+    'speechiness': 'float32',
+    'tempo': 'float32',
+    'valence': 'float32',
+    'artist_discovery': 'float32',
+    'artist_familiarity': 'float32',
+    'artist_hotttnesss': 'float32',
+    'song_currency': 'float32',
+    'song_hotttnesss': 'float32',
+
+    # Low-cardinality text
+    'album_type': 'category',
+    'license_title': 'category',
+    'license_url': 'category',
+    'track_language_code': 'category',
+    'track_duration': 'category',
+
+    # Dates
+    'album_date_released': 'date',
+    'track_date_recorded': 'date',
+
+    # Free text
+    'genre_title': 'text',
+    'genre_name': 'text',
+    'artist_name': 'text',
+    'artist_handle': 'text',
+    'artist_website': 'text',
+    'artist_location': 'text',
+    'artist_contact': 'text',
+    'artist_members': 'text',
+    'artist_associated_labels': 'text',
+    'album_title': 'text',
+    'album_url': 'text',
+    'album_engineer': 'text',
+    'album_producer': 'text',
+    'track_title': 'text',
+    'track_url': 'text',
+    'track_composer': 'text',
+    'track_lyricist': 'text',
+    'track_genres': 'text',
+    'ancestor_path': 'text',
+}
+
+# Date formats found in the raw files, tried in this order. Giving them explicitly
+# (instead of letting pandas guess from the first value) means a date is parsed the
+# same way whether a file is read whole or chunk by chunk.
+DATE_FORMATS = ['%m/%d/%Y', 'ISO8601']
+
+TEXT_DTYPE = 'string[pyarrow]'
+
+INT32_MIN, INT32_MAX = np.iinfo('int32').min, np.iinfo('int32').max
+
+
+def parse_dates(values):
+    """Parse a column of dates (strings or date objects) using DATE_FORMATS. Anything else becomes NaT."""
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+        # Already dates, e.g. datetime.date objects from a database query
+        return pd.to_datetime(values, errors='coerce')
+
+    dates = pd.to_datetime(values, format=DATE_FORMATS[0], errors='coerce')
+    for date_format in DATE_FORMATS[1:]:
+        missing = dates.isna() & values.notna()
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(values[missing], format=date_format, errors='coerce')
+    return dates.dt.normalize()
+
+
+def to_integer(values, dtype):
+    """
+    Convert a column to the integer type dtype ('int32', 'Int32', 'int64' or 'Int64').
+    Values that can't be converted become missing; a column with missing values gets
+    the nullable type even if 'int32' or 'int64' was asked for, and one with numbers
+    outside the 32-bit range keeps 64 bits.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    if dtype in ('int64', 'Int64'):
+        if dtype == 'int64' and not numbers.isna().any():
+            return numbers.astype('int64')
+        return numbers.round().astype('Int64')
+    if numbers.notna().any() and (numbers.min() < INT32_MIN or numbers.max() > INT32_MAX):
+        return numbers.round().astype('Int64')
+    if dtype == 'int32' and not numbers.isna().any():
+        return numbers.astype('int32')
+    return numbers.round().astype('Int32')
+
+
+def apply_dtypes(df, numpy_only=False, dtypes=None):
+    """
+    Convert every column of df that is in FMA_DTYPES to its compact type, in place.
+    Columns the registry doesn't know are left alone. dtypes replaces the registry,
+    e.g. with the 'dtypes' map generate_file_schema.py infers for a file. With numpy_only=True, integer
+    columns with missing values stay float64 (what read_sql returns for them) instead
+    of becoming the pandas 'Int32' type, and text stays as Python strings, for code
+    (such as plotting libraries) that only understands plain NumPy types.
+    Returns df.
+    """
+    if dtypes is None:
+        dtypes = FMA_DTYPES
+
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if dtype is None:
+            continue
+        values = df[column]
+
+        if dtype in ('int32', 'Int32', 'int64', 'Int64'):
+            if values.dtype.name.lower() != dtype.lower():
+                values = to_integer(values, dtype)
+            if numpy_only and values.dtype.name in ('Int32', 'Int64'):
+                values = (values.astype(values.dtype.name.lower()) if not values.isna().any()
+                          else values.astype('float64'))
+        elif dtype == 'float32':
+            values = pd.to_numeric(values, errors='coerce').astype('float32')
+        elif dtype == 'category':
+            if values.dtype.name != 'category':
+                values = values.where(values.isna(), values.astype(str)).astype('category')
+        elif dtype == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = parse_dates(values)
+        elif dtype == 'text' and not numpy_only:
+            if values.dtype != TEXT_DTYPE:
+                values = values.astype(TEXT_DTYPE)
+
+        df[column] = values
+    return df
+
+
+def default_memory_bytes(df):
+    """
+    Estimate how much memory df would take with pandas' default types
+    (int64/float64 numbers, object strings), without building that copy.
+    Used to report the saving on frames that were read in compact form.
+    """
+    total = df.index.memory_usage()
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # As object strings, every row would point to its own Python string
+            total += 8 * len(values) + sum(count * sys.getsizeof(value)
+                                           for value, count in values.value_counts(dropna=False).items())
+        elif isinstance(values.dtype, pd.StringDtype):
+            # A Python str object takes 49 bytes plus one byte per (ASCII) character, NaN 24 bytes
+            present = values.notna()
+            total += 8 * len(values) + int((values[present].str.len() + 49).sum()) + 24 * int((~present).sum())
+        elif values.dtype == object:
+            total += values.memory_usage(deep=True, index=False)
+        else:
+            total += 8 * len(values)
+    return int(total)
+
+
+def memory_report(label, df, before_bytes=None):
+    """
+    Print the memory used by a frame after conversion, compared with before_bytes
+    (default: the estimate for pandas' default types).
+    """
+    if before_bytes is None:
+        before_bytes = default_memory_bytes(df)
+    after_bytes = df.memory_usage(deep=True).sum()
+    ratio = before_bytes / after_bytes if after_bytes else 1.0
+    print(f"  {label}: {before_bytes / 1024 ** 2:,.1f} MB -> {after_bytes / 1024 ** 2:,.1f} MB in memory "
+          f"({ratio:.1f}x smaller)")
@@ -0,0 +1,195 @@
+import ast
+import hashlib
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Parsed results are cached here, keyed by the hash of the file they came from,
+# so clean_and_report.py and ingest_data.py never parse the same file twice.
+CACHE_DIR = '.fma_cache'
+
+# The track_genres column holds a Python-style list of dicts, e.g.
+# "[{'genre_id': '21', 'genre_title': 'Hip-Hop', 'genre_url': '...'}]"
+# We only need the genre_id values, so a regex is enough for well-formed rows.
+GENRE_ID_PATTERN = r"""['"]genre_id['"]\s*:\s*['"]?(\d+)"""
+
+# Contributor columns (engineers, lyricists, labels, ...) can hold several names in
+# one field, separated by commas, ampersands or line breaks
+TOKEN_SEPARATOR = r'[,&\n]'
+
+# Parquet tracks files are parsed this many rows at a time, so the genre strings
+# of a large file are never all in memory at once
+PARSE_BATCH_ROWS = 100_000
+
+
+# Hashes already computed in this process, keyed by (path, size, modification time),
+# so the cache lookups below hash each file only once per run
+_fingerprints = {}
+
+
+def file_fingerprint(file_path, block_size=1024 * 1024):
+    """Return the SHA-256 hash of a file's contents."""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+    if key not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        _fingerprints[key] = digest.hexdigest()
+    return _fingerprints[key]
+
+
+def read_track_genre_strings(tracks_file):
+    """Read just the track_id and track_genres columns of a cleaned tracks file (Parquet or CSV)."""
+    columns = ['track_id', 'track_genres']
+    if tracks_file.endswith('.parquet'):
+        return pd.read_parquet(tracks_file, columns=columns, memory_map=True)
+    return pd.read_csv(tracks_file, usecols=columns)
+
+
+def parse_genre_list(genre_string):
+    """
+    Slow path: parse one track_genres value with ast.literal_eval.
+    Returns a list of genre IDs, or an empty list if the value can't be parsed.
+    """
+    try:
+        return [int(genre.get('genre_id')) for genre in ast.literal_eval(genre_string)]
+    except (ValueError, SyntaxError, TypeError, AttributeError):
+        return []
+
+
+def parse_track_genres(tracks_df):
+    """
+    Extract every (track_id, genre_id) pair from the track_genres column in bulk.
+    Rows the regex can't handle fall back to ast.literal_eval.
+    Returns a two-column int32 DataFrame without duplicates.
+    """
+    genre_strings = tracks_df[['track_id', 'track_genres']].dropna()
+    genre_strings = genre_strings.set_index(genre_strings['track_id'].astype('int64'))['track_genres'].astype(str)
+
+    # Fast path: one regex pass over the whole column
+    matches = genre_strings.str.extractall(GENRE_ID_PATTERN)
+    pairs = pd.DataFrame({
+        'track_id': matches.index.get_level_values(0).to_numpy(),
+        'genre_id': matches[0].astype('int64').to_numpy(),
+    })
+
+    # Fallback: rows with no regex match that still look like a non-empty list
+    matched_ids = matches.index.get_level_values(0).unique()
+    unmatched = genre_strings[~genre_strings.index.isin(matched_ids)]
+    unmatched = unmatched[unmatched.str.strip() != '[]']
+    if not unmatched.empty:
+        fallback = unmatched.map(parse_genre_list).explode().dropna()
+        pairs = pd.concat([pairs, pd.DataFrame({
+            'track_id': fallback.index.to_numpy(dtype='int64'),
+            'genre_id': fallback.to_numpy(dtype='int64'),
+        })], ignore_index=True)
+
+    return pairs.astype('int32').drop_duplicates().reset_index(drop=True)
+
+
+def load_track_genres(tracks_file):
+    """
+    Return the (track_id, genre_id) pairs for a cleaned tracks file.
+    The result is cached on disk keyed by the file hash, so a second call on an
+    unchanged file just loads a small integer array.
+    """
+    cache_file = os.path.join(CACHE_DIR, f"track_genres_{file_fingerprint(tracks_file)}.npy")
+
+    if os.path.exists(cache_file):
+        pairs = np.load(cache_file)
+    elif tracks_file.endswith('.parquet'):
+        batches = pq.ParquetFile(tracks_file).iter_batches(batch_size=PARSE_BATCH_ROWS,
+                                                            columns=['track_id', 'track_genres'])
+        parsed = [parse_track_genres(batch.to_pandas()) for batch in batches]
+        pairs = (pd.concat(parsed, ignore_index=True).drop_duplicates().to_numpy(dtype='int32') if parsed
+                 else np.empty((0, 2), dtype='int32'))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.save(cache_file, pairs)
+    else:
+        tracks = read_track_genre_strings(tracks_file)
+        pairs = parse_track_genres(tracks).to_numpy(dtype='int32')
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.save(cache_file, pairs)
+
+    return pd.DataFrame(pairs.reshape(-1, 2), columns=['track_id', 'genre_id'])
+
+
+def tokenize_column(df, id_column, value_column):
+    """
+    Split a multi-valued text column (e.g. album_engineer = 'A, B & C') into a long
+    table with one (id, token) row per name. Names are stripped of surrounding
+    whitespace; empty names and repeated names for the same id are dropped.
+    """
+    values = df[[id_column, value_column]].dropna(subset=[value_column])
+    tokens = (values.assign(token=values[value_column].astype(str).str.split(TOKEN_SEPARATOR))
+              .explode('token')[[id_column, 'token']])
+    tokens['token'] = tokens['token'].str.strip()
+    tokens = tokens[tokens['token'] != ''].drop_duplicates()
+    return tokens.astype({id_column: 'int32'}).reset_index(drop=True)
+
+
+def load_tokens(file_path, id_column, value_column):
+    """
+    Return the (id, token) table of one multi-valued column of a cleaned file.
+    Like load_track_genres, the result is cached on disk keyed by the file hash (and the
+    separator pattern), so the lookup tables, the linking tables and the coverage report
+    all reuse one tokenization of the column.
+    """
+    cache_key = hashlib.sha256(f"{file_fingerprint(file_path)}{TOKEN_SEPARATOR}".encode()).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, f"tokens_{value_column}_{cache_key}.parquet")
+
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file)
+
+    if file_path.endswith('.parquet'):
+        df = pd.read_parquet(file_path, columns=[id_column, value_column])
+    else:
+        df = pd.read_csv(file_path, usecols=[id_column, value_column], dtype={value_column: str})
+    tokens = tokenize_column(df, id_column, value_column)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tokens.to_parquet(cache_file, index=False)
+    return tokens
+
+
+def parse_track_genres_loop(tracks_df):
+    """The original row-by-row parser, kept only for the benchmark below."""
+    records = []
+    for _, row in tracks_df[['track_id', 'track_genres']].dropna().iterrows():
+        try:
+            for genre in ast.literal_eval(row['track_genres']):
+                records.append({'track_id': int(row['track_id']), 'genre_id': int(genre.get('genre_id'))})
+        except (ValueError, SyntaxError, TypeError, AttributeError):
+            continue
+    return pd.DataFrame(records, columns=['track_id', 'genre_id']).drop_duplicates()
+
+
+def benchmark(tracks_file):
+    """Compare the row-by-row parser with the vectorized one on a cleaned tracks file."""
+    tracks = read_track_genre_strings(tracks_file)
+    print(f"Benchmarking track_genres parsing on {len(tracks):,} tracks from {tracks_file}")
+
+    start = time.perf_counter()
+    old_pairs = parse_track_genres_loop(tracks)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_pairs = parse_track_genres(tracks)
+    new_time = time.perf_counter() - start
+
+    # Make sure both parsers found exactly the same links
+    old_set = set(map(tuple, old_pairs.to_numpy()))
+    new_set = set(map(tuple, new_pairs.to_numpy()))
+    print(f"  iterrows + literal_eval: {old_time:.3f}s ({len(old_pairs):,} pairs)")
+    print(f"  vectorized regex:        {new_time:.3f}s ({len(new_pairs):,} pairs)")
+    print(f"  speedup: {old_time / new_time:.1f}x, results identical: {old_set == new_set}")
+
+
+if __name__ == '__main__':
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else os.path.join('fma_metadata_cleaned', 'clean_tracks.parquet'))
@@ -1,70 +1,269 @@
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
-# List of directories to scan for CSV files.
+from fma_dtypes import INT32_MAX, INT32_MIN, parse_dates
+
+# List of directories to scan for data files.
 DIRECTORIES_TO_SCAN = [
-    'fma_metadata',  # The raw data
-    'fma_metadata_cleaned'  # The cleaned data
+    'fma_metadata',  # The raw data (CSV)
+    'fma_metadata_cleaned'  # The cleaned data (Parquet, plus CSV with --csv)
 ]
 
 # The path where the final JSON file will be saved.
 OUTPUT_JSON_PATH = 'files_schema.json'
 
+# Files are read this many rows at a time, so a file is never fully in memory.
+CHUNK_ROWS = 100_000
+
+# Files are profiled in parallel, one per worker process.
+WORKERS = os.cpu_count() or 1
+
+# Distinct counts are estimated from the K smallest value hashes (a "K minimum
+# values" sketch, about 3% error at K = 1024), so memory doesn't grow with the
+# number of distinct values. Below K distinct values the count is exact.
+DISTINCT_SKETCH_SIZE = 1024
+
+# Whole numbers outside the 64-bit range are typed as 'text'.
+INT64_MIN, INT64_MAX = np.iinfo('int64').min, np.iinfo('int64').max
+
+# Top values: the most frequent candidates are kept from chunk to chunk. The
+# counts are exact unless a column has more distinct values than this.
+TOP_CANDIDATES = 1000
+TOP_VALUES = 5
+
+# Text with at most this many distinct values (and mostly repeated values) is
+# typed as 'category'.
+CATEGORY_MAX_DISTINCT = 100
+
+# The raw echonest file has two extra rows of headers above the column names,
+# and a row naming the track_id column below them.
+CSV_READ_OPTIONS = {'raw_echonest.csv': {'header': 2, 'skiprows': [3]}}
+
 # --- Automatically build full paths ---
 CWD = os.getcwd()
 OUTPUT_JSON_FULL_PATH = os.path.join(CWD, OUTPUT_JSON_PATH)
 
 
-def get_directory_schema(directory_path, num_samples=3):
+class ColumnProfile:
     """
-    Reads all CSV files in a single directory and extracts their schema.
+    Running profile of one column, updated one chunk at a time.
+
+    The inferred type uses the names from the fma_dtypes.py registry ('int32',
+    'Int32', 'int64', 'Int64', 'float32', 'date', 'category', 'text'), so the
+    per-file 'dtypes' map in files_schema.json can be passed straight to
+    fma_dtypes.apply_dtypes.
+
+    The min/max of numbers, of typed dates and of the values as text are kept
+    apart, so a column that turns out not to be numeric in a later chunk still
+    reports the range of every value, whatever the chunk size.
     """
-    dir_schema = {}
 
-    if not os.path.isdir(directory_path):
-        print(f"Warning: Directory '{directory_path}' not found. Skipping.")
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.is_numeric = True
+        self.is_integer = True
+        self.is_date = True
+        self.number_range = None
+        self.date_range = None
+        self.text_range = None
+        self.hashes = np.empty(0, dtype='uint64')
+        self.top = pd.Series(dtype='int64')
+
+    def update(self, values):
+        """Add one chunk of the column."""
+        self.rows += len(values)
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        if present.empty:
+            return
+
+        # Typed Parquet columns: dates aren't numbers, categories are text
+        if pd.api.types.is_datetime64_any_dtype(present):
+            self.is_numeric = False
+            self.date_range = widen_range(self.date_range, present.min(), present.max())
+        elif isinstance(present.dtype, pd.CategoricalDtype):
+            present = present.astype(str)
+
+        if self.is_numeric:
+            numbers = pd.to_numeric(present, errors='coerce')
+            if numbers.isna().any():
+                self.is_numeric = False
+            else:
+                self.is_integer = self.is_integer and bool((numbers % 1 == 0).all())
+                self.number_range = widen_range(self.number_range, numbers.min(), numbers.max())
+
+        if not self.is_numeric and self.is_date:
+            self.is_date = bool(parse_dates(present).notna().all())
+
+        text = present.astype(str)
+        self.text_range = widen_range(self.text_range, text.min(), text.max())
+        hashes = pd.util.hash_pandas_object(text, index=False).to_numpy()
+        self.hashes = np.unique(np.concatenate([self.hashes, hashes]))[:DISTINCT_SKETCH_SIZE]
+        self.top = self.top.add(text.value_counts(), fill_value=0).nlargest(TOP_CANDIDATES)
+
+    def value_range(self):
+        """(min, max) of the column: as numbers, as dates for date-typed columns, otherwise as text."""
+        if self.is_numeric:
+            return self.number_range or (None, None)
+        return self.date_range or self.text_range or (None, None)
+
+    def distinct_estimate(self):
+        """Number of distinct values: exact below the sketch size, estimated above it."""
+        if len(self.hashes) < DISTINCT_SKETCH_SIZE:
+            return len(self.hashes)
+        kth_smallest = self.hashes[DISTINCT_SKETCH_SIZE - 1] / 2.0 ** 64
+        return int(round((DISTINCT_SKETCH_SIZE - 1) / kth_smallest))
+
+    def dtype(self):
+        """The fma_dtypes type this column should be read as."""
+        non_null = self.rows - self.nulls
+        if non_null == 0:
+            return 'text'
+        if self.is_numeric:
+            if self.is_integer:
+                low, high = self.number_range
+                if INT32_MIN <= low and high <= INT32_MAX:
+                    bits = 32
+                elif INT64_MIN <= low and high <= INT64_MAX:
+                    bits = 64
+                else:
+                    return 'text'
+                return f"int{bits}" if self.nulls == 0 else f"Int{bits}"
+            return 'float32'
+        if self.is_date:
+            return 'date'
+        distinct = self.distinct_estimate()
+        if distinct <= CATEGORY_MAX_DISTINCT and distinct <= non_null / 2:
+            return 'category'
+        return 'text'
+
+    def result(self):
+        """The profile as plain JSON-friendly values."""
+        minimum, maximum = self.value_range()
+        return {
+            'dtype': self.dtype(),
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_percent': round(self.nulls / self.rows * 100, 2) if self.rows else 0.0,
+            'distinct_estimate': self.distinct_estimate(),
+            'min': to_json_value(minimum),
+            'max': to_json_value(maximum),
+            'top_values': [{'value': value, 'count': int(count)}
+                           for value, count in self.top.head(TOP_VALUES).items()],
+        }
+
+
+def widen_range(current, low, high):
+    """A (min, max) pair widened to include low and high (just those when there is none yet)."""
+    if current is None:
+        return low, high
+    return min(current[0], low), max(current[1], high)
+
+
+def to_json_value(value):
+    """Turn numpy numbers and timestamps into values json can write."""
+    if value is None:
         return None
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
 
-    print(f"\nScanning directory: '{directory_path}'...")
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(directory_path, filename)
-            try:
-                # Read just the header to get all column names correctly.
-                header_df = pd.read_csv(file_path, nrows=0, low_memory=False)
-                # Read a few sample rows for the example.
-                sample_df = pd.read_csv(file_path, nrows=num_samples, low_memory=False)
-
-                dir_schema[filename] = {
-                    'columns': header_df.columns.tolist(),
-                    'example_rows': sample_df.to_dict(orient='records')
-                }
-                print(f"  - Processed '{filename}'")
-            except Exception as e:
-                print(f"  - Could not process file {filename}. Error: {e}")
 
-    return dir_schema
+def read_chunks(file_path):
+    """Stream a CSV or Parquet file as DataFrame chunks. CSV values are kept as text for type inference."""
+    if file_path.endswith('.parquet'):
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=CHUNK_ROWS):
+            yield batch.to_pandas()
+    else:
+        options = CSV_READ_OPTIONS.get(os.path.basename(file_path), {})
+        yield from pd.read_csv(file_path, dtype=str, chunksize=CHUNK_ROWS, **options)
+
+
+def profile_file(file_path, num_samples=3):
+    """
+    Profile one file in a single pass: column types, null counts, distinct-count
+    estimates, min/max and top values, plus a few example rows.
+    """
+    started = time.perf_counter()
+    profiles = {}
+    example_rows = []
+    rows = 0
+
+    for chunk in read_chunks(file_path):
+        if not profiles:
+            profiles = {column: ColumnProfile() for column in chunk.columns}
+            example_rows = chunk.head(num_samples).to_dict(orient='records')
+        for column, profile in profiles.items():
+            profile.update(chunk[column])
+        rows += len(chunk)
+
+    columns = {column: profile.result() for column, profile in profiles.items()}
+    return {
+        'format': 'parquet' if file_path.endswith('.parquet') else 'csv',
+        'rows': rows,
+        'columns': list(columns),
+        'dtypes': {column: result['dtype'] for column, result in columns.items()},
+        'column_profiles': columns,
+        'example_rows': example_rows,
+        'profile_seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def find_files(directory_path):
+    """The CSV and Parquet files in one directory."""
+    if not os.path.isdir(directory_path):
+        print(f"Warning: Directory '{directory_path}' not found. Skipping.")
+        return []
+    return sorted(os.path.join(directory_path, filename) for filename in os.listdir(directory_path)
+                  if filename.endswith(('.csv', '.parquet')))
 
 
 def main():
     """
-    Main function to generate and save the schema for all specified directories.
+    Profile every file in the scanned directories in parallel and save the result.
     """
+    started = time.perf_counter()
     full_schema = {}
 
-    for dir_name in DIRECTORIES_TO_SCAN:
-        dir_full_path = os.path.join(CWD, dir_name)
-        schema = get_directory_schema(dir_full_path)
-        if schema:
-            full_schema[dir_name] = schema
+    files = [(dir_name, file_path) for dir_name in DIRECTORIES_TO_SCAN
+             for file_path in find_files(os.path.join(CWD, dir_name))]
+    print(f"Profiling {len(files)} files with {WORKERS} workers...")
+
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        futures = {pool.submit(profile_file, file_path): (dir_name, file_path) for dir_name, file_path in files}
+        for future in as_completed(futures):
+            dir_name, file_path = futures[future]
+            filename = os.path.basename(file_path)
+            try:
+                profile = future.result()
+            except Exception as e:
+                print(f"  - Could not process file {filename}. Error: {e}")
+                continue
+            full_schema.setdefault(dir_name, {})[filename] = profile
+            print(f"  - Profiled '{os.path.join(dir_name, filename)}': {profile['rows']:,} rows, "
+                  f"{len(profile['columns'])} columns in {profile['profile_seconds']:.2f}s")
+
+    # Same order as the directories and files were listed, whatever order they finished in
+    full_schema = {dir_name: dict(sorted(full_schema[dir_name].items()))
+                   for dir_name in DIRECTORIES_TO_SCAN if dir_name in full_schema}
 
     if full_schema:
         try:
             with open(OUTPUT_JSON_FULL_PATH, 'w') as json_file:
-                json.dump(full_schema, json_file, indent=4)
-            print(f"\nSuccessfully created JSON schema at: '{OUTPUT_JSON_FULL_PATH}'")
+                json.dump(full_schema, json_file, indent=4, default=str)
+            print(f"\nSuccessfully created JSON schema at: '{OUTPUT_JSON_FULL_PATH}' "
+                  f"({time.perf_counter() - started:.2f}s)")
         except Exception as e:
             print(f"\nError saving to JSON file: {e}")
 
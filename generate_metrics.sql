@@ -225,8 +225,9 @@ ORDER BY avg_energy DESC;
 
 \echo '-- Q2: Top Artists Yearly (From DBT Mart) --'
 EXPLAIN (ANALYZE, BUFFERS)
-SELECT * FROM analytics.mart_top_artists_yearly
-WHERE rank_in_year <= 3
+SELECT * FROM analytics.mart_yearly_rollup
+WHERE grain = 'year_artist'
+  AND rank_in_year <= 3
 ORDER BY release_year DESC, rank_in_year ASC;
 
 \echo '-- Q3: Undiscovered Gems (From DBT Mart) --'
@@ -0,0 +1,69 @@
+from collections import defaultdict, deque
+
+import pandas as pd
+
+
+def build_genre_hierarchy(genres_df):
+    """
+    Order genres so that every parent comes before its children (Kahn's algorithm)
+    and work out where each genre sits in the tree.
+
+    Expects 'genre_id' and 'parent_id' columns. Returns two things:
+      - hierarchy: one row per loadable genre with its depth (0 = top level),
+        root_genre_id and ancestor_path ('root/.../genre_id'), in topological order
+      - problems: genre IDs that can't be loaded, split into
+        'orphans' (parent doesn't exist, or descends from such a genre) and
+        'cycles' (part of, or below, a circular parent chain)
+    """
+    genre_ids = genres_df['genre_id'].astype(int).tolist()
+    parents = pd.to_numeric(genres_df['parent_id'], errors='coerce').tolist()
+    parent_of = {genre_id: (None if pd.isna(parent) else int(parent))
+                 for genre_id, parent in zip(genre_ids, parents)}
+
+    children = defaultdict(list)
+    for genre_id, parent_id in parent_of.items():
+        if parent_id is not None:
+            children[parent_id].append(genre_id)
+
+    # Start from the top-level genres and walk down one level at a time
+    depth = {}
+    root = {}
+    path = {}
+    queue = deque()
+    for genre_id, parent_id in parent_of.items():
+        if parent_id is None:
+            depth[genre_id], root[genre_id], path[genre_id] = 0, genre_id, str(genre_id)
+            queue.append(genre_id)
+
+    order = []
+    while queue:
+        genre_id = queue.popleft()
+        order.append(genre_id)
+        for child in children[genre_id]:
+            depth[child] = depth[genre_id] + 1
+            root[child] = root[genre_id]
+            path[child] = f"{path[genre_id]}/{child}"
+            queue.append(child)
+
+    # Anything we never reached either hangs off a missing parent or sits in a cycle
+    unreached = [genre_id for genre_id in genre_ids if genre_id not in depth]
+    orphans, cycles = [], []
+    for genre_id in unreached:
+        # Follow the parent chain until it leaves the data or comes back on itself
+        seen = set()
+        current = genre_id
+        while current is not None and current in parent_of and current not in seen:
+            seen.add(current)
+            current = parent_of[current]
+        if current is None or current not in parent_of:
+            orphans.append(genre_id)
+        else:
+            cycles.append(genre_id)
+
+    hierarchy = pd.DataFrame({
+        'genre_id': order,
+        'depth': [depth[genre_id] for genre_id in order],
+        'root_genre_id': [root[genre_id] for genre_id in order],
+        'ancestor_path': [path[genre_id] for genre_id in order],
+    })
+    return hierarchy, {'orphans': sorted(orphans), 'cycles': sorted(cycles)}
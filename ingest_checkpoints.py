@@ -0,0 +1,87 @@
+import hashlib
+import threading
+
+from sqlalchemy import text
+
+# Same definition as in schema.sql, so older databases get the table on first use
+CHECKPOINT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS "IngestCheckpoints" (
+        "run_key" VARCHAR(64) NOT NULL,
+        "step" VARCHAR(100) NOT NULL,
+        "chunk" INTEGER NOT NULL,
+        "completed_at" TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY ("run_key", "step", "chunk")
+    )
+"""
+
+
+def make_run_key(file_fingerprints, mode):
+    """
+    Identify a run by the exact input files and the way they are split into chunks.
+    A resumed run only skips work recorded under the same key, so changed data or a
+    different chunk size never reuses stale checkpoints.
+    """
+    digest = hashlib.sha256(mode.encode())
+    for name in sorted(file_fingerprints):
+        digest.update(f"{name}={file_fingerprints[name]}".encode())
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    Remembers which ingestion steps (and which chunks of them) have been committed,
+    in the "IngestCheckpoints" control table.
+    Until open() is called every step counts as not done and nothing is recorded.
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.run_key = None
+        self.done = set()
+        self.shard_checkpoints = True
+        self.lock = threading.Lock()
+
+    def open(self, engine, run_key, resume, shard_checkpoints=True):
+        """
+        Start recording checkpoints for this run.
+        With resume=True the steps finished by an earlier run with the same key are
+        loaded so they can be skipped; otherwise old checkpoints for the key are cleared.
+        """
+        self.engine = engine
+        self.run_key = run_key
+        self.shard_checkpoints = shard_checkpoints
+
+        with engine.connect() as connection:
+            connection.execute(text(CHECKPOINT_TABLE_SQL))
+            if resume:
+                rows = connection.execute(text(
+                    'SELECT step, chunk FROM "IngestCheckpoints" WHERE run_key = :run_key'),
+                    {'run_key': run_key}).fetchall()
+                self.done = {(step, chunk) for step, chunk in rows}
+            else:
+                connection.execute(text('DELETE FROM "IngestCheckpoints" WHERE run_key = :run_key'),
+                                   {'run_key': run_key})
+                self.done = set()
+            connection.commit()
+
+        return len(self.done)
+
+    def is_done(self, step, chunk=0):
+        """True if this step/chunk was committed by an earlier run with the same key."""
+        return (step, chunk) in self.done
+
+    def mark_done(self, step, chunk=0):
+        """Record that a step/chunk has been committed."""
+        if self.engine is None:
+            return
+
+        with self.engine.connect() as connection:
+            connection.execute(text("""
+                INSERT INTO "IngestCheckpoints" (run_key, step, chunk)
+                VALUES (:run_key, :step, :chunk)
+                ON CONFLICT (run_key, step, chunk) DO UPDATE SET completed_at = now()
+            """), {'run_key': self.run_key, 'step': step, 'chunk': chunk})
+            connection.commit()
+
+        with self.lock:
+            self.done.add((step, chunk))
@@ -1,11 +1,26 @@
-import ast
+import argparse
+import csv
+import io
 import os
+import re
+import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 
+from fma_dtypes import apply_dtypes, memory_report
+from fma_parsing import file_fingerprint, load_tokens, load_track_genres, parse_track_genres, tokenize_column
+from genre_hierarchy import build_genre_hierarchy
+from ingest_checkpoints import CheckpointStore, make_run_key
+from ingest_dbt import run_dbt_build
+from ingest_report import RunReport
+from validate_data import run_validation
+
 # Load database credentials from .env file
 load_dotenv()
 DB_USER = os.getenv("DB_USER")
@@ -21,6 +36,77 @@ if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME]):
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 CLEANED_DATA_DIR = 'fma_metadata_cleaned'
 
+# How each table is written to the database.
+# 'copy_csv' / 'copy_text' stream the DataFrame through COPY FROM STDIN into a
+# temporary staging table and then merge it into the real table.
+# Tables that are not listed here use the plain INSERT path (insert_data).
+LOAD_METHODS = {
+    'Tracks': 'copy_csv',
+    'TrackGenres': 'copy_csv',
+    'Audio': 'copy_csv',
+    'Social': 'copy_csv',
+}
+
+INTEGER_TYPES = {'integer', 'bigint', 'smallint'}
+
+# Large tables that are split into track_id ranges and loaded in parallel.
+# The shard count is set from the --shards command line option.
+SHARDED_TABLES = {
+    'Tracks': 1,
+    'TrackGenres': 1,
+}
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Timing, row counts and round-trips for every step of this run (see ingest_report.py)
+REPORT = RunReport()
+
+# Committed stages/chunks, so a failed run can be resumed (see ingest_checkpoints.py)
+CHECKPOINTS = CheckpointStore()
+
+# clean_and_report.py saves every cleaned table as clean_<name>.parquet with its column types
+CLEANED_FILE_NAMES = ['genres', 'artists', 'albums', 'tracks', 'echonest']
+
+# Columns that can list several names in one field ('A, B & C'):
+# column -> (cleaned table, ID column of that table)
+CONTRIBUTOR_COLUMNS = {
+    'album_engineer': ('albums', 'album_id'),
+    'album_producer': ('albums', 'album_id'),
+    'track_lyricist': ('tracks', 'track_id'),
+    'track_composer': ('tracks', 'track_id'),
+    'artist_associated_labels': ('artists', 'artist_id'),
+}
+
+# Secondary indexes from Phase 2. In --defer-indexes mode they are dropped before
+# the load and rebuilt (in parallel) afterwards, instead of being updated row by row.
+INDEX_SQL_FILE = 'phase2_optimization.sql'
+
+# --staging-swap mode: tables are loaded into an UNLOGGED copy of schema.sql in
+# STAGING_SCHEMA, then moved into public in one short transaction.
+SCHEMA_SQL_FILE = 'schema.sql'
+STAGING_SCHEMA = 'fma_staging'
+RETIRED_SCHEMA = 'fma_retired'
+SWAP_LOCK_TIMEOUT = '10s'
+CONTROL_TABLES = {'IngestCheckpoints', 'IngestDeferredDDL'}
+
+# Same definition as in schema.sql, so older databases get the table on first use
+DEFERRED_DDL_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS "IngestDeferredDDL" (
+        "kind" VARCHAR(20) NOT NULL,
+        "name" VARCHAR(100) NOT NULL,
+        "table_name" VARCHAR(200),
+        "definition" TEXT NOT NULL,
+        "dropped_at" TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY ("kind", "name")
+    )
+"""
+
+# Streaming mode: a chunk is read, transformed and written before the next one is read.
+# The transform makes a few temporary copies of each chunk (type conversion, the COPY
+# buffer or the list of records), so we budget several times the raw chunk size.
+DEFAULT_MEMORY_BUDGET_MB = 256
+CHUNK_MEMORY_OVERHEAD = 6
+
 
 def insert_data(engine, table_name, records):
     """
@@ -41,133 +127,397 @@ def insert_data(engine, table_name, records):
     with engine.connect() as connection:
         result = connection.execute(sql, records)
         connection.commit()
-        return result.rowcount
+
+    # SQLAlchemy reports an executemany as one statement, but psycopg2 sends
+    # the rows in pages, so count the extra pages as round-trips too
+    page_size = getattr(engine.dialect, 'executemany_values_page_size', 1000)
+    REPORT.count_round_trips(-(-len(records) // page_size) - 1)
+    return result.rowcount
+
+
+def get_column_types(cursor, table_name):
+    """Look up the PostgreSQL data type of every column in a table."""
+    cursor.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+    """, (table_name,))
+    return dict(cursor.fetchall())
+
+
+def prepare_copy_frame(df, column_types):
+    """
+    Make a DataFrame safe to write as COPY input.
+    COPY parses text, so '12.0' is rejected by an INTEGER column and timestamps
+    need to be written as plain dates. Columns that already have an integer type
+    (everything read from the typed cleaned files) are left alone.
+    """
+    frame = df.copy()
+    for col in frame.columns:
+        data_type = column_types.get(col)
+        if data_type in INTEGER_TYPES and not pd.api.types.is_integer_dtype(frame[col]):
+            frame[col] = pd.to_numeric(frame[col], errors='coerce').round().astype('Int64')
+        elif data_type == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(frame[col]):
+                frame[col] = pd.to_datetime(frame[col], errors='coerce')
+            frame[col] = frame[col].dt.strftime('%Y-%m-%d')
+    return frame
+
+
+def write_copy_buffer(df, copy_format):
+    """
+    Serialize a DataFrame into an in-memory file that COPY FROM STDIN can read.
+    Supports PostgreSQL's CSV format and its tab-separated text format.
+    """
+    buffer = io.StringIO()
+
+    if copy_format == 'csv':
+        # Missing values are written as empty unquoted fields, which COPY reads as NULL
+        df.to_csv(buffer, index=False, header=False)
+    else:
+        # Text format: escape backslashes, tabs and newlines, and write NULL as \N
+        escaped = pd.DataFrame(index=df.index)
+        for col in df.columns:
+            values = (df[col].astype(str)
+                      .str.replace('\\', '\\\\', regex=False)
+                      .str.replace('\t', '\\t', regex=False)
+                      .str.replace('\n', '\\n', regex=False)
+                      .str.replace('\r', '\\r', regex=False))
+            escaped[col] = values.where(df[col].notna(), '\\N')
+        escaped.to_csv(buffer, sep='\t', index=False, header=False, quoting=csv.QUOTE_NONE)
+
+    buffer.seek(0)
+    return buffer
+
+
+def copy_data(engine, table_name, df, copy_format='csv'):
+    """
+    Bulk load a DataFrame with COPY FROM STDIN.
+    Rows are copied into a temporary staging table first and then merged into the
+    real table with ON CONFLICT DO NOTHING, so reruns behave like insert_data.
+    """
+    columns = ', '.join(f'"{col}"' for col in df.columns)
+    staging_table = f"stage_{table_name.lower()}"
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        column_types = get_column_types(cursor, table_name)
+        buffer = write_copy_buffer(prepare_copy_frame(df, column_types), copy_format)
+
+        cursor.execute(f'''
+            CREATE TEMP TABLE "{staging_table}" (LIKE "{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP
+        ''')
+        cursor.copy_expert(f'COPY "{staging_table}" ({columns}) FROM STDIN WITH (FORMAT {copy_format})', buffer)
+        cursor.execute(f'''
+            INSERT INTO "{table_name}" ({columns})
+            SELECT {columns} FROM "{staging_table}"
+            ON CONFLICT DO NOTHING
+        ''')
+        inserted = cursor.rowcount
+        connection.commit()
+
+        # These statements bypass SQLAlchemy, so count them here:
+        # column types, create staging table, COPY, merge and commit
+        REPORT.count_round_trips(5)
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def dataframe_to_records(df):
+    """Convert a DataFrame to a list of dicts, turning NaN/NaT/NA into None for SQL."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def load_table_once(engine, table_name, df):
+    """
+    Write a DataFrame to a table using the method configured in LOAD_METHODS.
+    If the COPY path fails we fall back to the regular INSERT path.
+    Returns the number of inserted rows and the method that was used.
+    """
+    method = LOAD_METHODS.get(table_name, 'insert')
+
+    if method.startswith('copy_'):
+        try:
+            return copy_data(engine, table_name, df, copy_format=method[len('copy_'):]), method
+        except Exception as e:
+            print(f"  WARNING: COPY into {table_name} failed ({e}), falling back to INSERT")
+
+    return insert_data(engine, table_name, dataframe_to_records(df)), 'insert'
+
+
+def load_table(engine, table_name, df):
+    """
+    Write a DataFrame to a table and print the load rate.
+    Tables listed in SHARDED_TABLES are split into contiguous track_id ranges
+    that are loaded on threads, each shard on its own connection. Only the
+    database side overlaps: building each shard's CSV buffer holds the GIL,
+    so the serialization still runs one shard at a time.
+    """
+    if df.empty:
+        print(f"  No data to insert into {table_name}")
+        return 0
+
+    start = time.time()
+    shard_count = SHARDED_TABLES.get(table_name, 1)
+
+    with REPORT.measure('insert', table_name, rows_in=len(df)) as step:
+        if shard_count > 1 and len(df) >= shard_count:
+            ordered = df.sort_values('track_id')
+            shards = [ordered.iloc[idx] for idx in np.array_split(np.arange(len(ordered)), shard_count)]
+
+            def load_shard(shard_number, shard):
+                # Each committed shard is a checkpoint, so a resumed run only reloads the missing ranges
+                checkpoint = f"{table_name} shard"
+                if CHECKPOINTS.shard_checkpoints and CHECKPOINTS.is_done(checkpoint, shard_number):
+                    return 0, 'resumed'
+                result = load_table_once(engine, table_name, shard)
+                if CHECKPOINTS.shard_checkpoints:
+                    CHECKPOINTS.mark_done(checkpoint, shard_number)
+                return result
+
+            with ThreadPoolExecutor(max_workers=shard_count) as pool:
+                results = list(pool.map(REPORT.in_current_step(load_shard), range(1, shard_count + 1), shards))
+            count = sum(inserted for inserted, _ in results)
+            methods = [shard_method for _, shard_method in results if shard_method != 'resumed']
+            resumed = len(results) - len(methods)
+            step['rows_resumed'] = sum(len(shard) for shard, (_, shard_method) in zip(shards, results)
+                                       if shard_method == 'resumed')
+            method = f"{methods[0] if methods else 'resumed'} x{shard_count} shards"
+            if resumed:
+                method += f", {resumed} already loaded"
+        else:
+            count, method = load_table_once(engine, table_name, df)
+        step['rows_out'] = count
+
+    elapsed = time.time() - start
+    rate = len(df) / elapsed if elapsed > 0 else float('inf')
+    print(f"  {table_name}: {len(df):,} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec, {method})")
+    return count
+
+
+def cleaned_file_path(name):
+    """Path of one cleaned table written by clean_and_report.py."""
+    return os.path.join(os.getcwd(), CLEANED_DATA_DIR, f"clean_{name}.parquet")
+
+
+def read_cleaned_file(name, columns=None):
+    """
+    Read one cleaned table. The Parquet file is memory-mapped and already has the
+    compact column types from fma_dtypes.py; apply_dtypes only has to turn the text
+    columns back into Arrow strings (and upgrade files written by older versions).
+    """
+    return apply_dtypes(pd.read_parquet(cleaned_file_path(name), columns=columns, memory_map=True))
 
 
 def load_cleaned_data():
-    """Load all the cleaned CSV files into memory."""
-    data_path = os.path.join(os.getcwd(), CLEANED_DATA_DIR)
-    print(f"Loading clean data from {data_path}...")
+    """Load all the cleaned tables into memory."""
+    print(f"Loading clean data from {os.path.join(os.getcwd(), CLEANED_DATA_DIR)}...")
 
-    file_names = ['genres', 'artists', 'albums', 'tracks', 'echonest']
     data = {}
 
-    for name in file_names:
-        file_path = os.path.join(data_path, f"clean_{name}.csv")
-        data[name] = pd.read_csv(file_path)
+    for name in CLEANED_FILE_NAMES:
+        with REPORT.measure('read', f"clean_{name}.parquet") as step:
+            data[name] = read_cleaned_file(name)
+            step['rows_out'] = len(data[name])
+
+    # Compared with what the same frames would take with pandas' default types
+    print("Memory used by the cleaned data (default types -> compact types):")
+    for name in CLEANED_FILE_NAMES:
+        memory_report(name, data[name])
+
+    # (track_id, genre_id) pairs, shared with the cleaning report through the parse cache
+    with REPORT.measure('transform', 'parse track_genres') as step:
+        data['track_genres'] = load_track_genres(cleaned_file_path('tracks'))
+        step['rows_out'] = len(data['track_genres'])
+
+    # (id, name) pairs of the multi-valued contributor columns, tokenized once and
+    # shared by the lookup stages, the linking stages and the cleaning report
+    data['tokens'] = {}
+    for column, (name, id_column) in CONTRIBUTOR_COLUMNS.items():
+        with REPORT.measure('transform', f"tokenize {column}") as step:
+            data['tokens'][column] = load_tokens(cleaned_file_path(name), id_column, column)
+            step['rows_out'] = len(data['tokens'][column])
 
     return data
 
 
-def create_lookup_tables(engine, clean_data):
-    """
-    Create lookup tables for Engineers, Lyricists, Labels, and Licenses.
-    These are extracted from the main CSV files and normalized into separate tables.
-    """
-    print("\nCreating lookup tables...")
-
-    # Engineers come from the albums file
-    print("  Processing Engineers...")
-    engineer_names = (clean_data['albums']['album_engineer']
-                      .dropna()
-                      .astype(str)
-                      .str.split(r'[,&\n]')
-                      .explode()
-                      .str.strip()
-                      .unique())
-    insert_data(engine, 'Engineers', [{'engineer_name': name} for name in engineer_names])
-
-    # Lyricists come from the tracks file
-    print("  Processing Lyricists...")
-    lyricist_names = (clean_data['tracks']['track_lyricist']
-                      .dropna()
-                      .astype(str)
-                      .str.split(r'[,&\n]')
-                      .explode()
-                      .str.strip()
-                      .unique())
-    insert_data(engine, 'Lyricists', [{'lyricist_name': name} for name in lyricist_names])
-
-    # Labels come from the artists file
-    print("  Processing Labels...")
-    label_names = (clean_data['artists']['artist_associated_labels']
-                   .dropna()
-                   .astype(str)
-                   .str.split(r'[,&\n]')
-                   .explode()
-                   .str.strip()
-                   .unique())
-    insert_data(engine, 'Labels', [{'label_name': name} for name in label_names])
-
-    # Licenses come from the tracks file
-    print("  Processing Licenses...")
-    license_titles = clean_data['tracks']['license_title'].dropna().unique()
-    insert_data(engine, 'Licenses', [{'license_title': title} for title in license_titles])
-
-    # Now read back the IDs that were auto-generated by the database
-    # We'll need these IDs to link records in other tables
-    lookups = dict()
-    lookups['engineers'] = \
-        pd.read_sql('SELECT engineer_id, engineer_name FROM "Engineers"', engine).set_index('engineer_name')[
-            'engineer_id'].to_dict()
-    lookups['lyricists'] = \
-        pd.read_sql('SELECT lyricist_id, lyricist_name FROM "Lyricists"', engine).set_index('lyricist_name')[
-            'lyricist_id'].to_dict()
-    lookups['labels'] = pd.read_sql('SELECT label_id, label_name FROM "Labels"', engine).set_index('label_name')[
-        'label_id'].to_dict()
-    lookups['licenses'] = \
-        pd.read_sql('SELECT license_id, license_title FROM "Licenses"', engine).set_index('license_title')[
-            'license_id'].to_dict()
+def estimate_chunk_rows(parquet_file, memory_budget_mb, sample_rows=1000):
+    """
+    Work out how many rows of a cleaned table fit in the memory budget.
+    We measure the in-memory size of a small sample and scale it up.
+    """
+    sample = next(parquet_file.iter_batches(batch_size=sample_rows), None)
+    if sample is None or sample.num_rows == 0:
+        return sample_rows
+
+    bytes_per_row = sample.to_pandas().memory_usage(deep=True).sum() / sample.num_rows
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    return max(1000, int(budget_bytes / (bytes_per_row * CHUNK_MEMORY_OVERHEAD)))
+
+
+def stream_cleaned_data(name, memory_budget_mb):
+    """Yield one cleaned table as a sequence of DataFrame chunks that fit the memory budget."""
+    parquet_file = pq.ParquetFile(cleaned_file_path(name), memory_map=True)
+    chunk_rows = estimate_chunk_rows(parquet_file, memory_budget_mb)
+    print(f"\nStreaming clean_{name}.parquet in chunks of {chunk_rows:,} rows...")
+
+    batches = parquet_file.iter_batches(batch_size=chunk_rows)
+    while True:
+        with REPORT.measure('read', f"clean_{name}.parquet") as step:
+            batch = next(batches, None)
+            chunk = None if batch is None else apply_dtypes(batch.to_pandas())
+            step['rows_out'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        yield chunk
 
-    return lookups
 
+def contributor_tokens(clean_data, column):
+    """
+    The (id, token) table of a multi-valued contributor column (see CONTRIBUTOR_COLUMNS).
+    In-memory mode has them pre-loaded from the token cache; in streaming mode the
+    chunk is tokenized the first time a stage asks, and the lookup and linking stages
+    of that chunk share the result.
+    """
+    tokens = clean_data.setdefault('tokens', {})
+    if column not in tokens:
+        name, id_column = CONTRIBUTOR_COLUMNS[column]
+        tokens[column] = tokenize_column(clean_data[name], id_column, column)
+    return tokens[column]
 
-def insert_genres(engine, genres_df):
+
+def insert_lookup(engine, table_name, id_column, name_column, names):
     """
-    Insert genres into the database in the correct order.
-    Since genres can have parent genres, we need to insert parents before children.
+    Insert names into a lookup table and return a name -> id mapping.
+    The IDs are auto-generated by the database. INSERT ... RETURNING gives us the
+    IDs of new names and the join picks up names that were already there, so we
+    only ever read back the names in this batch, not the whole table.
     """
-    print("\nInserting Genres...")
+    names = pd.unique(pd.Series(names, dtype=object).dropna().astype(str))
+    if len(names) == 0:
+        return {}
 
-    # Prepare the data
-    genres = genres_df.copy()
-    genres.rename(columns={'genre_title': 'genre_name', 'genre_parent_id': 'parent_id'}, inplace=True)
-    genres['parent_id'] = pd.to_numeric(genres['parent_id'], errors='coerce').astype('Int64')
+    sql = text(f"""
+        WITH batch AS (
+            SELECT DISTINCT unnest(CAST(:names AS text[])) AS name
+        ),
+        inserted AS (
+            INSERT INTO "{table_name}" ({name_column})
+            SELECT name FROM batch
+            ON CONFLICT ({name_column}) DO NOTHING
+            RETURNING {id_column}, {name_column}
+        )
+        SELECT {id_column}, {name_column}, TRUE AS is_new FROM inserted
+        UNION ALL
+        SELECT t.{id_column}, t.{name_column}, FALSE AS is_new
+        FROM "{table_name}" t
+        JOIN batch b ON t.{name_column} = b.name
+    """)
 
-    # Track which genres we've successfully inserted
-    inserted_ids = set()
-    remaining_genres = genres.to_dict(orient='records')
+    with REPORT.measure('insert', table_name, rows_in=len(names)) as step:
+        with engine.connect() as connection:
+            rows = connection.execute(sql, {'names': list(names)}).fetchall()
+            connection.commit()
 
-    # Keep trying to insert genres until we can't insert anymore
-    # A genre can only be inserted if its parent is already in the database
-    while remaining_genres:
-        ready_to_insert = []
+        new_count = sum(1 for row in rows if row[2])
+        step['rows_out'] = new_count
+    print(f"  {table_name}: {len(rows):,} names resolved ({new_count:,} new)")
+    return {row[1]: row[0] for row in rows}
 
-        for genre in remaining_genres:
-            # A genre is ready if it has no parent OR its parent is already inserted
-            has_no_parent = pd.isna(genre['parent_id'])
-            parent_already_inserted = genre['parent_id'] in inserted_ids
 
-            if has_no_parent or parent_already_inserted:
-                ready_to_insert.append(genre)
+def existing_ids(engine, table_name, id_column, ids):
+    """
+    Return the sorted IDs from this batch that already exist in a table.
+    Only the batch's IDs are looked up (through the primary key index), so the
+    cost grows with the batch and not with the size of the table.
+    """
+    batch_ids = np.unique(np.asarray(ids, dtype='int64'))
+    if len(batch_ids) == 0:
+        return batch_ids
+
+    sql = text(f'SELECT {id_column} FROM "{table_name}" WHERE {id_column} = ANY(:ids)')
+    with REPORT.measure('read-back', f"{table_name} ids", rows_in=len(batch_ids)) as step:
+        with engine.connect() as connection:
+            found = [row[0] for row in connection.execute(sql, {'ids': batch_ids.tolist()})]
+        step['rows_out'] = len(found)
+    return np.sort(np.asarray(found, dtype='int64'))
+
+
+def create_engineers(engine, clean_data, lookups):
+    """Engineers come from the albums file."""
+    print("\nProcessing Engineers...")
+    lookups['engineers'] = insert_lookup(engine, 'Engineers', 'engineer_id', 'engineer_name',
+                                         contributor_tokens(clean_data, 'album_engineer')['token'])
+
+
+def create_lyricists(engine, clean_data, lookups):
+    """Lyricists come from the tracks file."""
+    print("\nProcessing Lyricists...")
+    lookups['lyricists'] = insert_lookup(engine, 'Lyricists', 'lyricist_id', 'lyricist_name',
+                                         contributor_tokens(clean_data, 'track_lyricist')['token'])
+
+
+def create_composers(engine, clean_data, lookups):
+    """Composers come from the tracks file."""
+    print("\nProcessing Composers...")
+    lookups['composers'] = insert_lookup(engine, 'Composers', 'composer_id', 'composer_name',
+                                         contributor_tokens(clean_data, 'track_composer')['token'])
+
+
+def create_producers(engine, clean_data, lookups):
+    """Producers come from the albums file."""
+    print("\nProcessing Producers...")
+    lookups['producers'] = insert_lookup(engine, 'Producers', 'producer_id', 'producer_name',
+                                         contributor_tokens(clean_data, 'album_producer')['token'])
 
-        # If we couldn't find any genres to insert, we have a problem
-        if not ready_to_insert:
-            print(f"  WARNING: {len(remaining_genres)} genres have missing or circular parent references")
-            print("  These genres will be skipped")
-            break
 
-        # Insert this batch of genres
-        insert_data(engine, 'Genres', ready_to_insert)
+def create_labels(engine, clean_data, lookups):
+    """Labels come from the artists file."""
+    print("\nProcessing Labels...")
+    lookups['labels'] = insert_lookup(engine, 'Labels', 'label_id', 'label_name',
+                                      contributor_tokens(clean_data, 'artist_associated_labels')['token'])
+
+
+def create_licenses(engine, clean_data, lookups):
+    """Licenses come from the tracks file."""
+    print("\nProcessing Licenses...")
+    lookups['licenses'] = insert_lookup(engine, 'Licenses', 'license_id', 'license_title',
+                                        clean_data['tracks']['license_title'].dropna())
+
+
+def insert_genres(engine, genres_df):
+    """
+    Insert genres into the database in the correct order.
+    Since genres can have parent genres, we sort them in memory so that parents
+    come before children, then load them all at once. The depth and ancestor
+    path of every genre are saved to GenreHierarchy for downstream use.
+    """
+    print("\nInserting Genres...")
+
+    # Prepare the data
+    genres = genres_df.copy()
+    genres.rename(columns={'genre_title': 'genre_name', 'genre_parent_id': 'parent_id'}, inplace=True)
 
-        # Update our tracking
-        for genre in ready_to_insert:
-            inserted_ids.add(genre['genre_id'])
+    # Work out the load order once, and find genres whose parents can never be loaded
+    hierarchy, problems = build_genre_hierarchy(genres)
+    if problems['orphans']:
+        print(f"  WARNING: {len(problems['orphans'])} genres have missing parents: {problems['orphans']}")
+    if problems['cycles']:
+        print(f"  WARNING: {len(problems['cycles'])} genres have circular parent references: {problems['cycles']}")
+    if problems['orphans'] or problems['cycles']:
+        print("  These genres will be skipped")
 
-        # Remove inserted genres from remaining list
-        remaining_genres = [g for g in remaining_genres if g['genre_id'] not in inserted_ids]
+    # Load every genre in a single bulk operation, parents first
+    ordered = hierarchy[['genre_id']].merge(genres[['genre_id', 'genre_name', 'parent_id']], on='genre_id')
+    load_table(engine, 'Genres', ordered)
+    load_table(engine, 'GenreHierarchy', hierarchy)
 
-    print(f"  Inserted {len(inserted_ids)} genres")
+    print(f"  Inserted {len(ordered)} genres (deepest level: {hierarchy['depth'].max()})")
 
 
 def insert_artists(engine, artists_df):
@@ -176,16 +526,9 @@ def insert_artists(engine, artists_df):
 
     artists = artists_df[['artist_id', 'artist_name', 'artist_handle', 'artist_website',
                           'artist_active_year_begin', 'artist_favorites',
-                          'artist_latitude', 'artist_longitude', 'artist_location']].copy()
-
-    # Convert numeric columns properly (some might be strings or have bad data)
-    artists['artist_active_year_begin'] = pd.to_numeric(artists['artist_active_year_begin'], errors='coerce').astype(
-        'Int64')
-    artists['artist_favorites'] = pd.to_numeric(artists['artist_favorites'], errors='coerce').astype('Int64')
-    artists['artist_latitude'] = pd.to_numeric(artists['artist_latitude'], errors='coerce')
-    artists['artist_longitude'] = pd.to_numeric(artists['artist_longitude'], errors='coerce')
+                          'artist_latitude', 'artist_longitude', 'artist_location']]
 
-    count = insert_data(engine, 'Artists', artists.to_dict(orient='records'))
+    count = load_table(engine, 'Artists', artists)
     print(f"  Inserted {count} artists")
 
 
@@ -198,22 +541,13 @@ def insert_albums(engine, albums_df, artists_df):
     artist_name_to_id = pd.Series(artists_df.artist_id.values, index=artists_df.artist_name).to_dict()
 
     albums = albums_df.copy()
-    albums['artist_id'] = albums['artist_name'].map(artist_name_to_id)
+    albums['artist_id'] = albums['artist_name'].map(artist_name_to_id).astype('Int32')
 
     # Select only the columns we need for the database
     albums = albums[['album_id', 'album_title', 'album_type', 'album_tracks',
-                     'album_date_released', 'album_listens', 'album_favorites', 'artist_id']].copy()
-
-    # Convert date column
-    albums['album_date_released'] = pd.to_datetime(albums['album_date_released'], errors='coerce')
-
-    # Convert to records and handle null dates (Pandas NaT becomes None for SQL)
-    records = albums.to_dict(orient='records')
-    for record in records:
-        if pd.isna(record['album_date_released']):
-            record['album_date_released'] = None
+                     'album_date_released', 'album_listens', 'album_favorites', 'artist_id']]
 
-    count = insert_data(engine, 'Albums', records)
+    count = load_table(engine, 'Albums', albums)
     print(f"  Inserted {count} albums")
 
 
@@ -225,91 +559,75 @@ def insert_tracks(engine, tracks_df, license_map):
     tracks.dropna(subset=['track_title'], inplace=True)
 
     # Link tracks to their license using the lookup map
-    tracks['license_id'] = tracks['license_title'].map(license_map)
+    tracks['license_id'] = tracks['license_title'].map(license_map).astype('Int32')
 
     # Select the columns we need
     tracks = tracks[['track_id', 'track_title', 'track_language_code', 'track_listens',
                      'track_favorites', 'track_url', 'track_duration', 'track_bit_rate',
-                     'track_date_recorded', 'album_id', 'artist_id', 'license_id']].copy()
+                     'track_date_recorded', 'album_id', 'artist_id', 'license_id']]
 
-    # Convert numeric columns
-    numeric_cols = ['track_listens', 'track_favorites', 'track_bit_rate', 'album_id', 'artist_id', 'license_id']
-    for col in numeric_cols:
-        tracks[col] = pd.to_numeric(tracks[col], errors='coerce').astype('Int64')
+    count = load_table(engine, 'Tracks', tracks)
+    print(f"  Inserted {count} tracks")
 
-    # Convert date column
-    tracks['track_date_recorded'] = pd.to_datetime(tracks['track_date_recorded'], errors='coerce')
 
-    # Handle null dates
-    records = tracks.to_dict(orient='records')
-    for record in records:
-        if pd.isna(record['track_date_recorded']):
-            record['track_date_recorded'] = None
+def link_contributors(engine, table_name, tokens, id_column, lookup, lookup_id_column):
+    """Turn (id, name) tokens into (id, lookup id) rows of a linking table."""
+    links = pd.DataFrame({id_column: tokens[id_column],
+                          lookup_id_column: tokens['token'].map(lookup)})
+    load_table(engine, table_name, links.dropna().astype(int).drop_duplicates())
 
-    count = insert_data(engine, 'Tracks', records)
-    print(f"  Inserted {count} tracks")
 
+def link_album_engineers(engine, clean_data, lookups):
+    """Link albums to engineers."""
+    print("\nLinking albums to engineers...")
+    link_contributors(engine, 'AlbumEngineers', contributor_tokens(clean_data, 'album_engineer'),
+                      'album_id', lookups['engineers'], 'engineer_id')
 
-def create_linking_tables(engine, clean_data, lookups):
-    """
-    Create many-to-many relationship tables.
-    These link tracks to genres, albums to engineers, artists to labels, etc.
-    """
-    print("\nCreating relationship links...")
 
-    # Link albums to engineers
-    print("  Linking albums to engineers...")
-    album_engineers = clean_data['albums'][['album_id', 'album_engineer']].dropna()
-    album_engineers['engineer_name'] = album_engineers['album_engineer'].astype(str).str.split(r'[,&\n]')
-    album_engineers = album_engineers.explode('engineer_name')
-    album_engineers['engineer_name'] = album_engineers['engineer_name'].str.strip()
-    album_engineers['engineer_id'] = album_engineers['engineer_name'].map(lookups['engineers'])
+def link_album_producers(engine, clean_data, lookups):
+    """Link albums to producers."""
+    print("\nLinking albums to producers...")
+    link_contributors(engine, 'AlbumProducers', contributor_tokens(clean_data, 'album_producer'),
+                      'album_id', lookups['producers'], 'producer_id')
 
-    records = album_engineers[['album_id', 'engineer_id']].dropna().astype(int).drop_duplicates().to_dict(
-        orient='records')
-    insert_data(engine, 'AlbumEngineers', records)
 
-    # Link artists to labels
-    print("  Linking artists to labels...")
-    artist_labels = clean_data['artists'][['artist_id', 'artist_associated_labels']].dropna()
-    artist_labels['label_name'] = artist_labels['artist_associated_labels'].astype(str).str.split(r'[,&\n]')
-    artist_labels = artist_labels.explode('label_name')
-    artist_labels['label_name'] = artist_labels['label_name'].str.strip()
-    artist_labels['label_id'] = artist_labels['label_name'].map(lookups['labels'])
+def link_artist_labels(engine, clean_data, lookups):
+    """Link artists to labels."""
+    print("\nLinking artists to labels...")
+    link_contributors(engine, 'ArtistLabels', contributor_tokens(clean_data, 'artist_associated_labels'),
+                      'artist_id', lookups['labels'], 'label_id')
 
-    records = artist_labels[['artist_id', 'label_id']].dropna().astype(int).drop_duplicates().to_dict(orient='records')
-    insert_data(engine, 'ArtistLabels', records)
 
-    # Link tracks to lyricists
-    print("  Linking tracks to lyricists...")
-    track_lyricists = clean_data['tracks'][['track_id', 'track_lyricist']].dropna()
-    track_lyricists['lyricist_id'] = track_lyricists['track_lyricist'].map(lookups['lyricists'])
+def link_track_lyricists(engine, clean_data, lookups):
+    """Link tracks to lyricists (a track can list several lyricists, like albums list engineers)."""
+    print("\nLinking tracks to lyricists...")
+    link_contributors(engine, 'TrackLyricists', contributor_tokens(clean_data, 'track_lyricist'),
+                      'track_id', lookups['lyricists'], 'lyricist_id')
 
-    records = track_lyricists[['track_id', 'lyricist_id']].dropna().astype(int).drop_duplicates().to_dict(
-        orient='records')
-    insert_data(engine, 'TrackLyricists', records)
 
-    # Link tracks to genres (this one is more complex because genres are stored as a list)
-    print("  Linking tracks to genres...")
-    valid_genre_ids = set(pd.read_sql('SELECT genre_id FROM "Genres"', engine)['genre_id'])
-    track_genre_records = []
+def link_track_composers(engine, clean_data, lookups):
+    """Link tracks to composers."""
+    print("\nLinking tracks to composers...")
+    link_contributors(engine, 'TrackComposers', contributor_tokens(clean_data, 'track_composer'),
+                      'track_id', lookups['composers'], 'composer_id')
 
-    for _, row in clean_data['tracks'][['track_id', 'track_genres']].dropna().iterrows():
-        try:
-            # The track_genres column contains a string representation of a list
-            # We need to parse it and extract the genre IDs
-            genres_list = ast.literal_eval(row['track_genres'])
-            for genre in genres_list:
-                genre_id = int(genre.get('genre_id'))
-                # Only link to genres that actually exist in our database
-                if genre_id in valid_genre_ids:
-                    track_genre_records.append({'track_id': row['track_id'], 'genre_id': genre_id})
-        except:
-            # If we can't parse the genres, just skip this track
-            continue
-
-    records = pd.DataFrame(track_genre_records).drop_duplicates().to_dict(orient='records')
-    insert_data(engine, 'TrackGenres', records)
+
+def link_track_genres(engine, clean_data, lookups):
+    """Link tracks to genres (this one is more complex because genres are stored as a list)."""
+    print("\nLinking tracks to genres...")
+
+    # Use the pre-parsed (and cached) pairs when we have the whole file,
+    # otherwise parse the track_genres column of this chunk
+    if 'track_genres' in clean_data:
+        track_genres = clean_data['track_genres']
+    else:
+        track_genres = parse_track_genres(clean_data['tracks'])
+
+    # Only link to genres that actually exist in our database
+    valid_genre_ids = existing_ids(engine, 'Genres', 'genre_id', track_genres['genre_id'])
+    track_genres = track_genres[np.isin(track_genres['genre_id'].to_numpy(), valid_genre_ids)]
+
+    load_table(engine, 'TrackGenres', track_genres)
 
 
 def insert_audio_features(engine, echonest_df):
@@ -320,8 +638,8 @@ def insert_audio_features(engine, echonest_df):
     print("\nInserting audio and social features...")
 
     # Only insert features for tracks that actually exist in the database
-    valid_track_ids = set(pd.read_sql('SELECT track_id FROM "Tracks"', engine)['track_id'])
-    features = echonest_df[echonest_df['track_id'].isin(valid_track_ids)]
+    valid_track_ids = existing_ids(engine, 'Tracks', 'track_id', echonest_df['track_id'])
+    features = echonest_df[np.isin(echonest_df['track_id'].to_numpy(), valid_track_ids)]
 
     # Split into two tables: Audio features and Social features
     audio_cols = ['track_id', 'acousticness', 'danceability', 'energy', 'instrumentalness',
@@ -329,56 +647,593 @@ def insert_audio_features(engine, echonest_df):
     social_cols = ['track_id', 'artist_discovery', 'artist_familiarity', 'artist_hotttnesss',
                    'song_currency', 'song_hotttnesss']
 
-    insert_data(engine, 'Audio', features[audio_cols].to_dict(orient='records'))
-    insert_data(engine, 'Social', features[social_cols].to_dict(orient='records'))
+    load_table(engine, 'Audio', features[audio_cols])
+    load_table(engine, 'Social', features[social_cols])
+
+
+def read_secondary_indexes(sql_file=INDEX_SQL_FILE):
+    """
+    Read the CREATE INDEX statements from the Phase 2 optimization script.
+    Returns a list of (index_name, create_statement) pairs; commented-out lines are ignored.
+    The 'public.' prefix is removed so the indexes are built in whichever schema we load into.
+    """
+    with open(sql_file) as f:
+        sql = f.read()
+    pattern = re.compile(r'^CREATE INDEX IF NOT EXISTS (\w+) ON [^;]+;', re.MULTILINE)
+    return [(match.group(1), match.group(0).replace(' ON public.', ' ON '))
+            for match in pattern.finditer(sql)]
+
+
+def list_tables(engine):
+    """Names of the tables in the current schema."""
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT tablename FROM pg_tables WHERE schemaname = current_schema()'))
+        return sorted(row[0] for row in rows)
+
+
+def find_empty_tables(engine):
+    """Names of the tables in the current schema that have no rows."""
+    empty = []
+    with engine.connect() as connection:
+        for table_name in list_tables(engine):
+            if connection.execute(text(f'SELECT NOT EXISTS (SELECT 1 FROM "{table_name}")')).scalar():
+                empty.append(table_name)
+    return empty
+
+
+def record_deferred_ddl(connection, kind, name, table_name, definition):
+    """
+    Remember an index or foreign key definition in "IngestDeferredDDL" before it is dropped.
+    A definition still pending from an interrupted run is kept as it is.
+    """
+    connection.execute(text("""
+        INSERT INTO "IngestDeferredDDL" (kind, name, table_name, definition)
+        VALUES (:kind, :name, :table_name, :definition)
+        ON CONFLICT (kind, name) DO NOTHING
+    """), {'kind': kind, 'name': name, 'table_name': table_name, 'definition': definition})
+
+
+def forget_deferred_ddl(connection, kind, name):
+    """Remove a definition from "IngestDeferredDDL" once it has been restored."""
+    connection.execute(text('DELETE FROM "IngestDeferredDDL" WHERE kind = :kind AND name = :name'),
+                       {'kind': kind, 'name': name})
+
+
+def read_deferred_ddl(engine):
+    """
+    The indexes and foreign keys that were dropped for a bulk load and not restored yet.
+    Returns (indexes, foreign_keys): (name, create_statement) and
+    (table_name, constraint_name, definition) tuples.
+    """
+    with engine.connect() as connection:
+        connection.execute(text(DEFERRED_DDL_TABLE_SQL))
+        rows = connection.execute(text(
+            'SELECT kind, name, table_name, definition FROM "IngestDeferredDDL" ORDER BY kind, name')).fetchall()
+        connection.commit()
+    indexes = [(name, definition) for kind, name, _, definition in rows if kind == 'index']
+    foreign_keys = [(table_name, name, definition) for kind, name, table_name, definition in rows
+                    if kind == 'foreign_key']
+    return indexes, foreign_keys
+
+
+def drop_foreign_keys(connection):
+    """
+    Drop every foreign key in the current schema, recording each definition in
+    "IngestDeferredDDL" first so it can be added back after the load.
+    Returns the number of foreign keys dropped.
+    """
+    foreign_keys = connection.execute(text("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND connamespace = current_schema()::regnamespace
+    """)).fetchall()
+    for table_name, constraint_name, definition in foreign_keys:
+        record_deferred_ddl(connection, 'foreign_key', constraint_name, table_name, definition)
+        connection.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint_name}"'))
+    return len(foreign_keys)
+
+
+def prepare_bulk_load(engine, indexes):
+    """
+    Get the tables ready for a fast bulk load: drop the secondary indexes and the
+    foreign keys. Primary keys and UNIQUE constraints stay, because ON CONFLICT needs them.
+    The definitions are written to "IngestDeferredDDL" in the same transaction as the
+    drops, so a crash at any point before finish_bulk_load can't lose them.
+    """
+    print(f"\nDropping {len(indexes)} secondary indexes before the load...")
+    with engine.connect() as connection:
+        connection.execute(text(DEFERRED_DDL_TABLE_SQL))
+        for index_name, statement in indexes:
+            record_deferred_ddl(connection, 'index', index_name, None, statement)
+            connection.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+        dropped = drop_foreign_keys(connection)
+        connection.commit()
+    print(f"Dropped {dropped} foreign keys (they are validated again after the load)")
+
+
+def run_in_parallel(engine, statements, workers, on_success=None):
+    """
+    Run independent SQL statements at the same time, each on its own autocommit connection.
+    on_success(connection, statement) is called on the same connection after a statement succeeds.
+    Every statement is tried; if any of them failed, a RuntimeError listing them is
+    raised once all the others have finished.
+    """
+    def run(statement):
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(statement))
+            if on_success is not None:
+                on_success(connection, statement)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(REPORT.in_current_step(run), statement): statement for statement in statements}
+        for future, statement in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  ERROR: failed: {statement.strip()}\n    {e}")
+                failed.append(statement.strip())
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(statements)} statements failed: " + "; ".join(failed))
+
+
+def finish_bulk_load(engine, workers):
+    """
+    Put the database back in the state the dashboard expects after a bulk load:
+    rebuild the secondary indexes in parallel, add the foreign keys back as NOT VALID
+    and check them with one VALIDATE CONSTRAINT pass each, then refresh statistics.
+    The definitions come from "IngestDeferredDDL", so this also restores whatever an
+    interrupted run left dropped. Each one is removed from that table once it is
+    restored; if any step fails the rest stay recorded and a RuntimeError is raised.
+    """
+    start = time.time()
+    indexes, foreign_keys = read_deferred_ddl(engine)
+    index_names = {statement: index_name for index_name, statement in indexes}
+    validations = {f'ALTER TABLE {table_name} VALIDATE CONSTRAINT "{constraint_name}"': constraint_name
+                   for table_name, constraint_name, _ in foreign_keys}
+    errors = []
+
+    def attempt(statements, pool_size, on_success=None):
+        # Keep going after a failure, so one bad constraint doesn't leave the indexes unbuilt
+        try:
+            run_in_parallel(engine, statements, pool_size, on_success)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    def index_restored(connection, statement):
+        forget_deferred_ddl(connection, 'index', index_names[statement])
+
+    def foreign_key_restored(connection, statement):
+        forget_deferred_ddl(connection, 'foreign_key', validations[statement])
+
+    print(f"\nRebuilding {len(indexes)} secondary indexes with {workers} worker(s)...")
+    attempt(list(index_names), workers, index_restored)
+
+    # Adding a constraint as NOT VALID is instant; VALIDATE then checks all rows in one scan.
+    # A constraint already added back by an interrupted run only needs validating
+    with engine.connect() as connection:
+        existing = {row[0] for row in connection.execute(text(
+            "SELECT conname FROM pg_constraint WHERE contype = 'f' AND connamespace = current_schema()::regnamespace"))}
+    attempt([f'ALTER TABLE {table_name} ADD CONSTRAINT "{constraint_name}" {definition} NOT VALID'
+             for table_name, constraint_name, definition in foreign_keys if constraint_name not in existing], 1)
+
+    print(f"Validating {len(foreign_keys)} foreign keys...")
+    attempt(list(validations), workers, foreign_key_restored)
+
+    print("Updating planner statistics (ANALYZE)...")
+    attempt([f'ANALYZE "{table_name}"' for table_name in list_tables(engine)], workers)
+
+    if errors:
+        raise RuntimeError("Indexes and foreign keys were not fully restored; the missing ones stay "
+                           "recorded in \"IngestDeferredDDL\" for the next run:\n  " + "\n  ".join(errors))
+    print(f"Indexes and constraints restored in {time.time() - start:.2f}s")
+
+
+def create_staging_schema(engine, staging_engine, reuse=False):
+    """
+    Create STAGING_SCHEMA with UNLOGGED copies of every table in schema.sql.
+    Unlogged tables skip the write-ahead log, which makes the bulk load much cheaper.
+    With reuse=True an existing staging schema is kept (used by --resume).
+    """
+    with engine.connect() as connection:
+        exists = connection.execute(text('SELECT 1 FROM pg_namespace WHERE nspname = :name'),
+                                    {'name': STAGING_SCHEMA}).first() is not None
+        if reuse and exists:
+            print(f"Reusing the existing staging schema '{STAGING_SCHEMA}'")
+            return
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {STAGING_SCHEMA}'))
+        connection.commit()
+
+    with open(SCHEMA_SQL_FILE) as f:
+        schema_sql = f.read().replace('CREATE TABLE', 'CREATE UNLOGGED TABLE')
+
+    # staging_engine has search_path set to the staging schema, so schema.sql creates its tables there
+    with staging_engine.connect() as connection:
+        connection.exec_driver_sql(schema_sql)
+        connection.commit()
+    print(f"Created UNLOGGED staging tables in schema '{STAGING_SCHEMA}'")
+
+
+def set_tables_logged(staging_engine, workers):
+    """
+    Turn the staging tables into normal (WAL-logged, crash-safe) tables before they go live.
+    This runs while the foreign keys are dropped, so the tables can be converted in parallel.
+    """
+    tables = [table_name for table_name in list_tables(staging_engine) if table_name not in CONTROL_TABLES]
+    print(f"\nMaking {len(tables)} staging tables crash-safe (SET LOGGED)...")
+    run_in_parallel(staging_engine, [f'ALTER TABLE "{table_name}" SET LOGGED' for table_name in tables], workers)
+
+
+def copy_table_grants(connection, table_name):
+    """Give the staging table the same privileges as the live table it replaces (e.g. from security.sql)."""
+    grants = connection.execute(text("""
+        SELECT grantee, string_agg(privilege_type, ', ')
+        FROM information_schema.role_table_grants
+        WHERE table_schema = 'public' AND table_name = :table_name AND grantee <> current_user
+        GROUP BY grantee
+    """), {'table_name': table_name}).fetchall()
+    for grantee, privileges in grants:
+        grantee = 'PUBLIC' if grantee == 'PUBLIC' else f'"{grantee}"'
+        connection.execute(text(f'GRANT {privileges} ON {STAGING_SCHEMA}."{table_name}" TO {grantee}'))
+
+
+def find_dependent_views(connection, tables):
+    """
+    Views and materialized views built on any of these public tables, as
+    (name, relkind, definition) rows. The definitions are printed relative to the
+    current search_path, so the public tables appear unqualified.
+    """
+    return connection.execute(text("""
+        SELECT DISTINCT view.oid::regclass::text, view.relkind, pg_get_viewdef(view.oid)
+        FROM pg_depend dep
+        JOIN pg_rewrite rule ON dep.objid = rule.oid
+        JOIN pg_class view ON rule.ev_class = view.oid
+        JOIN pg_class source ON dep.refobjid = source.oid
+        WHERE source.relnamespace = 'public'::regnamespace
+          AND source.relname = ANY(:tables)
+          AND view.oid <> source.oid
+    """), {'tables': list(tables)}).fetchall()
+
+
+def drop_retired_schema(engine):
+    """
+    Drop RETIRED_SCHEMA and the old tables in it. Nothing is dropped with CASCADE:
+    if anything outside the schema still depends on an old table, the drop fails
+    and the error says what it is.
+    """
+    with engine.connect() as connection:
+        tables = connection.execute(text('SELECT tablename FROM pg_tables WHERE schemaname = :schema'),
+                                    {'schema': RETIRED_SCHEMA}).fetchall()
+        if tables:
+            connection.execute(text('DROP TABLE ' + ', '.join(f'{RETIRED_SCHEMA}."{row[0]}"' for row in tables)))
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {RETIRED_SCHEMA}'))
+        connection.commit()
+
+
+def swap_staging_into_public(engine, staging_engine):
+    """
+    Replace the live public tables with the loaded staging tables in one transaction.
+    Moving a table between schemas only changes catalog entries, so the exclusive
+    locks are held for milliseconds; lock_timeout makes us give up (and leave public
+    untouched) rather than queue behind a long-running dashboard query.
+    Views on the live tables (e.g. dbt views) would follow them into RETIRED_SCHEMA,
+    so they are recreated on the new tables in the same transaction. Materialized
+    views can't be recreated that cheaply, so their presence aborts the swap.
+    """
+    tables = [table_name for table_name in list_tables(staging_engine) if table_name not in CONTROL_TABLES]
+    print(f"\nSwapping {len(tables)} tables from '{STAGING_SCHEMA}' into public...")
+
+    drop_retired_schema(engine)
+
+    start = time.time()
+    with engine.begin() as connection:
+        connection.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+        views = find_dependent_views(connection, tables)
+        materialized = [name for name, kind, _ in views if kind == 'm']
+        if materialized:
+            raise RuntimeError(f"Materialized views depend on the live tables: {', '.join(materialized)}. "
+                               f"The swap was not done; the loaded tables are still in '{STAGING_SCHEMA}'")
+
+        connection.execute(text(f'CREATE SCHEMA {RETIRED_SCHEMA}'))
+        for table_name in tables:
+            copy_table_grants(connection, table_name)
+            connection.execute(text(f'ALTER TABLE IF EXISTS public."{table_name}" SET SCHEMA {RETIRED_SCHEMA}'))
+        for table_name in tables:
+            connection.execute(text(f'ALTER TABLE {STAGING_SCHEMA}."{table_name}" SET SCHEMA public'))
+        # The definitions name the tables unqualified, so they now resolve to the new ones.
+        # They go through the driver's cursor untouched (no bind parameters), since a
+        # view can contain ':' or '%' (e.g. a LIKE pattern)
+        with connection.connection.cursor() as cursor:
+            for view_name, _, definition in views:
+                cursor.execute(f'CREATE OR REPLACE VIEW {view_name} AS {definition}')
+    print(f"Swap committed in {time.time() - start:.3f}s"
+          + (f" ({len(views)} dependent views recreated)" if views else ""))
+
+    drop_retired_schema(engine)
+    with engine.connect() as connection:
+        connection.execute(text(f'DROP SCHEMA {STAGING_SCHEMA} CASCADE'))
+        connection.commit()
+
+
+# Every ingestion stage, the function that runs it and the stages it must wait for.
+# The dependencies follow the foreign keys in schema.sql, so any stage whose
+# dependencies are finished can run at the same time as the others.
+# Lookup stages are never skipped on resume: they are cheap, and later stages
+# need the name -> id mappings they produce.
+STAGES = {
+    'engineers': {'run': create_engineers, 'depends_on': [], 'checkpoint': False},
+    'lyricists': {'run': create_lyricists, 'depends_on': [], 'checkpoint': False},
+    'composers': {'run': create_composers, 'depends_on': [], 'checkpoint': False},
+    'producers': {'run': create_producers, 'depends_on': [], 'checkpoint': False},
+    'labels': {'run': create_labels, 'depends_on': [], 'checkpoint': False},
+    'licenses': {'run': create_licenses, 'depends_on': [], 'checkpoint': False},
+    'genres': {'run': lambda engine, data, lookups: insert_genres(engine, data['genres']),
+               'depends_on': []},
+    'artists': {'run': lambda engine, data, lookups: insert_artists(engine, data['artists']),
+                'depends_on': []},
+    'albums': {'run': lambda engine, data, lookups: insert_albums(engine, data['albums'], data['artists']),
+               'depends_on': ['artists']},
+    'tracks': {'run': lambda engine, data, lookups: insert_tracks(engine, data['tracks'], lookups['licenses']),
+               'depends_on': ['albums', 'artists', 'licenses']},
+    'album_engineers': {'run': link_album_engineers, 'depends_on': ['albums', 'engineers']},
+    'album_producers': {'run': link_album_producers, 'depends_on': ['albums', 'producers']},
+    'artist_labels': {'run': link_artist_labels, 'depends_on': ['artists', 'labels']},
+    'track_lyricists': {'run': link_track_lyricists, 'depends_on': ['tracks', 'lyricists']},
+    'track_composers': {'run': link_track_composers, 'depends_on': ['tracks', 'composers']},
+    'track_genres': {'run': link_track_genres, 'depends_on': ['tracks', 'genres']},
+    'audio': {'run': lambda engine, data, lookups: insert_audio_features(engine, data['echonest']),
+              'depends_on': ['tracks']},
+}
+
+
+def run_stage(name, engine, data, lookups, chunk=0):
+    """
+    Run one ingestion stage (for one chunk in streaming mode), record it in the
+    run report and checkpoint it. Stages committed by an earlier run are skipped.
+    """
+    use_checkpoint = STAGES[name].get('checkpoint', True)
+    if use_checkpoint and CHECKPOINTS.is_done(name, chunk):
+        print(f"\nSkipping {name} (chunk {chunk}): already loaded by an earlier run")
+        return
+
+    with REPORT.measure('stage', name):
+        STAGES[name]['run'](engine, data, lookups)
+
+    if use_checkpoint:
+        CHECKPOINTS.mark_done(name, chunk)
+
+
+def run_stages(engine, clean_data, workers):
+    """
+    Run all ingestion stages on a thread pool.
+    A stage is started as soon as every stage it depends on has finished,
+    and each running stage uses its own database connection from the engine pool.
+    """
+    lookups = {}
+    finished = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while len(finished) < len(STAGES):
+            # Start every stage whose dependencies are all done
+            for name, stage in STAGES.items():
+                if name in finished or name in running:
+                    continue
+                if all(dep in finished for dep in stage['depends_on']):
+                    running[name] = pool.submit(run_stage, name, engine, clean_data, lookups)
+
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future in done:
+                    # result() re-raises any error from the stage
+                    future.result()
+                    finished.add(name)
+                    del running[name]
+
+    return lookups
+
+
+# Streaming mode processes one file at a time, in this order.
+# For every chunk of a file, the listed stages run one after the other.
+STREAM_PLAN = [
+    ('artists', ['labels', 'artists', 'artist_labels']),
+    ('albums', ['engineers', 'producers', 'albums', 'album_engineers', 'album_producers']),
+    ('tracks', ['lyricists', 'composers', 'licenses', 'tracks', 'track_lyricists', 'track_composers',
+                'track_genres']),
+    ('echonest', ['audio']),
+]
+
+
+def run_streaming(engine, memory_budget_mb):
+    """
+    Memory-bounded ingestion.
+    Each file is read in chunks and every chunk goes through the same stage
+    functions as the in-memory mode before the next chunk is read.
+    Only the genres and the artist name -> id keys are kept for the whole run.
+    """
+    genres = read_cleaned_file('genres')
+    artist_keys = read_cleaned_file('artists', columns=['artist_id', 'artist_name'])
+
+    lookups = {}
+    run_stage('genres', engine, {'genres': genres}, lookups)
+
+    for file_name, stage_names in STREAM_PLAN:
+        for chunk_number, chunk in enumerate(stream_cleaned_data(file_name, memory_budget_mb), start=1):
+            print(f"\n--- {file_name} chunk {chunk_number} ({len(chunk):,} rows) ---")
+            chunk_data = {'genres': genres, 'artists': artist_keys, file_name: chunk}
+            for stage_name in stage_names:
+                run_stage(stage_name, engine, chunk_data, lookups, chunk=chunk_number)
+
+    return lookups
+
+
+def parse_args():
+    """Read the command line options."""
+    parser = argparse.ArgumentParser(description="Load the cleaned FMA data into PostgreSQL.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="number of ingestion stages that may run at the same time (1 = serial)")
+    parser.add_argument('--shards', type=int, default=DEFAULT_WORKERS,
+                        help="number of parallel track_id ranges used to load Tracks and TrackGenres")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="drop secondary indexes and foreign keys during the load, then rebuild and validate them")
+    parser.add_argument('--staging-swap', action='store_true',
+                        help="load into UNLOGGED tables in a staging schema, index them, then swap them into public")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip stages and chunks already committed by an earlier run on the same files")
+    parser.add_argument('--stream', action='store_true',
+                        help="read and load the cleaned files chunk by chunk instead of all at once")
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help="approximate memory (MB) per chunk in --stream mode")
+    parser.add_argument('--strict-validation', action='store_true',
+                        help="stop before loading anything if the data validation finds violations")
+    parser.add_argument('--skip-validation', action='store_true',
+                        help="don't run the data validation (validate_data.py) before the load")
+    parser.add_argument('--skip-dbt', action='store_true',
+                        help="don't rebuild the dbt models downstream of the changed tables after the load")
+    return parser.parse_args()
 
 
 def main():
     """Run the complete data ingestion pipeline."""
+    args = parse_args()
+    for table_name in SHARDED_TABLES:
+        SHARDED_TABLES[table_name] = max(1, args.shards)
 
     st = time.time()
+
+    # Check the cleaned files before touching the database. Violations are reported
+    # (and the offending rows saved to a quarantine file) instead of surfacing as
+    # silent skips; the rows are still loaded unless --strict-validation stops the run
+    if not args.skip_validation:
+        try:
+            with REPORT.measure('validate', 'validate cleaned data') as step:
+                violations = run_validation(CLEANED_DATA_DIR)
+                step['rows_out'] = violations
+        except FileNotFoundError as e:
+            print(f"ERROR: {e}")
+            print(f"Run clean_and_report.py first: it writes the cleaned Parquet files to '{CLEANED_DATA_DIR}'")
+            return 1
+        if violations and args.strict_validation:
+            print("ERROR: The data validation found violations; nothing was loaded (--strict-validation)")
+            return 1
+        print()
+
     # Connect to the database
+    # Every parallel stage and shard needs its own connection
     try:
-        engine = create_engine(DATABASE_URL)
+        engine = create_engine(DATABASE_URL, pool_size=args.workers + args.shards)
         with engine.connect() as connection:
             print("Connected to database successfully\n")
+        REPORT.attach(engine)
+        empty_tables = find_empty_tables(engine)
     except Exception as e:
         print(f"ERROR: Could not connect to database. {e}")
-        return
-
-    # Load all the cleaned data files
+        return 1
+
+    # In staging mode every unqualified table name resolves to the staging schema,
+    # so all the loading code below writes there instead of into the live tables.
+    # The staging tables start without secondary indexes, so the deferred index
+    # and foreign key handling is always used.
+    if args.staging_swap:
+        public_engine = engine
+        engine = create_engine(DATABASE_URL, pool_size=args.workers + args.shards,
+                               connect_args={'options': f'-csearch_path={STAGING_SCHEMA}'})
+        REPORT.attach(engine)
+        with REPORT.measure('maintenance', 'create staging schema'):
+            create_staging_schema(public_engine, engine, reuse=args.resume)
+        args.defer_indexes = True
+
+    # Checkpoints are tied to the exact input files and chunking of this run
     try:
-        clean_data = load_cleaned_data()
+        fingerprints = {name: file_fingerprint(cleaned_file_path(name)) for name in CLEANED_FILE_NAMES}
     except FileNotFoundError as e:
         print(f"ERROR: {e}")
-        print(f"Make sure the '{CLEANED_DATA_DIR}' folder exists with all cleaned CSV files")
-        return
-
-    # Now insert data in the correct order to respect foreign key relationships
-
-    # Step 1: Create independent lookup tables and get their ID mappings
-    lookups = create_lookup_tables(engine, clean_data)
+        print(f"Run clean_and_report.py first: it writes the cleaned Parquet files to '{CLEANED_DATA_DIR}'")
+        return 1
+    mode = f"stream:{args.memory_budget}" if args.stream else f"bulk:{args.shards}"
+    resumed = CHECKPOINTS.open(engine, make_run_key(fingerprints, mode), args.resume,
+                               shard_checkpoints=not args.stream)
+    if args.resume:
+        print(f"Resuming: {resumed} stages/chunks were already committed by an earlier run\n")
 
-    # Step 2: Insert core entities
-    insert_genres(engine, clean_data['genres'])
-    insert_artists(engine, clean_data['artists'])
-
-    # Step 3: Insert entities that depend on the core entities
-    insert_albums(engine, clean_data['albums'], clean_data['artists'])
-    insert_tracks(engine, clean_data['tracks'], lookups['licenses'])
-
-    # Step 4: Create many-to-many relationship links
-    create_linking_tables(engine, clean_data, lookups)
+    try:
+        if args.defer_indexes:
+            with REPORT.measure('maintenance', 'drop indexes and FKs'):
+                prepare_bulk_load(engine, read_secondary_indexes())
+        elif any(read_deferred_ddl(engine)):
+            # An earlier --defer-indexes run stopped before putting them back
+            with REPORT.measure('maintenance', 'restore indexes and FKs'):
+                print("Restoring the indexes and foreign keys an interrupted run left dropped...")
+                finish_bulk_load(engine, max(1, args.workers))
 
-    # Step 5: Insert audio and social features
-    insert_audio_features(engine, clean_data['echonest'])
+        try:
+            if args.stream:
+                # Read, transform and write one chunk at a time
+                print(f"Streaming ingestion with a {args.memory_budget} MB memory budget...")
+                run_streaming(engine, args.memory_budget)
+            else:
+                # Load all the cleaned data files
+                clean_data = load_cleaned_data()
+
+                # Insert everything, running independent stages in parallel
+                # while still respecting the foreign key relationships
+                print(f"Running {len(STAGES)} ingestion stages with {args.workers} worker(s)...")
+                run_stages(engine, clean_data, max(1, args.workers))
+        except FileNotFoundError as e:
+            print(f"ERROR: {e}")
+            print(f"Run clean_and_report.py first: it writes the cleaned Parquet files to '{CLEANED_DATA_DIR}'")
+            return 1
+        finally:
+            # Always restore indexes and constraints, even if the load failed part way
+            # (a failed staging load is left as it is, for --resume)
+            if args.defer_indexes and not args.staging_swap:
+                with REPORT.measure('maintenance', 'rebuild indexes and FKs'):
+                    finish_bulk_load(engine, max(1, args.workers))
+
+        if args.staging_swap:
+            with REPORT.measure('maintenance', 'set staging tables logged'):
+                set_tables_logged(engine, max(1, args.workers))
+            with REPORT.measure('maintenance', 'rebuild indexes and FKs'):
+                finish_bulk_load(engine, max(1, args.workers))
+            with REPORT.measure('maintenance', 'swap staging into public'):
+                swap_staging_into_public(public_engine, engine)
+            engine.dispose()
+            engine = public_engine
+    except RuntimeError as e:
+        # Raised after every index/constraint statement has been tried
+        print(f"\nERROR: {e}")
+        REPORT.write(options=vars(args))
+        return 1
 
     print("\n✓ All data has been successfully ingested into the database!")
+
+    # Only the dbt models built from tables that got new rows need a refresh.
+    # A resumed run can't tell what the interrupted run wrote, so it refreshes everything
+    changed_tables = REPORT.rows_written()
+    if args.resume and resumed:
+        changed_tables = {table_name: None for table_name in list_tables(engine) if table_name not in CONTROL_TABLES}
+    # Tables loaded from scratch (a recreated schema, or swapped in from staging) may
+    # have lost rows, which the incremental dbt models only drop on a full refresh
+    full_refresh = args.staging_swap or any(table_name in empty_tables for table_name in changed_tables)
     engine.dispose()
+    print("\nChanged tables: " + (", ".join(f"{table_name} (+{rows:,})" if rows else table_name
+                                             for table_name, rows in changed_tables.items()) or "none"))
+    dbt_failed = False
+    if not args.skip_dbt:
+        with REPORT.measure('dbt', 'dbt build'):
+            dbt_failed = bool(run_dbt_build(changed_tables, full_refresh))
+            if dbt_failed:
+                print("ERROR: dbt build failed; see the dbt output above")
     en = time.time()
 
+    REPORT.print_summary()
+    report_file = REPORT.write(options=vars(args))
+    print(f"\nRun report saved to {report_file}")
+
     print(f"\n Total time taken : {en - st}")
+    return 1 if dbt_failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
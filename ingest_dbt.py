@@ -0,0 +1,56 @@
+import os
+import shutil
+import subprocess
+
+try:
+    import yaml
+except ImportError:
+    # PyYAML comes with dbt; without it dbt can't run either, so the build is skipped
+    yaml = None
+
+DBT_PROJECT_DIR = 'fma_analytics'
+SOURCES_FILE = os.path.join(DBT_PROJECT_DIR, 'models', 'sources.yml')
+
+
+def declared_sources():
+    """Map every table declared in the dbt sources.yml to its dbt source name."""
+    with open(SOURCES_FILE) as f:
+        config = yaml.safe_load(f)
+    return {table['name']: source['name']
+            for source in config.get('sources', [])
+            for table in source.get('tables', [])}
+
+
+def changed_source_selectors(changed_tables):
+    """
+    dbt selectors for the models downstream of the changed tables
+    ('source:public.Social+' selects Social and everything built from it).
+    Tables that no dbt model reads from are left out.
+    """
+    sources = declared_sources()
+    return [f"source:{sources[table]}.{table}+" for table in sorted(changed_tables) if table in sources]
+
+
+def run_dbt_build(changed_tables, full_refresh=False):
+    """
+    Rebuild only the dbt models that depend on the tables this load changed,
+    from scratch with full_refresh. Returns the dbt exit code, or None when
+    nothing was run.
+    """
+    if not changed_tables:
+        print("No tables changed; the dbt models are up to date")
+        return None
+    if yaml is None or shutil.which('dbt') is None:
+        print(f"dbt is not installed; run 'dbt build' in {DBT_PROJECT_DIR}/ to refresh the models")
+        return None
+
+    selectors = changed_source_selectors(changed_tables)
+    if not selectors:
+        print("None of the changed tables are dbt sources; the dbt models are up to date")
+        return None
+
+    command = ['dbt', 'build', '--select', *selectors]
+    if full_refresh:
+        command.append('--full-refresh')
+    print(f"Running: {' '.join(command)}")
+    return subprocess.run(command, cwd=DBT_PROJECT_DIR).returncode
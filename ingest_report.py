@@ -0,0 +1,177 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:
+    # The resource module doesn't exist on Windows; peak memory is then not reported
+    resource = None
+
+REPORT_DIR = 'ingest_reports'
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far, in MB (None where it can't be measured)."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux (and bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+class RunReport:
+    """
+    Collects timing and row counts for every step of an ingestion run.
+
+    Each measured step records its kind ('read', 'stage', 'insert', 'read-back', ...),
+    wall time, CPU time of the thread that ran it, rows in/out, rows skipped by
+    ON CONFLICT, rows already loaded by an earlier run (resumed shards), database
+    round-trips and memory. Memory is process-wide: 'process_peak_mb' is the peak
+    so far when the step ended and 'peak_growth_mb' is how much the step raised it
+    (steps running at the same time on other threads share that growth).
+    Steps measured inside another step (e.g. an insert inside a stage) point to it
+    through 'parent', which is how the summary separates transform time from insert time.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+
+    def current_step(self):
+        """The innermost step being measured on this thread, if any."""
+        stack = getattr(self.local, 'stack', [])
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def measure(self, kind, name, rows_in=None):
+        """Measure the code inside the with-block as one step. Yields the step dict to fill in row counts."""
+        parent = self.current_step()
+        with self.lock:
+            step = {
+                'id': len(self.steps),
+                'parent': parent['id'] if parent else None,
+                'kind': kind,
+                'name': name,
+                'rows_in': rows_in,
+                'rows_out': None,
+                'rows_skipped': None,
+                'rows_resumed': None,
+                'round_trips': 0,
+            }
+            self.steps.append(step)
+
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        self.local.stack.append(step)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        peak_start = peak_memory_mb()
+        try:
+            yield step
+        finally:
+            step['wall_s'] = round(time.perf_counter() - wall_start, 4)
+            step['cpu_s'] = round(time.thread_time() - cpu_start, 4)
+            step['process_peak_mb'] = peak_memory_mb()
+            step['peak_growth_mb'] = (round(step['process_peak_mb'] - peak_start, 1)
+                                      if peak_start is not None else None)
+            if step['rows_in'] is not None and step['rows_out'] is not None and step['kind'] == 'insert':
+                # Rows committed by an earlier run were neither written nor skipped by this one
+                step['rows_skipped'] = step['rows_in'] - step['rows_out'] - (step['rows_resumed'] or 0)
+            self.local.stack.pop()
+
+    def in_current_step(self, func):
+        """
+        Wrap a function that will run on another thread (e.g. a shard loader)
+        so its round-trips and nested steps are attributed to the current step.
+        """
+        stack = list(getattr(self.local, 'stack', []))
+
+        def wrapper(*args, **kwargs):
+            self.local.stack = list(stack)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def count_round_trips(self, count=1):
+        """Add database round-trips to the step that is currently running on this thread."""
+        step = self.current_step()
+        if step is not None:
+            with self.lock:
+                step['round_trips'] += count
+
+    def attach(self, engine):
+        """Count every statement SQLAlchemy sends through this engine as a round-trip."""
+        @event.listens_for(engine, 'before_cursor_execute')
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            self.count_round_trips()
+
+    def rows_written(self):
+        """Rows actually written per table (conflicting rows skipped by ON CONFLICT don't count)."""
+        written = {}
+        for step in self.steps:
+            if step['kind'] == 'insert' and step['rows_out']:
+                written[step['name']] = written.get(step['name'], 0) + step['rows_out']
+        return written
+
+    def summary_rows(self):
+        """One row per step. For stages, the time spent outside nested steps is shown as transform time."""
+        rows = []
+        for step in self.steps:
+            transform_s = None
+            if step['kind'] == 'stage':
+                child_time = sum(child.get('wall_s', 0) for child in self.steps if child['parent'] == step['id'])
+                transform_s = round(max(0.0, step.get('wall_s', 0) - child_time), 4)
+            rows.append(dict(step, transform_s=transform_s))
+        return rows
+
+    def print_summary(self):
+        """Print a human-readable table of all measured steps."""
+        print("\n" + "=" * 112)
+        print("INGESTION RUN REPORT")
+        print("=" * 112)
+        print(f"{'step':<34}{'kind':<11}{'wall s':>9}{'cpu s':>9}{'xform s':>9}"
+              f"{'rows in':>12}{'rows out':>12}{'skipped':>10}{'trips':>8}")
+        print("-" * 112)
+        for row in self.summary_rows():
+            indent = '  ' if row['parent'] is not None else ''
+            print(f"{(indent + row['name'])[:33]:<34}{row['kind']:<11}{row['wall_s']:>9.2f}{row['cpu_s']:>9.2f}"
+                  f"{format_seconds(row['transform_s']):>9}{format_count(row['rows_in']):>12}"
+                  f"{format_count(row['rows_out']):>12}{format_count(row['rows_skipped']):>10}{row['round_trips']:>8}")
+        print("-" * 112)
+        print(f"Process peak memory: {peak_memory_mb()} MB")
+
+    def write(self, options=None):
+        """Save the full report as JSON in REPORT_DIR and return the file path."""
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_file = os.path.join(REPORT_DIR, f"ingest_run_{timestamp}.json")
+
+        report = {
+            'started_at': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'total_wall_s': round(time.time() - self.started, 3),
+            'peak_memory_mb': peak_memory_mb(),
+            'options': options or {},
+            'rows_written': self.rows_written(),
+            'steps': self.summary_rows(),
+        }
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=4)
+        return report_file
+
+
+def format_seconds(value):
+    """Format a duration for the summary table ('-' when it doesn't apply)."""
+    return '-' if value is None else f"{value:.2f}"
+
+
+def format_count(value):
+    """Format a row count for the summary table ('-' when it wasn't recorded)."""
+    return '-' if value is None else f"{value:,}"
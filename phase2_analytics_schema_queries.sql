@@ -16,8 +16,9 @@ SELECT
     release_year,
     total_listens,
     rank_in_year
-FROM analytics.mart_top_artists_yearly
-WHERE rank_in_year <= 3
+FROM analytics.mart_yearly_rollup
+WHERE grain = 'year_artist'
+  AND rank_in_year <= 3
   AND release_year > 2000
 ORDER BY release_year DESC, rank_in_year ASC;
 
@@ -1,11 +1,23 @@
-import pandas as pd
+import argparse
 import os
 
+import numpy as np
+import pandas as pd
+
+from fma_parsing import parse_track_genres
+from genre_hierarchy import build_genre_hierarchy
+
 # =================================================================================
 # --- CONFIGURATION ---
 # =================================================================================
 # This script creates a small, sampled version of the large raw dataset.
 # This is useful for faster testing and development.
+#
+# It samples tracks (at random, or stratified by year and top-level genre) and then
+# pulls in exactly the albums, artists, genres and echonest rows those tracks
+# reference, so clean_and_report.py keeps the whole sample instead of dropping
+# tracks whose album or artist is missing. The raw files are streamed chunk by chunk,
+# so they can be bigger than memory.
 
 # The folder containing your original large CSV files.
 SOURCE_DIR = 'fma_metadata'
@@ -13,49 +25,278 @@ SOURCE_DIR = 'fma_metadata'
 # The folder where the new, smaller CSV files will be saved.
 OUTPUT_DIR = 'fma_metadata_sampled'
 
-# The number of rows you want in your sample files.
-ROWS_TO_SAMPLE = 3000
+# How many tracks to sample: a number of tracks ('3000') or a share of them ('10%', '0.1').
+DEFAULT_SAMPLE_SIZE = '3000'
+
+# The same seed (and the same raw files) always gives the same sample.
+DEFAULT_SEED = 42
+
+# Rows read from a raw file at a time.
+CHUNK_ROWS = 50_000
+
+# Row holding the column names in each raw file. The echonest file has three
+# rows of multi-level headers first; its ID column is named on the fourth row.
+HEADER_ROW = {'echonest': 3}
+
+# The year of a track comes from the first of these columns the tracks file has.
+YEAR_COLUMNS = ['track_date_created', 'track_date_recorded']
+
+# In --size 10% mode a stratum keeps this many standard deviations of spare
+# candidates while streaming, so it can still fill its share once the final
+# row counts are known.
+SPARE_SIGMAS = 4
+
+
+def raw_file_path(directory, name):
+    """Path of one raw CSV file."""
+    return os.path.join(directory, f"raw_{name}.csv")
+
+
+def parse_sample_size(size):
+    """
+    Turn a --size value into ('rows', n) or ('fraction', f).
+    '3000' means 3000 tracks; '10%' or '0.1' means a tenth of them.
+    """
+    size = size.strip()
+    if size.endswith('%'):
+        fraction = float(size[:-1]) / 100
+    elif '.' in size:
+        fraction = float(size)
+    else:
+        return 'rows', int(size)
+
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Sample size {size!r} must be between 0% and 100%")
+    return 'fraction', fraction
+
+
+def read_chunks(directory, name, usecols=None, chunk_rows=CHUNK_ROWS):
+    """
+    Read one raw file chunk by chunk. Every value is kept as the exact text in the
+    file (empty fields stay empty), so the rows we copy come out unchanged.
+    """
+    return pd.read_csv(raw_file_path(directory, name), header=HEADER_ROW.get(name, 0), usecols=usecols,
+                       dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+def to_ids(values):
+    """Numeric IDs of a text column; anything that isn't a number becomes -1."""
+    return pd.to_numeric(values, errors='coerce').fillna(-1).astype('int64')
+
+
+def load_genre_hierarchy(directory):
+    """
+    Root genre and ancestor path of every genre (the genres file is small enough to read whole).
+    Top-level genres have parent 0 in the raw file, and some genres point to parents that
+    don't exist; like clean_genres, both are treated as top-level genres.
+    """
+    genres = pd.read_csv(raw_file_path(directory, 'genres'), usecols=['genre_id', 'genre_parent_id'])
+    genres = genres.rename(columns={'genre_parent_id': 'parent_id'})
+    genres.loc[~genres['parent_id'].isin(genres['genre_id']), 'parent_id'] = np.nan
+    hierarchy, _ = build_genre_hierarchy(genres)
+    return hierarchy.set_index('genre_id')
+
+
+def genre_strings(track_ids, track_genres):
+    """(track_id, track_genres) frame for fma_parsing.parse_track_genres; empty fields become missing."""
+    return pd.DataFrame({'track_id': np.asarray(track_ids),
+                         'track_genres': track_genres.replace('', np.nan).to_numpy()})
+
+
+def track_strata(chunk, year_column, hierarchy, stratify):
+    """
+    The stratum of every track in a chunk: the year it was created/recorded and the
+    top-level genre of its first listed genre (-1 where either is unknown).
+    """
+    if stratify == 'none':
+        return pd.DataFrame({'year': 0, 'top_genre': 0}, index=chunk.index)
+
+    years = pd.Series(-1, index=chunk.index)
+    if year_column:
+        years = pd.to_numeric(chunk[year_column].str.extract(r'(\d{4})')[0], errors='coerce').fillna(-1)
+
+    pairs = parse_track_genres(genre_strings(chunk.index, chunk['track_genres']))
+    first_genre = pairs.drop_duplicates('track_id').set_index('track_id')['genre_id']
+    top_genre = first_genre.map(hierarchy['root_genre_id'])
+
+    return pd.DataFrame({
+        'year': years.astype('int64'),
+        'top_genre': pd.Series(chunk.index, index=chunk.index).map(top_genre).fillna(-1).astype('int64'),
+    }, index=chunk.index)
+
+
+def reservoir_capacity(counts, mode, size):
+    """
+    How many of the lowest-keyed tracks each stratum has to keep so far.
+    For a number of tracks, no stratum can ever get more than that number. For a
+    share, a stratum gets about that share of its rows, plus some spare candidates.
+    """
+    if mode == 'rows':
+        return pd.Series(size, index=counts.index)
+    expected = counts * size
+    return np.ceil(expected + SPARE_SIGMAS * np.sqrt(expected)).astype('int64') + 1
+
+
+def allocate(counts, total):
+    """Split total tracks over the strata in proportion to their size (largest remainder method)."""
+    total = min(total, int(counts.sum()))
+    exact = counts / counts.sum() * total
+    allocation = np.floor(exact).astype('int64')
+    leftover = total - int(allocation.sum())
+    largest_remainders = (exact - allocation).sort_values(ascending=False, kind='stable').index[:leftover]
+    allocation.loc[largest_remainders] += 1
+    return allocation
+
+
+def sample_track_ids(directory, mode, size, seed, stratify, hierarchy, chunk_rows):
+    """
+    Pick the sampled track IDs in one pass over the tracks file.
+
+    Every track gets a random key from the seeded generator (drawn in file order, so
+    the keys don't depend on the chunk size). Each stratum keeps only its tracks with
+    the lowest keys - a reservoir sample - so memory grows with the sample, not the
+    file. At the end the sample size is split over the strata in proportion to their
+    row counts and each stratum contributes its lowest-keyed tracks.
+    """
+    header = pd.read_csv(raw_file_path(directory, 'tracks'), nrows=0).columns
+    year_column = next((column for column in YEAR_COLUMNS if column in header), None)
+    usecols = ['track_id', 'track_genres'] + ([year_column] if year_column else [])
+
+    rng = np.random.default_rng(seed)
+    strata = ['year', 'top_genre']
+    reservoir = None
+    counts = None
+
+    for chunk in read_chunks(directory, 'tracks', usecols, chunk_rows):
+        keys = rng.random(len(chunk))
+        chunk.index = to_ids(chunk['track_id'])
+        candidates = track_strata(chunk, year_column, hierarchy, stratify)
+        candidates['track_id'] = chunk.index
+        candidates['key'] = keys
+        candidates = candidates[candidates['track_id'] >= 0].reset_index(drop=True)
 
-# --- Automatically build full paths ---
-CWD = os.getcwd()
-SOURCE_PATH = os.path.join(CWD, SOURCE_DIR)
-OUTPUT_PATH = os.path.join(CWD, OUTPUT_DIR)
+        chunk_counts = candidates.groupby(strata).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0).astype('int64')
+        reservoir = pd.concat([reservoir, candidates], ignore_index=True).sort_values('key', kind='stable')
+        capacity = reservoir_capacity(counts, mode, size)
+        rank = reservoir.groupby(strata).cumcount()
+        limit = capacity.reindex(pd.MultiIndex.from_frame(reservoir[strata])).to_numpy()
+        reservoir = reservoir[rank.to_numpy() < limit]
+
+    if counts is None or counts.empty:
+        return np.array([], dtype='int64'), pd.Series(dtype='int64')
+
+    total = size if mode == 'rows' else round(size * counts.sum())
+    allocation = allocate(counts, total)
+    rank = reservoir.groupby(strata).cumcount()
+    limit = allocation.reindex(pd.MultiIndex.from_frame(reservoir[strata])).to_numpy()
+    return np.sort(reservoir.loc[rank.to_numpy() < limit, 'track_id'].to_numpy(dtype='int64')), counts
+
+
+def copy_rows(source_dir, output_dir, name, keep, collect=(), chunk_rows=CHUNK_ROWS):
+    """
+    Stream a raw file into the output folder, keeping the header rows as they are and
+    only the data rows for which keep(chunk) is True.
+    Returns the collect columns of the kept rows (e.g. the IDs they reference).
+    """
+    source_file = raw_file_path(source_dir, name)
+    output_file = raw_file_path(output_dir, name)
+
+    with open(source_file, newline='') as f:
+        header_lines = [f.readline() for _ in range(HEADER_ROW.get(name, 0) + 1)]
+
+    kept_rows = 0
+    collected = []
+    with open(output_file, 'w', newline='') as out:
+        out.writelines(header_lines)
+        for chunk in read_chunks(source_dir, name, chunk_rows=chunk_rows):
+            rows = chunk[keep(chunk).to_numpy()]
+            rows.to_csv(out, header=False, index=False)
+            kept_rows += len(rows)
+            collected.append(rows[list(collect)])
+
+    print(f"  raw_{name}.csv: {kept_rows:,} rows")
+    return pd.concat(collected, ignore_index=True) if collected else pd.DataFrame(columns=list(collect))
+
+
+def genre_closure(genre_ids, hierarchy):
+    """The given genres plus all their ancestors, so every parent a sampled genre points to is there too."""
+    closure = set(int(genre_id) for genre_id in genre_ids)
+    paths = hierarchy['ancestor_path'].reindex(list(closure)).dropna()
+    for path in paths:
+        closure.update(int(genre_id) for genre_id in path.split('/'))
+    return np.array(sorted(closure), dtype='int64')
+
+
+def parse_args():
+    """Read the command line options."""
+    parser = argparse.ArgumentParser(description="Create a smaller, self-consistent sample of the raw FMA files.")
+    parser.add_argument('--size', default=DEFAULT_SAMPLE_SIZE,
+                        help="number of tracks ('3000') or share of the tracks ('10%%', '0.1') to sample")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help="random seed; the same seed gives the same sample")
+    parser.add_argument('--stratify', choices=['year-genre', 'none'], default='year-genre',
+                        help="sample evenly across (year, top-level genre) groups, or uniformly at random")
+    parser.add_argument('--source', default=SOURCE_DIR, help="folder with the raw CSV files")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="folder to write the sampled CSV files to")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="rows read from a raw file at a time")
+    return parser.parse_args()
 
 
 def main():
     """
-    Main function to sample all CSVs in the source directory.
+    Sample the tracks, then copy exactly the rows of the other files they reference.
     """
+    args = parse_args()
+    source_path = os.path.join(os.getcwd(), args.source)
+    output_path = os.path.join(os.getcwd(), args.output)
+
     # Check if the source directory exists
-    if not os.path.isdir(SOURCE_PATH):
-        print(f"Error: Source directory '{SOURCE_PATH}' not found.")
+    if not os.path.isdir(source_path):
+        print(f"Error: Source directory '{source_path}' not found.")
         return
 
+    mode, size = parse_sample_size(args.size)
+
     # Create the output directory if it doesn't exist
-    os.makedirs(OUTPUT_PATH, exist_ok=True)
-    print(f"Output will be saved to: '{OUTPUT_PATH}'")
+    os.makedirs(output_path, exist_ok=True)
+    print(f"Output will be saved to: '{output_path}'")
+
+    hierarchy = load_genre_hierarchy(source_path)
 
-    # Loop through each file in the source directory
-    for filename in os.listdir(SOURCE_PATH):
-        if filename.endswith('.csv'):
-            source_file = os.path.join(SOURCE_PATH, filename)
-            output_file = os.path.join(OUTPUT_PATH, filename)
+    print(f"\nSampling tracks ({args.size}, stratified by {args.stratify}, seed {args.seed})...")
+    track_ids, counts = sample_track_ids(source_path, mode, size, args.seed, args.stratify,
+                                         hierarchy, args.chunk_rows)
+    print(f"  Picked {len(track_ids):,} of {int(counts.sum()):,} tracks from {len(counts):,} strata")
 
-            try:
-                print(f"Processing '{filename}'...")
+    print("\nCopying the sampled rows...")
+    tracks = copy_rows(source_path, output_path, 'tracks',
+                       lambda chunk: to_ids(chunk['track_id']).isin(track_ids),
+                       collect=['track_id', 'album_id', 'artist_id', 'track_genres'],
+                       chunk_rows=args.chunk_rows)
 
-                # Some files have multi-level headers, so we handle that.
-                header_row = 2 if 'echonest' in filename else 0
+    # Albums of the sampled tracks; cleaning matches albums to artists by name
+    album_ids = to_ids(tracks['album_id']).unique()
+    albums = copy_rows(source_path, output_path, 'albums',
+                       lambda chunk: to_ids(chunk['album_id']).isin(album_ids),
+                       collect=['artist_name'], chunk_rows=args.chunk_rows)
 
-                # Read only the first 'rows_to_sample' rows from the CSV
-                df = pd.read_csv(source_file, header=header_row, nrows=ROWS_TO_SAMPLE, low_memory=False)
+    # Artists of the sampled tracks, plus the artists the sampled albums name
+    artist_ids = to_ids(tracks['artist_id']).unique()
+    artist_names = set(albums['artist_name'])
+    copy_rows(source_path, output_path, 'artists',
+              lambda chunk: to_ids(chunk['artist_id']).isin(artist_ids) | chunk['artist_name'].isin(artist_names),
+              chunk_rows=args.chunk_rows)
 
-                # Save the sampled dataframe to a new CSV file
-                df.to_csv(output_file, index=False)
-                print(f"  -> Successfully created sample with {len(df)} rows.")
+    # Genres of the sampled tracks and their parents, up to the top-level genre
+    track_genres = parse_track_genres(genre_strings(to_ids(tracks['track_id']), tracks['track_genres']))
+    genre_ids = genre_closure(track_genres['genre_id'], hierarchy)
+    copy_rows(source_path, output_path, 'genres',
+              lambda chunk: to_ids(chunk['genre_id']).isin(genre_ids), chunk_rows=args.chunk_rows)
 
-            except Exception as e:
-                print(f"  -> Could not process {filename}. Error: {e}")
+    if os.path.exists(raw_file_path(source_path, 'echonest')):
+        copy_rows(source_path, output_path, 'echonest',
+                  lambda chunk: to_ids(chunk['track_id']).isin(track_ids), chunk_rows=args.chunk_rows)
 
     print("\nScript finished.")
 
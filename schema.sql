@@ -1,5 +1,5 @@
 -- Drop existing tables in reverse order to avoid dependency errors
-DROP TABLE IF EXISTS "Social", "Audio", "TrackLyricists", "TrackGenres", "AlbumEngineers", "ArtistLabels", "AlbumProducers", "TrackComposers", "Tracks", "Licenses", "Albums", "Artists", "Labels", "Lyricists", "Engineers", "Genres", "Producers", "Composers";
+DROP TABLE IF EXISTS "IngestDeferredDDL", "IngestCheckpoints", "GenreHierarchy", "Social", "Audio", "TrackLyricists", "TrackGenres", "AlbumEngineers", "ArtistLabels", "AlbumProducers", "TrackComposers", "Tracks", "Licenses", "Albums", "Artists", "Labels", "Lyricists", "Engineers", "Genres", "Producers", "Composers";
 
 -- ============== LOOKUP TABLES (INDEPENDENT ENTITIES) ==============
 CREATE TABLE "Genres" (
@@ -8,6 +8,14 @@ CREATE TABLE "Genres" (
     "genre_name" VARCHAR(100) NOT NULL UNIQUE
 );
 
+-- Position of every genre in the parent/child tree, computed during ingestion
+CREATE TABLE "GenreHierarchy" (
+    "genre_id" INTEGER PRIMARY KEY REFERENCES "Genres"("genre_id"),
+    "depth" INTEGER NOT NULL,
+    "root_genre_id" INTEGER NOT NULL REFERENCES "Genres"("genre_id"),
+    "ancestor_path" VARCHAR(255) NOT NULL
+);
+
 CREATE TABLE "Engineers" (
     "engineer_id" SERIAL PRIMARY KEY,
     "engineer_name" VARCHAR(255) NOT NULL UNIQUE
@@ -143,4 +151,29 @@ CREATE TABLE "Social" (
     "artist_hotttnesss" REAL,
     "song_currency" REAL,
     "song_hotttnesss" REAL
-);
\ No newline at end of file
+);
+
+
+-- ============== INGESTION CONTROL TABLES ==============
+
+-- Stages/chunks committed by ingest_data.py, so an interrupted load can be resumed.
+-- Recreating the schema also clears the checkpoints.
+CREATE TABLE "IngestCheckpoints" (
+    "run_key" VARCHAR(64) NOT NULL,
+    "step" VARCHAR(100) NOT NULL,
+    "chunk" INTEGER NOT NULL,
+    "completed_at" TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY ("run_key", "step", "chunk")
+);
+
+-- Indexes and foreign keys dropped by ingest_data.py --defer-indexes, recorded before
+-- they are dropped and removed once they are restored. Anything still listed after a
+-- crash is restored by the next run.
+CREATE TABLE "IngestDeferredDDL" (
+    "kind" VARCHAR(20) NOT NULL,
+    "name" VARCHAR(100) NOT NULL,
+    "table_name" VARCHAR(200),
+    "definition" TEXT NOT NULL,
+    "dropped_at" TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY ("kind", "name")
+);
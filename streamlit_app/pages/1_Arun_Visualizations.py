@@ -268,7 +268,8 @@ with col2:
     )
 
 # Query data
-timeline_df = execute_query(get_artist_timeline_data(top_n_artists))
+timeline_query, timeline_params = get_artist_timeline_data(top_n_artists)
+timeline_df = execute_query(timeline_query, timeline_params)
 
 if not timeline_df.empty:
     timeline_df = timeline_df[
@@ -9,6 +9,9 @@ import pandas as pd
 import streamlit as st
 from typing import Optional
 
+# Shared column type registry from the project root (copied into the image by the Dockerfile)
+from fma_dtypes import apply_dtypes
+
 # Database configuration
 DB_CONFIG = {
     'host': 'postgres',  # Docker service name
@@ -43,7 +46,8 @@ def execute_query(query: str, params: Optional[tuple] = None) -> pd.DataFrame:
         params: Optional tuple of parameters for parameterized queries
 
     Returns:
-        pandas DataFrame with query results
+        pandas DataFrame with query results, with known FMA columns converted to
+        their compact types (32-bit numbers, categories, dates)
     """
     conn = get_connection()
     if conn is None:
@@ -51,7 +55,8 @@ def execute_query(query: str, params: Optional[tuple] = None) -> pd.DataFrame:
 
     try:
         df = pd.read_sql_query(query, conn, params=params)
-        return df
+        # Plain NumPy types only, so Plotly and pydeck handle the columns as before
+        return apply_dtypes(df, numpy_only=True)
     except Exception as e:
         st.error(f"❌ Query execution failed: {str(e)}")
         st.code(query, language='sql')
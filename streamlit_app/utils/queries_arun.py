@@ -7,38 +7,25 @@ All queries use dbt analytics tables for optimal performance
 def get_artist_timeline_data(top_n: int = 10):
     """
     Query for Artist Timeline - Top N artists PER YEAR
+    Returns the query and its parameters, for execute_query(query, params)
     """
-    query = f"""
-    WITH yearly_artist_listens AS (
-        SELECT 
-            a.artist_name,
-            EXTRACT(YEAR FROM t.track_date_recorded)::integer as year,
-            SUM(COALESCE(t.track_listens, 0)) as total_listens
-        FROM public."Artists" a
-        JOIN public."Tracks" t ON a.artist_id = t.artist_id
-        WHERE t.track_date_recorded IS NOT NULL
-          AND EXTRACT(YEAR FROM t.track_date_recorded) BETWEEN 2000 AND 2020
-        GROUP BY a.artist_name, EXTRACT(YEAR FROM t.track_date_recorded)
-        HAVING SUM(COALESCE(t.track_listens, 0)) > 100
-    ),
-    ranked_by_year AS (
-        SELECT 
-            year,
-            artist_name,
-            total_listens,
-            ROW_NUMBER() OVER (PARTITION BY year ORDER BY total_listens DESC) as rank_in_year
-        FROM yearly_artist_listens
-    )
+    # rank_in_year orders each year's artists by listens (ties by name), so the
+    # artists with 100 listens or fewer all rank after the others: keeping the
+    # first N and then dropping those gives the same rows as dropping them first
+    query = """
     SELECT 
-        year,
+        release_year as year,
         artist_name,
         total_listens as popularity_score,
         rank_in_year
-    FROM ranked_by_year
-    WHERE rank_in_year <= {top_n}
+    FROM analytics.mart_yearly_rollup
+    WHERE grain = 'year_artist'
+      AND rank_in_year <= %s
+      AND release_year BETWEEN 2000 AND 2020
+      AND total_listens > 100
     ORDER BY year, rank_in_year;
     """
-    return query
+    return query, (top_n,)
 
 
 def get_genre_audio_features(selected_genres: list = None):
@@ -17,23 +17,15 @@ def get_top_genres_yearly(year_start: int = None, year_end: int = None):
     """
     
     query = """
-    WITH YearlyStats AS (
-        SELECT
-            g.genre_name,
-            EXTRACT(YEAR FROM t.track_date_recorded) AS release_year,
-            SUM(t.track_listens) AS total_listens
-        FROM analytics.dim_genres g 
-        JOIN analytics.bridge_track_genres tg ON tg.genre_id = g.genre_id
-        JOIN analytics.fact_track_performance t ON tg.track_id = t.track_id 
-        WHERE t.track_date_recorded > '1900-01-01'
-        GROUP BY 1,2
-    ),
-    RankedStats AS (
-        SELECT *, RANK() OVER (PARTITION BY release_year ORDER BY total_listens DESC) as yr_rank
-        FROM YearlyStats
-    )
-    SELECT * FROM RankedStats
-    WHERE yr_rank <= 10
+    SELECT
+        genre_name,
+        release_year,
+        total_listens,
+        rank_in_year AS yr_rank
+    FROM analytics.mart_yearly_rollup
+    WHERE grain = 'year_genre'
+      AND rank_in_year <= 10
+      AND release_year >= 1900
     ORDER BY release_year DESC, yr_rank ASC;
     """
     return query
@@ -52,9 +44,10 @@ def get_top_artists_yearly(year_start: int = None, year_end: int = None):
             top.rank_in_year,
             prof.top_genre,
             prof.associated_labels
-        FROM analytics.mart_top_artists_yearly top
-        JOIN analytics.mart_artist_profiles prof on top.artist_name = prof.artist_name
-        WHERE rank_in_year <= 10
+        FROM analytics.mart_yearly_rollup top
+        JOIN analytics.mart_artist_profiles prof on top.artist_id = prof.artist_id
+        WHERE top.grain = 'year_artist'
+          AND top.rank_in_year <= 10
         ORDER BY release_year DESC, rank_in_year ASC
     """
     
@@ -0,0 +1,362 @@
+import argparse
+import math
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from clean_and_report import COLUMNS_TO_KEEP
+from fma_parsing import TOKEN_SEPARATOR
+
+# =================================================================================
+# --- CONFIGURATION ---
+# =================================================================================
+# This script creates a synthetic raw dataset of any size with the same shape as the
+# real one, for testing the pipeline and dashboard at 10x, 100x or 1000x the data.
+# (sampler.py does the opposite: it makes the dataset smaller.)
+#
+# It learns from the cleaned files: every synthetic row starts from a real row
+# picked at random, so column distributions, null rates and correlations carry over.
+# The fan-out (tracks per album, albums per artist, genres and contributors per
+# row) follows the real counts, and names of engineers, labels and other
+# contributors get copy numbers so the number of distinct names grows with the data.
+# IDs are renumbered so that every track points to an album and an artist in the
+# output, and every album to an artist, which is what clean_and_report.py checks.
+#
+# The output is the raw CSV layout clean_and_report.py reads (including the
+# multi-row echonest header). Each file is generated in blocks on a pool of worker
+# processes and written block by block, so memory doesn't grow with the output size.
+
+# The folder with the cleaned files to learn from (see clean_and_report.py).
+CLEANED_DATA_DIR = 'fma_metadata_cleaned'
+
+# The folder where the synthetic raw CSV files will be saved.
+OUTPUT_DIR = 'fma_metadata_synthetic'
+
+# Output size as a multiple of the number of tracks in the cleaned data.
+DEFAULT_SCALE = 10
+
+# The same seed (and the same cleaned files) always gives the same output,
+# whatever the number of workers.
+DEFAULT_SEED = 42
+
+# Rows generated per block. Each worker holds about one block in memory.
+BLOCK_ROWS = 100_000
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Raw files are written in this order; each table gets its own random stream.
+TABLES = ['genres', 'artists', 'albums', 'tracks', 'echonest']
+
+# Multi-valued name columns whose names get copy numbers
+CONTRIBUTOR_COLUMNS = {
+    'artists': ['artist_associated_labels'],
+    'albums': ['album_engineer', 'album_producer'],
+    'tracks': ['track_composer', 'track_lyricist'],
+}
+
+# Raw files write dates like '11/26/2008'
+RAW_DATE_FORMAT = '%m/%d/%Y'
+
+# The echonest file starts with three header rows (source, feature group, feature
+# name) and a row naming the track_id column.
+ECHONEST_FEATURE_GROUPS = {
+    'audio_features': ['acousticness', 'danceability', 'energy', 'instrumentalness', 'liveness',
+                       'speechiness', 'tempo', 'valence'],
+    'social_features': ['artist_discovery', 'artist_familiarity', 'artist_hotttnesss', 'song_currency',
+                        'song_hotttnesss'],
+}
+
+# Set in each worker process by init_worker
+MODEL = None
+
+
+def raw_file_path(directory, name):
+    """Path of one raw CSV file."""
+    return os.path.join(directory, f"raw_{name}.csv")
+
+
+def learn_model(cleaned_dir):
+    """
+    Read the cleaned tables and work out what the generator needs: the rows to copy
+    from and the real fan-out counts.
+    """
+    print(f"Learning from {os.path.join(os.getcwd(), cleaned_dir)}...")
+    tables = {name: pd.read_parquet(os.path.join(cleaned_dir, f"clean_{name}.parquet")) for name in TABLES}
+    tracks, albums, artists = tables['tracks'], tables['albums'], tables['artists']
+
+    tracks_per_album = tracks['album_id'].value_counts().to_numpy(dtype='int64')
+    albums_per_artist = albums['artist_name'].value_counts().to_numpy(dtype='int64')
+
+    model = {
+        'genres': tables['genres'],
+        # Donor rows, without the ID columns the generator fills in itself
+        'artists': artists.drop(columns=['artist_id']).reset_index(drop=True),
+        'albums': albums.drop(columns=['album_id', 'artist_name']).reset_index(drop=True),
+        'tracks': tracks.drop(columns=['track_id', 'album_id', 'artist_id']).reset_index(drop=True),
+        'echonest': tables['echonest'].drop(columns=['track_id']).reset_index(drop=True),
+        'artist_names': artists['artist_name'].dropna().astype(str).to_numpy(),
+        'tracks_per_album': tracks_per_album,
+        'albums_per_artist': albums_per_artist,
+        # Albums without tracks and artists without albums are kept in the same proportion
+        'album_share_with_tracks': len(tracks_per_album) / max(1, len(albums)),
+        'artist_share_with_albums': len(albums_per_artist) / max(1, len(artists)),
+        'echonest_share': len(tables['echonest']) / max(1, len(tracks)),
+        'track_count': len(tracks),
+    }
+    for name in ['artists', 'albums', 'tracks', 'echonest']:
+        print(f"  {name}: {len(model[name]):,} rows")
+    return model
+
+
+def draw_sizes(rng, observed, total):
+    """
+    Draw group sizes from the observed ones (e.g. tracks per album) until they add up
+    to total; the last group is cut short to land exactly on it.
+    """
+    if total <= 0:
+        return np.empty(0, dtype='int64')
+    sizes = []
+    remaining = total
+    while remaining > 0:
+        batch = rng.choice(observed, size=max(1, int(remaining / observed.mean() * 1.1)))
+        cumulative = np.cumsum(batch)
+        cut = np.searchsorted(cumulative, remaining)
+        batch = batch[:cut + 1]
+        sizes.append(batch)
+        remaining -= int(batch.sum())
+    sizes = np.concatenate(sizes)
+    sizes[-1] += remaining
+    return sizes
+
+
+def plan_ids(model, track_count, seed):
+    """
+    Decide how many albums and artists the output has and which album and artist
+    every track belongs to. Only two arrays per album are kept: where its tracks end
+    and which artist it belongs to (track and album IDs are consecutive from 1).
+    """
+    rng = np.random.default_rng([seed, len(TABLES)])
+
+    album_tracks = draw_sizes(rng, model['tracks_per_album'], track_count)
+    album_count = max(len(album_tracks), round(len(album_tracks) / model['album_share_with_tracks']))
+    album_tracks = np.concatenate([album_tracks, np.zeros(album_count - len(album_tracks), dtype='int64')])
+
+    artist_albums = draw_sizes(rng, model['albums_per_artist'], album_count)
+    artist_count = max(len(artist_albums), round(len(artist_albums) / model['artist_share_with_albums']))
+    album_artist = np.repeat(np.arange(1, len(artist_albums) + 1, dtype='int64'), artist_albums)
+
+    return {
+        'album_tracks': album_tracks,
+        'album_track_end': np.cumsum(album_tracks),
+        'album_artist': album_artist,
+        'album_count': album_count,
+        'artist_count': artist_count,
+        'track_count': track_count,
+    }
+
+
+def block_ranges(count, block_rows):
+    """Split IDs 1..count into (first, last + 1) blocks."""
+    return [(start, min(start + block_rows, count + 1)) for start in range(1, count + 1, block_rows)]
+
+
+def make_tasks(name, plan, block_rows, seed, copies):
+    """One task per block of a table, carrying just the slice of the plan that block needs."""
+    count = {'artists': plan['artist_count'], 'albums': plan['album_count'],
+             'tracks': plan['track_count'], 'echonest': plan['track_count']}[name]
+
+    tasks = []
+    for block, (start, end) in enumerate(block_ranges(count, block_rows)):
+        task = {'name': name, 'block': block, 'start': start, 'end': end, 'seed': seed, 'copies': copies}
+        if name == 'albums':
+            task['album_artist'] = plan['album_artist'][start - 1:end - 1]
+            task['album_tracks'] = plan['album_tracks'][start - 1:end - 1]
+        elif name == 'tracks':
+            # The albums whose tracks fall in this block
+            first = np.searchsorted(plan['album_track_end'], start - 1, side='right')
+            last = np.searchsorted(plan['album_track_end'], end - 2, side='right') + 1
+            task['album_first'] = first + 1
+            task['album_track_end'] = plan['album_track_end'][first:last]
+            task['album_artist'] = plan['album_artist'][first:last]
+        tasks.append(task)
+    return tasks
+
+
+def init_worker(model):
+    """Give each worker process its own copy of the learned model (sent once, not per block)."""
+    global MODEL
+    MODEL = model
+
+
+def artist_names(artist_ids):
+    """
+    Name of every artist ID. It only depends on the ID, so the album blocks can
+    name an album's artist without seeing the artist blocks.
+    """
+    base = MODEL['artist_names']
+    return pd.Series(base[artist_ids % len(base)]) + ' ' + pd.Series(artist_ids).astype(str)
+
+
+def scale_names(values, rng, copies):
+    """
+    Give the names in a multi-valued column ('A, B & C') a random copy number from 0 to
+    copies - 1 per row ('A 3, B 3, C 3'), so at N times the data there are about N times
+    as many distinct engineers, labels, etc. Copy 0 keeps the real names.
+    """
+    present = values.notna()
+    if copies <= 1 or not present.any():
+        return values
+
+    # A plain loop over the non-empty values is much faster here than
+    # explode + groupby-join, which builds a small Series per row
+    separator = re.compile(TOKEN_SEPARATOR)
+    copy_numbers = rng.integers(0, copies, int(present.sum()))
+    scaled = []
+    for value, copy in zip(values[present].astype(str), copy_numbers):
+        names = [name.strip() for name in separator.split(value) if name.strip()]
+        suffix = f" {copy}" if copy else ''
+        scaled.append(', '.join(f"{name}{suffix}" for name in names) or None)
+
+    result = pd.Series(None, index=values.index, dtype=object)
+    result[present] = scaled
+    return result
+
+
+def donor_rows(name, rng, count):
+    """Random real rows of a table to base the synthetic rows on."""
+    donors = MODEL[name]
+    return donors.iloc[rng.integers(0, len(donors), count)].reset_index(drop=True)
+
+
+def generate_block(task):
+    """Generate one block of a table and write it (without header) to a part file. Returns (path, rows)."""
+    name, start, end = task['name'], task['start'], task['end']
+    rng = np.random.default_rng([task['seed'], TABLES.index(name), task['block']])
+    ids = np.arange(start, end, dtype='int64')
+
+    if name == 'echonest':
+        # Only some tracks have Echonest features
+        ids = ids[rng.random(len(ids)) < MODEL['echonest_share']]
+
+    rows = donor_rows(name, rng, len(ids))
+    for column in CONTRIBUTOR_COLUMNS.get(name, []):
+        rows[column] = scale_names(rows[column], rng, task['copies'])
+
+    if name == 'artists':
+        rows['artist_id'] = ids
+        rows['artist_name'] = artist_names(ids)
+    elif name == 'albums':
+        rows['album_id'] = ids
+        rows['artist_name'] = artist_names(task['album_artist'])
+        rows['album_tracks'] = task['album_tracks']
+    elif name == 'tracks':
+        album_index = np.searchsorted(task['album_track_end'], ids - 1, side='right')
+        rows['track_id'] = ids
+        rows['album_id'] = task['album_first'] + album_index
+        rows['artist_id'] = task['album_artist'][album_index]
+    else:
+        rows['Unnamed: 0'] = ids
+
+    for column in rows.columns:
+        if pd.api.types.is_datetime64_any_dtype(rows[column]):
+            rows[column] = rows[column].dt.strftime(RAW_DATE_FORMAT)
+
+    part_file = os.path.join(task['parts_dir'], f"raw_{name}.{task['block']:06d}.csv")
+    rows[COLUMNS_TO_KEEP[name]].to_csv(part_file, header=False, index=False)
+    return part_file, len(rows)
+
+
+def header_text(name):
+    """The header row(s) of a raw file."""
+    columns = COLUMNS_TO_KEEP[name]
+    if name != 'echonest':
+        return ','.join(columns) + '\n'
+
+    features = columns[1:]
+    group_of = {feature: group for group, members in ECHONEST_FEATURE_GROUPS.items() for feature in members}
+    return (',' + ','.join('echonest' for _ in features) + '\n'
+            + ',' + ','.join(group_of[feature] for feature in features) + '\n'
+            + ',' + ','.join(features) + '\n'
+            + 'track_id' + ',' * len(features) + '\n')
+
+
+def write_table(pool, name, tasks, output_dir):
+    """Generate a table's blocks in parallel and append them to the raw file in order."""
+    started = time.perf_counter()
+    parts_dir = os.path.join(output_dir, '.parts')
+    os.makedirs(parts_dir, exist_ok=True)
+    for task in tasks:
+        task['parts_dir'] = parts_dir
+
+    total_rows = 0
+    with open(raw_file_path(output_dir, name), 'w', newline='') as out:
+        out.write(header_text(name))
+        # map returns results in block order, so each part can be appended as soon as it's ready
+        for part_file, rows in pool.map(generate_block, tasks):
+            with open(part_file, newline='') as part:
+                shutil.copyfileobj(part, out)
+            os.remove(part_file)
+            total_rows += rows
+
+    os.rmdir(parts_dir)
+    print(f"  raw_{name}.csv: {total_rows:,} rows in {len(tasks)} blocks ({time.perf_counter() - started:.1f}s)")
+
+
+def write_genres(model, output_dir):
+    """Genres are a small fixed tree; the synthetic data uses the real one."""
+    genres = model['genres'][COLUMNS_TO_KEEP['genres']]
+    genres.to_csv(raw_file_path(output_dir, 'genres'), index=False)
+    print(f"  raw_genres.csv: {len(genres):,} rows")
+
+
+def parse_args():
+    """Read the command line options."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic FMA-shaped raw dataset of any size.")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--scale', type=float, default=DEFAULT_SCALE,
+                      help="output size as a multiple of the tracks in the cleaned data")
+    size.add_argument('--tracks', type=int, help="number of tracks to generate (instead of --scale)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help="random seed; the same seed gives the same output")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS, help="rows generated per block")
+    parser.add_argument('--source', default=CLEANED_DATA_DIR, help="folder with the cleaned files to learn from")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="folder to write the raw CSV files to")
+    return parser.parse_args()
+
+
+def main():
+    """Learn from the cleaned data, plan the IDs, then generate every raw file."""
+    args = parse_args()
+
+    if not os.path.isdir(args.source):
+        print(f"Error: Cleaned data folder '{args.source}' not found. Run clean_and_report.py first.")
+        return
+
+    model = learn_model(args.source)
+    track_count = args.tracks if args.tracks is not None else round(model['track_count'] * args.scale)
+    scale = track_count / max(1, model['track_count'])
+    copies = max(1, math.ceil(scale))
+
+    plan = plan_ids(model, track_count, args.seed)
+    print(f"\nGenerating {track_count:,} tracks ({scale:.1f}x), {plan['album_count']:,} albums and "
+          f"{plan['artist_count']:,} artists with {args.workers} workers...")
+
+    os.makedirs(args.output, exist_ok=True)
+    write_genres(model, args.output)
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(model,)) as pool:
+        for name in ['artists', 'albums', 'tracks', 'echonest']:
+            tasks = make_tasks(name, plan, args.block_rows, args.seed, copies)
+            write_table(pool, name, tasks, args.output)
+
+    print(f"\nSynthetic raw files are ready in '{os.path.join(os.getcwd(), args.output)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+import clean_and_report
+from cleaning_manifest import CleaningManifest, step_fingerprint
+
+
+def test_fingerprint_depends_on_every_input():
+    base = step_fingerprint('raw', {'columns': ['a', 'b']}, ['upstream'])
+
+    assert step_fingerprint('raw', {'columns': ['a', 'b']}, ['upstream']) == base
+    assert step_fingerprint('raw2', {'columns': ['a', 'b']}, ['upstream']) != base
+    assert step_fingerprint('raw', {'columns': ['a', 'c']}, ['upstream']) != base
+    assert step_fingerprint('raw', {'columns': ['a', 'b']}, ['upstream2']) != base
+    assert step_fingerprint('raw', {'columns': ['a', 'b']}, []) != base
+
+
+def test_fingerprint_ignores_parameter_order():
+    assert (step_fingerprint('raw', {'columns': ['a'], 'code': 'x'}, [])
+            == step_fingerprint('raw', {'code': 'x', 'columns': ['a']}, []))
+
+
+def test_recorded_step_is_current_until_its_inputs_or_outputs_change(tmp_path):
+    raw_file = tmp_path / 'raw_artists.csv'
+    raw_file.write_text('artist_id\n1\n')
+    output_file = tmp_path / 'clean_artists.parquet'
+    output_file.write_bytes(b'')
+
+    manifest = CleaningManifest(str(tmp_path))
+    manifest.record('artists', 'fingerprint-1', str(raw_file), 'sha', rows=1)
+
+    # A new run reads the manifest back from disk
+    reloaded = CleaningManifest(str(tmp_path))
+    assert reloaded.is_current('artists', 'fingerprint-1', [str(output_file)])
+    assert not reloaded.is_current('artists', 'fingerprint-2', [str(output_file)])
+    assert not reloaded.is_current('albums', 'fingerprint-1', [str(output_file)])
+
+    os.remove(output_file)
+    assert not reloaded.is_current('artists', 'fingerprint-1', [str(output_file)])
+
+
+def test_raw_hash_is_reused_only_for_an_unchanged_file(tmp_path):
+    raw_file = tmp_path / 'raw_artists.csv'
+    raw_file.write_text('artist_id\n1\n')
+    manifest = CleaningManifest(str(tmp_path))
+    manifest.record('artists', 'fingerprint', str(raw_file), 'recorded-sha', rows=1)
+
+    assert manifest.raw_file_hash('artists', str(raw_file)) == 'recorded-sha'
+
+    raw_file.write_text('artist_id\n1\n2\n')
+    assert manifest.raw_file_hash('artists', str(raw_file)) not in ('recorded-sha', None)
+
+
+@pytest.fixture
+def cleaned_run(tmp_path, monkeypatch):
+    """A working folder with raw files and a manifest saying every table is up to date."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(clean_and_report.RAW_DATA_DIR)
+    os.makedirs(clean_and_report.CLEANED_DATA_DIR)
+    for name in clean_and_report.CLEANING_STEPS:
+        with open(clean_and_report.raw_file_path(name), 'w') as f:
+            f.write(f"{name}_id\n1\n")
+
+    manifest = CleaningManifest(clean_and_report.CLEANED_DATA_DIR)
+    fingerprints, raw_hashes, stale = clean_and_report.plan_cleaning(manifest)
+    assert stale == list(clean_and_report.CLEANING_STEPS)
+    for name in stale:
+        for output_file in clean_and_report.cleaned_file_paths(name):
+            open(output_file, 'wb').close()
+        manifest.record(name, fingerprints[name], clean_and_report.raw_file_path(name), raw_hashes[name], rows=1)
+    return manifest
+
+
+def test_nothing_is_stale_after_a_complete_run(cleaned_run):
+    _, _, stale = clean_and_report.plan_cleaning(CleaningManifest(clean_and_report.CLEANED_DATA_DIR))
+    assert stale == []
+
+
+def test_changed_raw_file_invalidates_the_tables_filtered_against_it(cleaned_run):
+    with open(clean_and_report.raw_file_path('artists'), 'a') as f:
+        f.write("2\n")
+
+    _, _, stale = clean_and_report.plan_cleaning(CleaningManifest(clean_and_report.CLEANED_DATA_DIR))
+    assert stale == ['artists', 'albums', 'tracks']
+
+
+def test_changed_leaf_file_invalidates_only_itself(cleaned_run):
+    with open(clean_and_report.raw_file_path('tracks'), 'a') as f:
+        f.write("2\n")
+
+    _, _, stale = clean_and_report.plan_cleaning(CleaningManifest(clean_and_report.CLEANED_DATA_DIR))
+    assert stale == ['tracks']
+
+
+def test_missing_output_file_makes_a_table_stale(cleaned_run):
+    os.remove(clean_and_report.cleaned_file_paths('echonest')[0])
+
+    _, _, stale = clean_and_report.plan_cleaning(CleaningManifest(clean_and_report.CLEANED_DATA_DIR))
+    assert stale == ['echonest']
+
+
+def test_force_cleans_everything(cleaned_run):
+    _, _, stale = clean_and_report.plan_cleaning(CleaningManifest(clean_and_report.CLEANED_DATA_DIR), force=True)
+    assert stale == list(clean_and_report.CLEANING_STEPS)
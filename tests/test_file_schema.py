@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from fma_dtypes import apply_dtypes
+from generate_file_schema import ColumnProfile
+
+
+def profile(values, chunk_rows):
+    column = ColumnProfile()
+    values = pd.Series(values, dtype=object)
+    for start in range(0, len(values), chunk_rows):
+        column.update(values.iloc[start:start + chunk_rows])
+    return column.result()
+
+
+# Numbers first, then text: the text only shows up in the later chunks
+MIXED = ['5', '900', '12', '31', 'abc', 'zz top', None, '7']
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 3, 4, len(MIXED)])
+def test_range_covers_every_chunk(chunk_rows):
+    result = profile(MIXED, chunk_rows)
+
+    assert result['dtype'] == 'text'
+    assert (result['min'], result['max']) == ('12', 'zz top')
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 3, 10])
+def test_numeric_range_covers_every_chunk(chunk_rows):
+    result = profile(['5', '-3', '900', None, '12'], chunk_rows)
+
+    assert result['dtype'] == 'Int32'
+    assert (result['min'], result['max']) == (-3, 900)
+
+
+@pytest.mark.parametrize('values, dtype', [
+    (['1', '2147483647'], 'int32'),
+    (['1', '2147483648'], 'int64'),
+    (['-2147483649', None], 'Int64'),
+    (['1', '99999999999999999999'], 'text'),
+])
+def test_integer_type_fits_the_range(values, dtype):
+    assert profile(values, 1)['dtype'] == dtype
+
+
+def test_inferred_64_bit_types_are_applied():
+    frame = pd.DataFrame({'big': ['1', '3000000000'], 'big_missing': ['3000000000', None]})
+    dtypes = {column: profile(frame[column], 1)['dtype'] for column in frame.columns}
+
+    typed = apply_dtypes(frame, dtypes=dtypes)
+    assert typed['big'].dtype == 'int64'
+    assert typed['big_missing'].dtype == 'Int64'
+    assert typed['big'].tolist() == [1, 3000000000]
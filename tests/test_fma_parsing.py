@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fma_parsing import parse_genre_list, parse_track_genres
+
+GENRE_STRINGS = {
+    1: "[{'genre_id': '21', 'genre_title': 'Hip-Hop', 'genre_url': 'http://freemusicarchive.org/genre/Hip-Hop/'}]",
+    2: "[{'genre_id': '76', 'genre_title': 'Experimental Pop'}, {'genre_id': '103', 'genre_title': 'Folk'}]",
+    3: '[{"genre_id": "12", "genre_title": "Rock"}]',
+    4: "[{'genre_id': 15, 'genre_title': 'Electronic'}]",
+    5: "[{'genre_title': \"Rock 'n' Roll\", 'genre_id': '25'}]",
+    6: "[]",
+    # The regex needs the ID right after the quote; literal_eval still reads ' 7'
+    7: "[{'genre_id' : ' 7', 'genre_title': 'Jazz'}]",
+    # The same genre listed twice is one link
+    8: "[{'genre_id': '21'}, {'genre_id': '21'}]",
+}
+
+
+def literal_eval_pairs(genre_strings):
+    """The (track_id, genre_id) pairs the slow path finds, one row at a time."""
+    pairs = {(track_id, genre_id)
+             for track_id, genre_string in genre_strings.items()
+             for genre_id in parse_genre_list(genre_string)}
+    return sorted(pairs)
+
+
+def parsed_pairs(tracks_df):
+    return sorted(map(tuple, parse_track_genres(tracks_df).to_numpy().tolist()))
+
+
+def test_regex_parser_matches_literal_eval():
+    tracks = pd.DataFrame({'track_id': list(GENRE_STRINGS), 'track_genres': list(GENRE_STRINGS.values())})
+    assert parsed_pairs(tracks) == literal_eval_pairs(GENRE_STRINGS)
+
+
+def test_unmatched_rows_fall_back_to_literal_eval():
+    tracks = pd.DataFrame({'track_id': [7], 'track_genres': [GENRE_STRINGS[7]]})
+    assert parsed_pairs(tracks) == [(7, 7)]
+
+
+@pytest.mark.parametrize('genre_string', [None, np.nan, '[]', 'not a list', "[{'genre_title': 'Rock'}]"])
+def test_rows_without_genres_give_no_pairs(genre_string):
+    tracks = pd.DataFrame({'track_id': [1], 'track_genres': [genre_string]})
+    assert parse_track_genres(tracks).empty
+
+
+def test_result_is_deduplicated_int32():
+    tracks = pd.DataFrame({'track_id': [8, 8], 'track_genres': [GENRE_STRINGS[8], GENRE_STRINGS[8]]})
+    result = parse_track_genres(tracks)
+    assert list(result.columns) == ['track_id', 'genre_id']
+    assert (result.dtypes == 'int32').all()
+    assert result.to_numpy().tolist() == [[8, 21]]
+
+
+def test_parse_genre_list_rejects_malformed_values():
+    assert parse_genre_list("[{'genre_id': '5'") == []
+    assert parse_genre_list("['5']") == []
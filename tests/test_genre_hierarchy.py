@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from genre_hierarchy import build_genre_hierarchy
+
+
+def genres(parent_of):
+    """A genres frame from {genre_id: parent_id}, with missing parents as NaN like the raw file."""
+    return pd.DataFrame({'genre_id': list(parent_of),
+                         'parent_id': [np.nan if parent is None else parent for parent in parent_of.values()]})
+
+
+def test_parents_come_before_children():
+    hierarchy, problems = build_genre_hierarchy(genres({4: 2, 3: 1, 2: 1, 1: None, 5: None, 6: 4}))
+
+    position = {genre_id: index for index, genre_id in enumerate(hierarchy['genre_id'])}
+    assert set(position) == {1, 2, 3, 4, 5, 6}
+    assert position[1] < position[2] < position[4] < position[6]
+    assert position[1] < position[3]
+    assert problems == {'orphans': [], 'cycles': []}
+
+
+def test_depth_root_and_path():
+    hierarchy, _ = build_genre_hierarchy(genres({1: None, 2: 1, 3: 2, 10: None}))
+    rows = hierarchy.set_index('genre_id')
+
+    assert rows.loc[3, 'depth'] == 2
+    assert rows.loc[3, 'root_genre_id'] == 1
+    assert rows.loc[3, 'ancestor_path'] == '1/2/3'
+    assert rows.loc[10, 'depth'] == 0
+    assert rows.loc[10, 'ancestor_path'] == '10'
+
+
+def test_orphans_and_their_descendants_are_reported():
+    # 20's parent doesn't exist, and 21 hangs below it
+    hierarchy, problems = build_genre_hierarchy(genres({1: None, 20: 99, 21: 20}))
+
+    assert hierarchy['genre_id'].tolist() == [1]
+    assert problems == {'orphans': [20, 21], 'cycles': []}
+
+
+def test_cycles_and_genres_below_them_are_reported():
+    # 30 and 31 are each other's parent, 32 sits below the cycle, 40 is its own parent
+    hierarchy, problems = build_genre_hierarchy(genres({1: None, 30: 31, 31: 30, 32: 31, 40: 40}))
+
+    assert hierarchy['genre_id'].tolist() == [1]
+    assert problems == {'orphans': [], 'cycles': [30, 31, 32, 40]}
+
+
+def test_parent_ids_read_as_text():
+    # The raw CSV can give the parent column as strings, with blanks for top-level genres
+    frame = pd.DataFrame({'genre_id': [1, 2], 'parent_id': ['', '1']})
+    hierarchy, problems = build_genre_hierarchy(frame)
+
+    assert hierarchy['genre_id'].tolist() == [1, 2]
+    assert problems == {'orphans': [], 'cycles': []}
@@ -0,0 +1,128 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sampler
+from sampler import allocate, load_genre_hierarchy, parse_sample_size, raw_file_path, sample_track_ids, track_strata
+
+TRACK_COUNT = 400
+
+# Three top-level genres (parent 0 in the raw file, like the real one), a child of
+# the first two and a grandchild of the first. Tracks only list 2, 10 and 100, so
+# 1 gets into a sample only as an ancestor, and 3 and 20 never do
+GENRES = pd.DataFrame({'genre_id': [1, 2, 3, 10, 20, 100], 'genre_parent_id': [0, 0, 0, 1, 2, 10],
+                       'title': ['Rock', 'Jazz', 'Folk', 'Punk', 'Bebop', 'Hardcore']})
+TRACK_GENRES = [2, 10, 100]
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """Raw files with tracks spread over a few years and genres, some missing either."""
+    rng = np.random.default_rng(0)
+    genre_ids = rng.choice(TRACK_GENRES, TRACK_COUNT)
+    years = rng.choice([2008, 2009, 2010, 2011], TRACK_COUNT)
+    tracks = pd.DataFrame({
+        'track_id': np.arange(2, 2 * TRACK_COUNT + 2, 2),
+        'album_id': np.arange(TRACK_COUNT) % 40,
+        'artist_id': np.arange(TRACK_COUNT) % 20,
+        'track_genres': [f"[{{'genre_id': '{genre_id}', 'genre_title': 'x'}}]" for genre_id in genre_ids],
+        'track_date_created': [f"{year}-11-26 01:48:12" for year in years],
+    })
+    tracks.loc[::17, 'track_genres'] = '[]'
+    tracks.loc[::23, 'track_date_created'] = ''
+    tracks.to_csv(raw_file_path(tmp_path, 'tracks'), index=False)
+    GENRES.to_csv(raw_file_path(tmp_path, 'genres'), index=False)
+    pd.DataFrame({'album_id': range(40), 'artist_name': [f"artist {i % 20}" for i in range(40)]}).to_csv(
+        raw_file_path(tmp_path, 'albums'), index=False)
+    pd.DataFrame({'artist_id': range(20), 'artist_name': [f"artist {i}" for i in range(20)]}).to_csv(
+        raw_file_path(tmp_path, 'artists'), index=False)
+    return tmp_path
+
+
+def sample(raw_dir, size, stratify, chunk_rows, seed=42):
+    mode, size = parse_sample_size(size)
+    track_ids, _ = sample_track_ids(raw_dir, mode, size, seed, stratify, load_genre_hierarchy(raw_dir), chunk_rows)
+    return track_ids.tolist()
+
+
+@pytest.mark.parametrize('stratify', ['year-genre', 'none'])
+@pytest.mark.parametrize('size', ['50', '10%'])
+def test_sample_does_not_depend_on_chunk_size(raw_dir, size, stratify):
+    whole_file = sample(raw_dir, size, stratify, chunk_rows=TRACK_COUNT)
+
+    assert len(whole_file) == (50 if size == '50' else 40)
+    for chunk_rows in [3, 7, 64]:
+        assert sample(raw_dir, size, stratify, chunk_rows) == whole_file
+
+
+def test_seed_changes_the_sample(raw_dir):
+    assert sample(raw_dir, '50', 'year-genre', 64) == sample(raw_dir, '50', 'year-genre', 64, seed=42)
+    assert sample(raw_dir, '50', 'year-genre', 64) != sample(raw_dir, '50', 'year-genre', 64, seed=7)
+
+
+def test_top_level_genres_are_read_from_parent_zero(raw_dir):
+    hierarchy = load_genre_hierarchy(raw_dir)
+
+    assert hierarchy['root_genre_id'].to_dict() == {1: 1, 2: 2, 3: 3, 10: 1, 20: 2, 100: 1}
+    assert hierarchy.loc[100, 'ancestor_path'] == '1/10/100'
+
+
+def test_sample_is_split_over_year_and_genre_strata(raw_dir):
+    hierarchy = load_genre_hierarchy(raw_dir)
+    track_ids, counts = sample_track_ids(raw_dir, 'rows', 50, 42, 'year-genre', hierarchy, 64)
+
+    assert {1, 2, -1} <= set(counts.index.get_level_values('top_genre'))
+
+    tracks = pd.read_csv(raw_file_path(raw_dir, 'tracks'), dtype=str, keep_default_na=False)
+    tracks.index = tracks['track_id'].astype('int64')
+    strata = track_strata(tracks, 'track_date_created', hierarchy, 'year-genre')
+    sampled = strata.loc[track_ids].groupby(['year', 'top_genre']).size()
+    expected = allocate(counts, 50)
+    assert sampled.to_dict() == expected[expected > 0].to_dict()
+
+
+def test_sampled_genres_bring_their_ancestors(raw_dir, monkeypatch):
+    output_dir = raw_dir / 'sampled'
+    monkeypatch.setattr(sys, 'argv', ['sampler.py', '--source', str(raw_dir), '--output', str(output_dir),
+                                      '--size', '50', '--chunk-rows', '64'])
+    sampler.main()
+
+    tracks = pd.read_csv(raw_file_path(output_dir, 'tracks'))
+    listed = set(tracks['track_genres'].str.extract(r"'genre_id': '(\d+)'")[0].dropna().astype(int))
+    genres = set(pd.read_csv(raw_file_path(output_dir, 'genres'))['genre_id'])
+
+    parent_of = dict(zip(GENRES['genre_id'], GENRES['genre_parent_id']))
+    ancestors = set()
+    for genre_id in listed:
+        while parent_of[genre_id]:
+            genre_id = parent_of[genre_id]
+            ancestors.add(genre_id)
+
+    assert 1 not in listed and 100 in listed
+    assert genres == listed | ancestors
+    assert 1 in genres and not {3, 20} & genres
+
+
+def test_full_share_keeps_every_track(raw_dir):
+    assert sample(raw_dir, '100%', 'year-genre', 7) == list(range(2, 2 * TRACK_COUNT + 2, 2))
+
+
+@pytest.mark.parametrize('size, expected', [('3000', ('rows', 3000)), ('10%', ('fraction', 0.1)),
+                                            ('0.25', ('fraction', 0.25))])
+def test_parse_sample_size(size, expected):
+    assert parse_sample_size(size) == expected
+
+
+@pytest.mark.parametrize('size', ['0%', '150%', '1.5'])
+def test_parse_sample_size_rejects_shares_outside_0_and_100_percent(size):
+    with pytest.raises(ValueError):
+        parse_sample_size(size)
+
+
+def test_allocate_splits_by_largest_remainder():
+    counts = pd.Series([5, 3, 2], index=['a', 'b', 'c'])
+
+    assert allocate(counts, 5).to_dict() == {'a': 3, 'b': 1, 'c': 1}
+    assert allocate(counts, 100).to_dict() == counts.to_dict()
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from fma_dtypes import apply_dtypes
+from fma_parsing import load_track_genres
+from genre_hierarchy import build_genre_hierarchy
+
+# Data-quality checks on the cleaned files, run before they are loaded.
+# Every rule is checked on the whole dataset at once with vectorized operations:
+# foreign keys are np.isin joins on integer arrays (text keys such as artist names
+# are hashed to integers first), so a full run takes seconds.
+# ingest_data.py runs this before every load; it can also be run on its own.
+
+CLEANED_DATA_DIR = 'fma_metadata_cleaned'
+
+# Violation reports (JSON) and quarantined rows (Parquet) are written here
+VALIDATION_DIR = 'validation_reports'
+
+# The primary key of every cleaned table, used to identify violating rows
+TABLE_KEYS = {
+    'genres': 'genre_id',
+    'artists': 'artist_id',
+    'albums': 'album_id',
+    'tracks': 'track_id',
+    'echonest': 'track_id',
+}
+
+# Columns that must be unique: (table, column). Later duplicates would be
+# skipped by ON CONFLICT DO NOTHING during the load.
+UNIQUE_COLUMNS = [
+    ('genres', 'genre_id'),
+    ('genres', 'genre_title'),
+    ('artists', 'artist_id'),
+    ('albums', 'album_id'),
+    ('tracks', 'track_id'),
+    ('echonest', 'track_id'),
+]
+
+# Columns that are NOT NULL in schema.sql: (table, column)
+REQUIRED_COLUMNS = [
+    ('genres', 'genre_title'),
+    ('artists', 'artist_name'),
+    ('albums', 'album_title'),
+    ('tracks', 'track_title'),
+]
+
+# References that must exist: (table, column, referenced table, referenced column).
+# Albums point to their artist by name, which ingest_data.py turns into an ID.
+FOREIGN_KEYS = [
+    ('genres', 'genre_parent_id', 'genres', 'genre_id'),
+    ('albums', 'artist_name', 'artists', 'artist_name'),
+    ('tracks', 'album_id', 'albums', 'album_id'),
+    ('tracks', 'artist_id', 'artists', 'artist_id'),
+    ('echonest', 'track_id', 'tracks', 'track_id'),
+]
+
+CURRENT_YEAR = date.today().year
+
+# Allowed ranges: (table, column, lowest, highest). Dates are checked by year.
+VALUE_RANGES = [
+    ('artists', 'artist_latitude', -90, 90),
+    ('artists', 'artist_longitude', -180, 180),
+    ('artists', 'artist_active_year_begin', 1900, CURRENT_YEAR),
+    ('albums', 'album_date_released', 1900, CURRENT_YEAR),
+    ('tracks', 'track_date_recorded', 1900, CURRENT_YEAR),
+    ('artists', 'artist_favorites', 0, None),
+    ('albums', 'album_listens', 0, None),
+    ('albums', 'album_favorites', 0, None),
+    ('albums', 'album_tracks', 0, None),
+    ('tracks', 'track_listens', 0, None),
+    ('tracks', 'track_favorites', 0, None),
+    ('tracks', 'track_bit_rate', 0, None),
+    ('echonest', 'tempo', 0, None),
+] + [('echonest', column, 0, 1) for column in [
+    'acousticness', 'danceability', 'energy', 'instrumentalness', 'liveness', 'speechiness', 'valence',
+    'artist_discovery', 'artist_familiarity', 'artist_hotttnesss', 'song_hotttnesss',
+]]
+
+# Text columns with a VARCHAR limit in schema.sql: (table, column, limit)
+LENGTH_LIMITS = [
+    ('genres', 'genre_title', 100),
+    ('artists', 'artist_name', 255),
+    ('artists', 'artist_handle', 255),
+    ('artists', 'artist_website', 512),
+    ('albums', 'album_title', 255),
+    ('albums', 'album_type', 50),
+    ('tracks', 'track_title', 255),
+    ('tracks', 'track_url', 512),
+    ('tracks', 'track_language_code', 10),
+    ('tracks', 'track_duration', 10),
+    ('tracks', 'license_title', 255),
+]
+
+
+def cleaned_file_path(name, cleaned_dir=CLEANED_DATA_DIR):
+    """Path of one cleaned Parquet file."""
+    return os.path.join(cleaned_dir, f"clean_{name}.parquet")
+
+
+def needed_columns():
+    """The columns each table needs for the rules above (plus its key), so nothing else is read."""
+    columns = {name: {key} for name, key in TABLE_KEYS.items()}
+    for table, column in UNIQUE_COLUMNS + REQUIRED_COLUMNS:
+        columns[table].add(column)
+    for table, column, ref_table, ref_column in FOREIGN_KEYS:
+        columns[table].add(column)
+        columns[ref_table].add(ref_column)
+    for table, column, *_ in VALUE_RANGES + LENGTH_LIMITS:
+        columns[table].add(column)
+    columns['tracks'].add('track_genres')
+    return columns
+
+
+def load_columns(cleaned_dir):
+    """Read just the columns the rules need from every cleaned file."""
+    return {name: apply_dtypes(pd.read_parquet(cleaned_file_path(name, cleaned_dir), columns=sorted(columns)))
+            for name, columns in needed_columns().items()}
+
+
+def key_codes(values):
+    """
+    The values of a key column as an int64 array, so every foreign key check is a join
+    on integers. Text keys are replaced by a 64-bit hash of the text.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype='int64')
+    return pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy().view('int64')
+
+
+def check_unique(values):
+    """Rows repeating a value that an earlier row already has."""
+    return (values.notna() & values.duplicated(keep='first')).to_numpy()
+
+
+def check_required(values):
+    """Rows where a NOT NULL column is empty."""
+    return values.isna().to_numpy()
+
+
+def check_foreign_key(values, referenced):
+    """Rows whose value is set but doesn't exist in the referenced column."""
+    present = values.notna().to_numpy()
+    found = np.zeros(len(values), dtype=bool)
+    found[present] = np.isin(key_codes(values[present]), np.unique(key_codes(referenced.dropna())))
+    return present & ~found
+
+
+def check_range(values, low, high):
+    """Rows whose value (or year, for dates) is outside [low, high]."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.year
+    values = values.astype('float64')
+    outside = pd.Series(False, index=values.index)
+    if low is not None:
+        outside |= values < low
+    if high is not None:
+        outside |= values > high
+    return (outside & values.notna()).to_numpy()
+
+
+def check_length(values, limit):
+    """Rows whose text is longer than the VARCHAR limit."""
+    return (values.astype('string').str.len() > limit).fillna(False).to_numpy(dtype=bool)
+
+
+def check_genre_tree(genres):
+    """Genres whose parent chain never reaches a top-level genre (missing parent or a cycle)."""
+    hierarchy, problems = build_genre_hierarchy(genres.rename(columns={'genre_parent_id': 'parent_id'}))
+    bad = set(problems['orphans']) | set(problems['cycles'])
+    return genres['genre_id'].isin(bad).to_numpy()
+
+
+def check_track_genres_parse(tracks, track_genres):
+    """Tracks that list genres, but whose track_genres text yields no genre IDs."""
+    listed = tracks['track_genres'].notna() & ~tracks['track_genres'].astype('string').str.strip().isin(['', '[]'])
+    parsed = np.isin(tracks['track_id'].to_numpy(dtype='int64'), track_genres['track_id'].to_numpy(dtype='int64'))
+    return (listed.to_numpy(dtype=bool)) & ~parsed
+
+
+def rule_checks(data, track_genres):
+    """
+    Every rule as (rule name, table, column, violation mask).
+    Each mask is a boolean array over the rows of data[table].
+    """
+    for table, column in UNIQUE_COLUMNS:
+        yield f"unique {table}.{column}", table, column, check_unique(data[table][column])
+
+    for table, column in REQUIRED_COLUMNS:
+        yield f"not null {table}.{column}", table, column, check_required(data[table][column])
+
+    for table, column, ref_table, ref_column in FOREIGN_KEYS:
+        yield (f"{table}.{column} -> {ref_table}.{ref_column}", table, column,
+               check_foreign_key(data[table][column], data[ref_table][ref_column]))
+
+    yield "genre tree (orphans/cycles)", 'genres', 'genre_parent_id', check_genre_tree(data['genres'])
+
+    for table, column, low, high in VALUE_RANGES:
+        bounds = f"[{'' if low is None else low}, {'' if high is None else high}]"
+        yield f"range {table}.{column} {bounds}", table, column, check_range(data[table][column], low, high)
+
+    for table, column, limit in LENGTH_LIMITS:
+        yield f"length {table}.{column} <= {limit}", table, column, check_length(data[table][column], limit)
+
+    yield ("parse tracks.track_genres", 'tracks', 'track_genres',
+           check_track_genres_parse(data['tracks'], track_genres))
+
+
+def check_track_genre_links(track_genres, genres):
+    """(track_id, genre_id) pairs pointing to a genre that doesn't exist."""
+    return check_foreign_key(track_genres['genre_id'], genres['genre_id'])
+
+
+def validate(cleaned_dir=CLEANED_DATA_DIR):
+    """
+    Run every rule on the cleaned files.
+    Returns the per-rule results and the quarantine: one row per violation with the
+    rule, table, key of the offending row, column and value.
+    """
+    data = load_columns(cleaned_dir)
+    track_genres = load_track_genres(cleaned_file_path('tracks', cleaned_dir))
+
+    results = []
+    quarantine = []
+
+    def record(rule, table, column, mask, rows, key_column):
+        violations = int(mask.sum())
+        results.append({'rule': rule, 'table': table, 'column': column, 'rows_checked': len(mask),
+                        'violations': violations})
+        if violations:
+            quarantine.append(pd.DataFrame({
+                'rule': rule,
+                'table': table,
+                'key_column': key_column,
+                'key': rows[key_column][mask].to_numpy(dtype='int64'),
+                'column': column,
+                'value': rows[column][mask].astype(str).to_numpy(),
+            }))
+
+    for rule, table, column, mask in rule_checks(data, track_genres):
+        record(rule, table, column, mask, data[table], TABLE_KEYS[table])
+
+    record("track_genres.genre_id -> genres.genre_id", 'track_genres', 'genre_id',
+           check_track_genre_links(track_genres, data['genres']), track_genres, 'track_id')
+
+    quarantine = (pd.concat(quarantine, ignore_index=True) if quarantine else
+                  pd.DataFrame(columns=['rule', 'table', 'key_column', 'key', 'column', 'value']))
+    return results, quarantine
+
+
+def print_report(results):
+    """Print one line per rule, violated rules first."""
+    print("\n" + "=" * 96)
+    print("DATA VALIDATION REPORT")
+    print("=" * 96)
+    print(f"{'rule':<66}{'checked':>14}{'violations':>14}")
+    print("-" * 96)
+    for result in sorted(results, key=lambda result: result['violations'] == 0):
+        print(f"{result['rule'][:65]:<66}{result['rows_checked']:>14,}{result['violations']:>14,}")
+    print("-" * 96)
+    failed = [result for result in results if result['violations']]
+    print(f"{len(results)} rules checked, {len(failed)} with violations "
+          f"({sum(result['violations'] for result in failed):,} rows)")
+
+
+def write_report(results, quarantine, seconds):
+    """
+    Save the per-rule results as JSON and the violating rows as a Parquet quarantine
+    file in VALIDATION_DIR. Returns the two paths (the quarantine path is None when
+    there were no violations).
+    """
+    os.makedirs(VALIDATION_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    report_file = os.path.join(VALIDATION_DIR, f"validation_{timestamp}.json")
+    quarantine_file = None
+
+    if not quarantine.empty:
+        quarantine_file = os.path.join(VALIDATION_DIR, f"quarantine_{timestamp}.parquet")
+        quarantine.to_parquet(quarantine_file, index=False)
+
+    report = {
+        'validated_at': datetime.now().isoformat(timespec='seconds'),
+        'seconds': round(seconds, 3),
+        'violations': int(sum(result['violations'] for result in results)),
+        'quarantine_file': quarantine_file,
+        'rules': results,
+    }
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+    return report_file, quarantine_file
+
+
+def run_validation(cleaned_dir=CLEANED_DATA_DIR):
+    """Validate, print and save the report. Returns the total number of violations."""
+    started = time.perf_counter()
+    results, quarantine = validate(cleaned_dir)
+    seconds = time.perf_counter() - started
+
+    print_report(results)
+    report_file, quarantine_file = write_report(results, quarantine, seconds)
+    print(f"Validation took {seconds:.2f}s. Report saved to {report_file}")
+    if quarantine_file:
+        print(f"Violating rows saved to {quarantine_file}")
+    return int(sum(result['violations'] for result in results))
+
+
+def parse_args():
+    """Read the command line options."""
+    parser = argparse.ArgumentParser(description="Check the cleaned FMA data before it is loaded.")
+    parser.add_argument('--cleaned-dir', default=CLEANED_DATA_DIR, help="folder with the cleaned Parquet files")
+    return parser.parse_args()
+
+
+def main():
+    """Validate the cleaned files; exit with status 1 if any rule is violated."""
+    args = parse_args()
+    violations = run_validation(args.cleaned_dir)
+    raise SystemExit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()